@@ -0,0 +1,208 @@
+"""
+Media file serving with HTTP Range support and optional proxy offload.
+
+Replaces `django.views.static.serve` for MEDIA_URL: answers conditional requests
+(ETag / Last-Modified), single and multi-range requests (so video seeking does not
+restart from byte 0) and sends long-lived cache headers. When MEDIA_SENDFILE_BACKEND
+is set, the response only carries an `X-Accel-Redirect` (nginx) or `X-Sendfile`
+(Apache mod_xsendfile) header and the front proxy streams the bytes instead of a
+Python worker.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import secrets
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+CHUNK_SIZE = 64 * 1024
+
+# More ranges than this in one request is almost certainly abuse; answer with the full file
+MAX_RANGES = 16
+
+RANGE_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+def parse_range_header(header, size):
+    """
+    Parse a `Range: bytes=...` header into sorted, merged [(start, end)] (end inclusive).
+
+    Returns None if the header should be ignored (malformed, not bytes, too many ranges)
+    and [] if it is well formed but no range overlaps the file (416).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+    specs = spec.split(',')
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in specs:
+        match = RANGE_RE.match(part)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if first == '':
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        if start < size:
+            ranges.append((start, end))
+
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(request, etag, mtime):
+    """A Range applies only if If-Range is absent or still matches the current file"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # If-Range requires a strong comparison
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and int(mtime) <= date
+
+
+def file_etag(st):
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as fileobj:
+        fileobj.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fileobj.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _multipart(path, ranges, size, content_type, boundary):
+    for start, end in ranges:
+        yield (
+            f'--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('ascii')
+        yield from _read_range(path, start, end)
+        yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode('ascii')
+
+
+def _multipart_length(ranges, size, content_type, boundary):
+    length = len(f'--{boundary}--\r\n')
+    for start, end in ranges:
+        length += len(
+            f'--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        )
+        length += end - start + 1 + 2
+    return length
+
+
+def _offload(response, path, relative_path):
+    backend = settings.MEDIA_SENDFILE_BACKEND
+    if backend == 'x-accel-redirect':
+        prefix = settings.MEDIA_SENDFILE_PREFIX.rstrip('/')
+        # nginx decodes the URI, so spaces, '?' and non-ASCII names must be percent-encoded
+        response['X-Accel-Redirect'] = f'{prefix}/{quote(relative_path)}'
+    elif backend == 'x-sendfile':
+        response['X-Sendfile'] = path
+    return response
+
+
+def _with_headers(response, content_type, etag, mtime):
+    response['Content-Type'] = content_type
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file below MEDIA_ROOT, honouring Range and conditional request headers"""
+    relative_path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, relative_path)
+        st = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('File not found')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('File not found')
+
+    size = st.st_size
+    etag = file_etag(st)
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if not_modified is not None:
+        return _with_headers(not_modified, content_type, etag, st.st_mtime)
+
+    if settings.MEDIA_SENDFILE_BACKEND:
+        # The proxy handles Range itself; Django only authorizes and resolves the path
+        return _offload(_with_headers(HttpResponse(), content_type, etag, st.st_mtime), fullpath, relative_path)
+
+    ranges = None
+    if if_range_matches(request, etag, st.st_mtime):
+        ranges = parse_range_header(request.META.get('HTTP_RANGE'), size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return _with_headers(response, content_type, etag, st.st_mtime)
+
+    head = request.method == 'HEAD'
+    if not ranges:
+        response = StreamingHttpResponse([] if head else _read_range(fullpath, 0, size - 1))
+        response['Content-Length'] = str(size)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse([] if head else _read_range(fullpath, start, end), status=206)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        boundary = secrets.token_hex(16)
+        response = StreamingHttpResponse(
+            [] if head else _multipart(fullpath, ranges, size, content_type, boundary), status=206
+        )
+        response['Content-Length'] = str(_multipart_length(ranges, size, content_type, boundary))
+        _with_headers(response, content_type, etag, st.st_mtime)
+        response['Content-Type'] = f'multipart/byteranges; boundary={boundary}'
+        return response
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return _with_headers(response, content_type, etag, st.st_mtime)
@@ -10,10 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 import sys
 import locale
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # Force UTF-8 encoding for production environments (fixes Unicode errors)
@@ -112,8 +114,43 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Writers take the lock at BEGIN and queue on the busy timeout, instead of failing
+            # when a transaction that has read (e.g. checkout) tries to upgrade to a write
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': int(os.getenv('SQLITE_TIMEOUT', '20')),
+        },
     }
 }
+# Opt-in (SQLITE_WAL=True): WAL lets readers run alongside the single writer; synchronous=NORMAL
+# is durable in WAL mode except for the last commits on power loss. The journal mode is stored in
+# the database file, so enabling it converts db.sqlite3 for good (PRAGMA journal_mode=DELETE undoes
+# it), adds db.sqlite3-wal/-shm sidecar files, and is unsafe on network/shared filesystems.
+if os.getenv('SQLITE_WAL', 'False') == 'True':
+    DATABASES['default']['OPTIONS']['init_command'] = 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;'
+
+
+# Cache
+# File-based by default so every gunicorn/Passenger worker on the host shares entries
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '5000')),
+        },
+    }
+}
+
+# Public catalog responses are versioned and invalidated on write; this only bounds their lifetime
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', '3600'))
+
+# Run catalog maintenance (home bundle, similar products) on a background thread (False: inline after commit)
+CATALOG_TASKS_ASYNC = os.getenv('CATALOG_TASKS_ASYNC', 'True').lower() == 'true'
+
+# How long an order's Idempotency-Key replays its response (purge_idempotency_keys deletes older keys)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24')))
 
 
 # Password validation
@@ -164,6 +201,14 @@ if not DEBUG:
     # But we configure Django to handle them as fallback
     MEDIA_URL = '/media/'
 
+# Media serving (altivomart_backend.media.serve_media)
+# MEDIA_SENDFILE_BACKEND: '' streams from Python, 'x-accel-redirect' (nginx) or 'x-sendfile'
+# (Apache mod_xsendfile) hands the transfer to the front proxy.
+MEDIA_SENDFILE_BACKEND = os.getenv('MEDIA_SENDFILE_BACKEND', '')
+# Internal nginx location aliased to MEDIA_ROOT, used with x-accel-redirect
+MEDIA_SENDFILE_PREFIX = os.getenv('MEDIA_SENDFILE_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', str(30 * 24 * 3600)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -196,6 +241,9 @@ SPECTACULAR_SETTINGS = {
 }
 
 # CORS settings for frontend
+# Checkout retries send Idempotency-Key (see orders.idempotency)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 if DEBUG:
     # Allow all origins in development
     CORS_ALLOW_ALL_ORIGINS = True
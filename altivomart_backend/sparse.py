@@ -0,0 +1,141 @@
+"""
+Sparse fieldsets: `?fields=a,b`, `?omit=c` and `?profile=compact` for API responses.
+
+Serializers opt in with `SparseFieldsetSerializerMixin` and may declare on Meta:
+
+    compact_fields      field names returned with ?profile=compact
+    field_dependencies  {serializer field: [model paths it reads]} for properties,
+                        e.g. {'formatted_price': ['price'], 'images': ['images']}
+
+Views opt in with `SparseFieldsetViewMixin`, which narrows the queryset to the
+selected fields: `only()` on the columns, and select_related/prefetch_related
+reduced to the relations that are still serialized. Nested serializers are
+never pruned; the parameters only apply to the top-level object(s).
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.filters import OrderingFilter
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+PROFILE_PARAM = 'profile'
+COMPACT_PROFILE = 'compact'
+
+
+def parse_field_list(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def requested_field_names(request, available, compact_fields=None):
+    """The subset of `available` (ordered) selected by the request's query parameters"""
+    if request is None:
+        return list(available)
+    params = request.query_params if hasattr(request, 'query_params') else request.GET
+
+    names = list(available)
+    if params.get(PROFILE_PARAM) == COMPACT_PROFILE and compact_fields:
+        names = [name for name in names if name in compact_fields]
+    fields = parse_field_list(params.get(FIELDS_PARAM))
+    if fields:
+        names = [name for name in names if name in fields]
+    omit = set(parse_field_list(params.get(OMIT_PARAM)))
+    return [name for name in names if name not in omit]
+
+
+def is_sparse_request(request):
+    if request is None:
+        return False
+    params = request.query_params if hasattr(request, 'query_params') else request.GET
+    return any(params.get(param) for param in (FIELDS_PARAM, OMIT_PARAM, PROFILE_PARAM))
+
+
+class SparseFieldsetSerializerMixin:
+    """Drops top-level fields not selected by ?fields= / ?omit= / ?profile="""
+
+    def _is_top_level(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+        request = self.context.get('request')
+        if not is_sparse_request(request):
+            return fields
+        meta = getattr(self, 'Meta', None)
+        selected = requested_field_names(request, fields, getattr(meta, 'compact_fields', None))
+        return {name: fields[name] for name in selected}
+
+    def get_model_paths(self):
+        """Model field paths (`category__name`, `images`) read by the selected fields"""
+        dependencies = getattr(getattr(self, 'Meta', None), 'field_dependencies', {})
+        paths = set()
+        for name, field in self.fields.items():
+            if name in dependencies:
+                paths.update(dependencies[name])
+            elif field.source != '*':
+                paths.add(field.source.replace('.', '__'))
+        return paths
+
+
+def prune_queryset(queryset, paths, required=()):
+    """
+    Restrict `queryset` to the model paths a serializer reads.
+
+    Columns not in `paths`/`required` are deferred, unused select_related joins and
+    prefetches are dropped. Paths that are not model fields (annotations, properties
+    without declared dependencies) are ignored.
+    """
+    model = queryset.model
+    columns = {model._meta.pk.name}
+    relations = set()
+    prefetches = set()
+    for path in set(paths) | set(required):
+        parts = path.split('__')
+        try:
+            field = model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            continue
+        if field.many_to_many or field.one_to_many:
+            prefetches.add(parts[0])
+        elif field.is_relation and len(parts) > 1:
+            columns.add(parts[0])
+            relations.add(parts[0])
+            columns.add(path)
+        elif field.concrete:
+            columns.add(parts[0])
+
+    lookups = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if (lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup).split('__')[0] in prefetches
+    ]
+    queryset = queryset.prefetch_related(None).prefetch_related(*lookups)
+
+    queryset = queryset.select_related(None)
+    if relations:
+        queryset = queryset.select_related(*relations)
+    return queryset.only(*columns)
+
+
+class SparseFieldsetViewMixin:
+    """Prunes the view's queryset to the fields selected by the request"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in ('GET', 'HEAD') or not is_sparse_request(self.request):
+            return queryset
+        serializer = self.get_serializer()
+        if not hasattr(serializer, 'get_model_paths'):
+            return queryset
+        return prune_queryset(queryset, serializer.get_model_paths(), self.get_sparse_required_fields(queryset))
+
+    def get_sparse_required_fields(self, queryset):
+        """Columns needed regardless of the selection (ordering/pagination keys, including ?ordering=)"""
+        ordering = list(getattr(self, 'ordering', None) or [])
+        ordering += list(getattr(self.pagination_class, 'ordering', None) or [])
+        for backend in getattr(self, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering += list(backend().get_ordering(self.request, queryset, self) or [])
+        return {field.lstrip('-') for field in ordering if isinstance(field, str)}
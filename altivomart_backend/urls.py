@@ -1,11 +1,17 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
+from products.views import home
+from .media import serve_media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/home/', home, name='home'),
     path('api/products/', include('products.urls')),
     path('api/orders/', include('orders.urls')),
     
@@ -16,8 +22,10 @@ urlpatterns = [
 ]
 
 # Serve media and static files
-# In development, Django serves these files
-# In production on cPanel, both Django and web server can serve them
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media goes through serve_media (Range, conditional GETs, cache headers) in every
+# environment; in production set MEDIA_SENDFILE_BACKEND so the web server streams the bytes
+urlpatterns += [
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.*)$', serve_media, name='media'),
+]
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
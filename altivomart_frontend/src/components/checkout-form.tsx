@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useSearchParams, useRouter } from "next/navigation";
 import { fetchProduct, createOrder, Product, OrderRequest } from "@/lib/api";
 import { useCart } from "@/contexts/cart-context";
@@ -25,6 +25,8 @@ export function CheckoutForm() {
   const [error, setError] = useState<string | null>(null);
   const [orderId, setOrderId] = useState<number | null>(null);
   const [trackingCode, setTrackingCode] = useState<string | null>(null);
+  // Idempotency-Key of the last submitted order body (see createOrder)
+  const idempotency = useRef<{ body: string; key: string } | null>(null);
 
   const [formData, setFormData] = useState({
     customer_name: "",
@@ -103,9 +105,16 @@ export function CheckoutForm() {
       items: orderItems,
     };
 
+    // Resubmitting the same order reuses its key, so a double submit or a retry after a
+    // lost response gets the original order back instead of a duplicate
+    const body = JSON.stringify(orderData);
+    if (idempotency.current?.body !== body) {
+      idempotency.current = { body, key: crypto.randomUUID() };
+    }
+
     try {
       console.log('Creating order with data:', orderData);
-      const order = await createOrder(orderData);
+      const order = await createOrder(orderData, idempotency.current.key);
       console.log('Order created successfully:', order);
       
       if (order) {
@@ -5,7 +5,7 @@ import { useState, useEffect } from "react";
 import { motion, AnimatePresence } from "framer-motion";
 import { Button } from "@/components/ui/button";
 import { ShoppingBag, Truck, Shield, Star, ChevronLeft, ChevronRight, Search } from "lucide-react";
-import { fetchProducts, Product } from "@/lib/api";
+import { fetchHome, Product } from "@/lib/api";
 import { mediaURL } from "@/lib/utils";
 
 export function HeroSection() {
@@ -25,7 +25,9 @@ export function HeroSection() {
   useEffect(() => {
     const loadFeaturedProducts = async () => {
       try {
-        const products = await fetchProducts();
+        const home = await fetchHome();
+        // Fall back to the latest arrivals until something is marked featured
+        const products = home.featured.length > 0 ? home.featured : home.latest;
         console.log("Fetched products:", products);
         setFeaturedProducts(products.slice(0, 5));
         if (products.length > 0) {
@@ -52,6 +52,19 @@ export interface Product {
   benefits_list?: string[];
 }
 
+export interface HomeCategory {
+  id: number;
+  name: string;
+  description?: string;
+}
+
+export interface HomeBundle {
+  featured: Product[];
+  categories: HomeCategory[];
+  latest: Product[];
+  generated_at: string;
+}
+
 export interface OrderItem {
   product_id: number;
   quantity: number;
@@ -110,7 +123,8 @@ export interface DeliveryTracking {
 // API Functions
 export const fetchProducts = async (): Promise<Product[]> => {
   try {
-    const response = await fetch(`${API_BASE_URL}/products/`, {
+    // Compact profile: only the fields product cards render (no duplicated list variants)
+    const response = await fetch(`${API_BASE_URL}/products/?profile=compact`, {
       method: 'GET',
       headers: {
         'Content-Type': 'application/json',
@@ -148,6 +162,20 @@ export const fetchProducts = async (): Promise<Product[]> => {
   }
 };
 
+// Pre-rendered, pre-compressed homepage document (featured products, categories, latest arrivals)
+export const fetchHome = async (): Promise<HomeBundle> => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/home/`, { cache: 'no-store' });
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error('Error fetching home bundle:', error);
+    return { featured: [], categories: [], latest: [], generated_at: '' };
+  }
+};
+
 export const fetchProduct = async (id: string): Promise<Product> => {
   try {
     const response = await fetch(`${API_BASE_URL}/products/${id}/`);
@@ -171,18 +199,35 @@ export const fetchProduct = async (id: string): Promise<Product> => {
   }
 };
 
-export async function createOrder(orderData: OrderRequest): Promise<Order | null> {
+// Network failures retried by createOrder; safe because every try carries the same Idempotency-Key
+const ORDER_NETWORK_RETRIES = 2;
+
+export async function createOrder(
+  orderData: OrderRequest,
+  idempotencyKey: string = crypto.randomUUID(),
+): Promise<Order | null> {
   try {
     console.log('Creating order with API URL:', API_BASE_URL);
     console.log('Order data:', orderData);
     
-    const response = await fetch(`${API_BASE_URL}/orders/create/`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(orderData),
-    });
+    let response: Response | undefined;
+    for (let attempt = 0; !response; attempt++) {
+      try {
+        response = await fetch(`${API_BASE_URL}/orders/create/`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            'Idempotency-Key': idempotencyKey,
+          },
+          body: JSON.stringify(orderData),
+        });
+      } catch (networkError) {
+        // The order may have been created even though the response was lost; the server
+        // replays it for the same key instead of creating another
+        if (attempt >= ORDER_NETWORK_RETRIES) throw networkError;
+        await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+      }
+    }
     
     console.log('Response status:', response.status);
     console.log('Response headers:', Object.fromEntries(response.headers.entries()));
@@ -1,3 +1,21 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import EmailOutbox
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['recipient', 'subject']
+    readonly_fields = [
+        'recipient', 'from_email', 'subject', 'body', 'html_body', 'status', 'attempts',
+        'next_attempt_at', 'last_error', 'created_at', 'sent_at',
+    ]
+    actions = ['requeue']
+
+    @admin.action(description='Re-queue selected emails for immediate sending')
+    def requeue(self, request, queryset):
+        count = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f'{count} email(s) re-queued.')
@@ -0,0 +1,34 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from notifications.outbox import BATCH_SIZE, send_outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Send due emails from the outbox over one SMTP connection (--loop: keep polling as a daemon)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Emails leased per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling for new emails')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = send_outbox(options['batch_size'])
+            except Exception:
+                if not options['loop']:
+                    raise
+                # Mail host unreachable: the batch went back to the queue, try again next poll
+                logger.exception('Outbox send failed')
+                sent = failed = 0
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Outbox: {sent} sent, {failed} failed'))
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,144 @@
+"""
+Transactional email outbox.
+
+Emails are rendered on the request path but only written to EmailOutbox, in the
+same transaction as the change they announce: an email exists exactly when its
+order or status change commits, and checkout never waits on the mail host. The
+send_outbox command drains due rows in batches over one reused SMTP connection.
+
+A failed message is retried with exponential backoff (RETRY_BASE_DELAY doubling up
+to RETRY_MAX_DELAY) and dead-lettered after MAX_ATTEMPTS, or at once when the server
+rejects the recipient permanently. Dead rows stay in the table for inspection and
+can be re-queued from the admin.
+
+Delivery is at-least-once: a batch is leased while it is being sent and the outcomes
+are written after it, so a sender killed mid-batch resends it once the lease expires.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=6)
+# Long enough for any batch to be sent; a crashed sender's batch comes back after it
+LEASE = timedelta(minutes=10)
+# Server replies about one message; the connection itself is still usable
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+OUTCOME_FIELDS = ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+
+
+def queue_email(recipient, subject, html_message, from_email=None):
+    """Add an email to the outbox; it is sent once the current transaction commits"""
+    return EmailOutbox.objects.create(
+        recipient=recipient,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject,
+        body=strip_tags(html_message),
+        html_body=html_message,
+    )
+
+
+def retry_delay(attempts):
+    """Wait before the next try after `attempts` failures"""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def is_permanent(exc):
+    """True for 5xx rejections of every recipient: retrying will not help"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    return False
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """Lease up to `batch_size` due emails, oldest first"""
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked lets concurrent senders take different rows (ignored on SQLite,
+        # where the UPDATE's write lock serializes claims instead)
+        batch = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if batch:
+            EmailOutbox.objects.filter(pk__in=[message.pk for message in batch]).update(next_attempt_at=now + LEASE)
+    return batch
+
+
+def release(messages):
+    """Hand leased emails back without charging an attempt"""
+    EmailOutbox.objects.filter(pk__in=[message.pk for message in messages]).update(next_attempt_at=timezone.now())
+
+
+def _deliver(message, connection):
+    email = EmailMultiAlternatives(
+        message.subject, message.body, message.from_email, [message.recipient], connection=connection
+    )
+    if message.html_body:
+        email.attach_alternative(message.html_body, 'text/html')
+    message.attempts += 1
+    try:
+        connection.send_messages([email])
+    except Exception as exc:
+        message.last_error = f'{type(exc).__name__}: {exc}'
+        if is_permanent(exc) or message.attempts >= MAX_ATTEMPTS:
+            message.status = 'dead'
+            logger.error(f'Email {message.pk} to {message.recipient} dead-lettered: {message.last_error}')
+        else:
+            message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+            logger.warning(f'Email {message.pk} to {message.recipient} failed, retrying: {message.last_error}')
+        if not isinstance(exc, MESSAGE_ERRORS):
+            # Dropped or broken connection: send_batch opens a fresh one for the next message
+            connection.close()
+        return False
+    message.status = 'sent'
+    message.sent_at = timezone.now()
+    message.last_error = ''
+    return True
+
+
+def send_batch(messages, connection):
+    """Send leased emails over one connection; returns the number sent"""
+    sent = done = 0
+    try:
+        for message in messages:
+            # No-op while the connection is up
+            connection.open()
+            sent += _deliver(message, connection)
+            done += 1
+    finally:
+        EmailOutbox.objects.bulk_update(messages[:done], OUTCOME_FIELDS)
+        # Could not (re)connect: the rest go back to the queue untried
+        release(messages[done:])
+    return sent
+
+
+def send_outbox(batch_size=BATCH_SIZE, connection=None):
+    """Send every due email over one connection; returns (sent, failed)"""
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+    connection = connection or get_connection()
+    sent = failed = 0
+    try:
+        while batch:
+            batch_sent = send_batch(batch, connection)
+            sent += batch_sent
+            failed += len(batch) - batch_sent
+            batch = claim_batch(batch_size)
+    finally:
+        connection.close()
+    return sent, failed
@@ -1,3 +1,239 @@
-from django.test import TestCase
+import socketserver
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.models import Order
+from products.models import Product
+
+from .models import EmailOutbox
+from .outbox import MAX_ATTEMPTS, queue_email, retry_delay, send_outbox
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: one session per connection"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 stub ESMTP')
+        recipients = []
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 stub')
+            elif verb == 'MAIL':
+                if server.drops:
+                    # Hang up mid-session, as a flaky relay would
+                    server.drops -= 1
+                    return
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip().strip('<>')
+                if address in server.refused:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while (line := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(line)
+                server.messages.append((recipients, b''.join(data).decode()))
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+
+class SMTPStubServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPStubHandler)
+        self.connections = 0
+        self.drops = 0
+        self.refused = set()
+        self.messages = []
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.smtp = SMTPStubServer()
+        thread = threading.Thread(target=self.smtp.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.smtp.server_address[1], EMAIL_TIMEOUT=5,
+            EMAIL_USE_SSL=False, EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def queue(self, count, **kwargs):
+        return [
+            queue_email(f'customer{index}@example.com', f'Subject {index}', f'<p>Hello {index}</p>', **kwargs)
+            for index in range(count)
+        ]
+
+
+class SendOutboxTests(OutboxTestCase):
+    def test_batches_share_one_connection(self):
+        self.queue(5)
+
+        self.assertEqual(send_outbox(batch_size=2), (5, 0))
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertEqual(self.smtp.messages[0][0], ['customer0@example.com'])
+        self.assertIn('text/html', self.smtp.messages[0][1])
+        self.assertFalse(EmailOutbox.objects.exclude(status='sent').exists())
+        self.assertFalse(EmailOutbox.objects.filter(sent_at=None).exists())
+
+    def test_idle_outbox_does_not_connect(self):
+        self.assertEqual(send_outbox(), (0, 0))
+        self.assertEqual(self.smtp.connections, 0)
+
+    def test_refused_recipient_is_dead_lettered_without_dropping_the_connection(self):
+        first, second, third = self.queue(3)
+        self.smtp.refused.add(second.recipient)
+
+        self.assertEqual(send_outbox(), (2, 1))
+
+        self.assertEqual(self.smtp.connections, 1)
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'dead')
+        self.assertEqual(second.attempts, 1)
+        self.assertIn('SMTPRecipientsRefused', second.last_error)
+
+    def test_dropped_connection_reconnects_and_backs_off(self):
+        first, second, third = self.queue(3)
+        self.smtp.drops = 1
+
+        self.assertEqual(send_outbox(), (2, 1))
+
+        self.assertEqual(self.smtp.connections, 2)
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'pending')
+        self.assertEqual(first.attempts, 1)
+        expected = timezone.now() + retry_delay(1)
+        self.assertLess(abs(first.next_attempt_at - expected), timedelta(seconds=5))
+
+        # Not due yet, then sent once the backoff has passed
+        self.assertEqual(send_outbox(), (0, 0))
+        EmailOutbox.objects.filter(pk=first.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_outbox(), (1, 0))
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.last_error), ('sent', 2, ''))
+
+    def test_dead_letter_after_max_attempts(self):
+        message, = self.queue(1)
+        EmailOutbox.objects.filter(pk=message.pk).update(attempts=MAX_ATTEMPTS - 1)
+        self.smtp.drops = 1
+
+        self.assertEqual(send_outbox(), (0, 1))
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'dead')
+        self.assertEqual(message.attempts, MAX_ATTEMPTS)
+
+    def test_unreachable_host_releases_the_batch(self):
+        self.queue(2)
+        self.smtp.shutdown()
+        self.smtp.server_close()
+
+        with self.assertRaises(OSError):
+            send_outbox()
+
+        self.assertEqual(EmailOutbox.objects.filter(status='pending', attempts=0).count(), 2)
+        self.assertFalse(EmailOutbox.objects.filter(next_attempt_at__gt=timezone.now()).exists())
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        self.assertEqual(retry_delay(1), timedelta(minutes=1))
+        self.assertEqual(retry_delay(4), timedelta(minutes=8))
+        self.assertEqual(retry_delay(20), timedelta(hours=6))
+
+    def test_command(self):
+        self.queue(3)
+        out = StringIO()
+
+        call_command('send_outbox', stdout=out)
+
+        self.assertIn('3 sent, 0 failed', out.getvalue())
+        self.assertEqual(len(self.smtp.messages), 3)
+
+
+class OrderEmailTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(name='Lamp', description='', price=Decimal('2500.00'))
+        patcher = mock.patch('builtins.print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def payload(self, **kwargs):
+        return {
+            'customer_name': 'Ada Obi', 'phone_number': '+2348012345678', 'address': '12 Allen Avenue',
+            'customer_email': 'ada@example.com', 'items': [{'product_id': self.product.pk, 'quantity': 1}],
+            **kwargs,
+        }
+
+    def test_checkout_queues_the_confirmation_instead_of_sending(self):
+        response = self.client.post('/api/orders/create/', self.payload(), format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(mail.outbox, [])
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.recipient, 'ada@example.com')
+        self.assertEqual(email.subject, f"Order Confirmation - Order #{response.data['id']}")
+        self.assertEqual(email.status, 'pending')
+
+    def test_no_email_without_an_address(self):
+        payload = self.payload()
+        del payload['customer_email']
+
+        response = self.client.post('/api/orders/create/', payload, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_email_failure_does_not_block_the_order(self):
+        with mock.patch('notifications.utils.queue_email', side_effect=RuntimeError('boom')):
+            response = self.client.post('/api/orders/create/', self.payload(), format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(Order.objects.filter(pk=response.data['id']).exists())
+
+    def test_status_change_queues_an_update(self):
+        order = Order.objects.create(
+            customer_name='Ada Obi', phone_number='+2348012345678', address='12 Allen Avenue',
+            customer_email='ada@example.com', total_price=Decimal('2500.00'),
+        )
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+
+        response = self.client.patch(f'/api/orders/admin/{order.pk}/status/', {'status': 'on_delivery'}, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(EmailOutbox.objects.get().subject, f'Order Update - Order #{order.pk}')
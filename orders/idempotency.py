@@ -0,0 +1,52 @@
+"""
+Idempotency-Key support for order creation.
+
+A client that may retry POST /api/orders/create/ sends the same Idempotency-Key
+header with every try. The first attempt inserts an IdempotencyKey row before it
+creates the order, in the same transaction, and stores the 201 response on it. The
+unique index makes a concurrent duplicate wait on its own insert until that attempt
+commits, then replay the stored response, so retries never create a second order or
+queue a second email. A key is bound to a fingerprint of the request body: reusing
+it for a different body is rejected with 422. Failed attempts store nothing and may
+be retried with the same key.
+
+Keys replay for settings.IDEMPOTENCY_KEY_TTL; the purge_idempotency_keys command
+deletes older ones.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def request_fingerprint(data):
+    """SHA-256 hex digest of the request body, independent of key order and whitespace"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def expiry_cutoff():
+    """Keys created before this no longer replay"""
+    return timezone.now() - settings.IDEMPOTENCY_KEY_TTL
+
+
+def live_key(key):
+    """The stored, unexpired IdempotencyKey for `key`, or None (an expired one is deleted)"""
+    stored = IdempotencyKey.objects.filter(key=key).first()
+    if stored is not None and stored.created_at < expiry_cutoff():
+        stored.delete()
+        return None
+    return stored
+
+
+def purge_expired_keys():
+    """Delete expired keys; returns the number deleted"""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expiry_cutoff()).delete()
+    return deleted
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from orders.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete order Idempotency-Keys older than IDEMPOTENCY_KEY_TTL (run on a schedule, e.g. hourly cron)'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {deleted} idempotency keys older than {settings.IDEMPOTENCY_KEY_TTL}'
+        ))
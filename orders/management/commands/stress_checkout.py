@@ -0,0 +1,121 @@
+import itertools
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from orders.models import Order, OrderItem
+from orders.serializers import OrderCreateSerializer
+from products.models import Product
+from rest_framework.exceptions import ValidationError
+
+
+class Command(BaseCommand):
+    help = (
+        'Stress-test checkout: threads race to buy more units than two stock-tracked products hold. '
+        'Verifies nothing is oversold and reports orders/sec (the fixture is deleted afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=2000, help='Checkout attempts across all threads')
+        parser.add_argument('--stock', type=int, default=1000, help='Units of each product')
+        parser.add_argument('--quantity', type=int, default=1, help='Units of each product per order')
+        parser.add_argument('--keep', action='store_true', help='Keep the products and orders created')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.stdout.write(f'SQLite journal mode: {cursor.fetchone()[0]}')
+
+        products = [
+            Product.objects.create(
+                name=f'Stress product {index}', description='', price=Decimal('1000'),
+                stock_quantity=options['stock'],
+            )
+            for index in range(2)
+        ]
+        payload = {
+            'customer_name': 'Stress Test', 'phone_number': '08000000000', 'address': 'Lagos',
+            'items': [{'product_id': product.pk, 'quantity': options['quantity']} for product in products],
+        }
+        attempts = itertools.count()
+        lock = threading.Lock()
+        accepted, errors = [], []
+        stats = {'rejected': 0, 'busy': 0}
+
+        def checkout():
+            # Retries only when the database is busy; a sold-out rejection is final
+            while True:
+                serializer = OrderCreateSerializer(data=payload)
+                serializer.is_valid(raise_exception=True)
+                try:
+                    return serializer.save()
+                except ValidationError:
+                    return None
+                except OperationalError as exc:
+                    # Only seen without a busy timeout (e.g. the shared-cache in-memory test database)
+                    if 'locked' not in str(exc):
+                        raise
+                    with lock:
+                        stats['busy'] += 1
+                    time.sleep(0.001)
+
+        def worker():
+            try:
+                while next(attempts) < options['orders']:
+                    order = checkout()
+                    with lock:
+                        if order is None:
+                            stats['rejected'] += 1
+                        else:
+                            accepted.append(order.pk)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        try:
+            if errors:
+                raise CommandError(f'{len(errors)} thread(s) failed: {errors[0]!r}')
+            self.stdout.write(
+                f"{len(accepted)} orders accepted, {stats['rejected']} rejected (sold out), "
+                f"{stats['busy']} busy retries, {options['threads']} threads, {elapsed:.2f}s: "
+                f"{len(accepted) / elapsed:.0f} orders/sec"
+            )
+            self.verify(products, accepted, options)
+        finally:
+            if not options['keep']:
+                Order.objects.filter(pk__in=accepted).delete()
+                for product in products:
+                    product.delete()
+
+    def verify(self, products, accepted, options):
+        expected = min(options['orders'], options['stock'] // options['quantity'])
+        for product in products:
+            product.refresh_from_db()
+            sold = OrderItem.objects.filter(order_id__in=accepted, product=product).aggregate(
+                units=Sum('quantity')
+            )['units'] or 0
+            oversold = max(0, sold - options['stock'])
+            self.stdout.write(
+                f'{product.name}: {sold} sold, {product.stock_quantity} left, oversold: {oversold}'
+            )
+            if oversold or sold + product.stock_quantity != options['stock']:
+                raise CommandError(f'{product.name}: stock does not add up')
+            if product.in_stock != (product.stock_quantity > 0):
+                raise CommandError(f'{product.name}: in_stock does not follow stock_quantity')
+        if len(accepted) != expected:
+            raise CommandError(f'Expected {expected} orders to succeed, got {len(accepted)}')
+        self.stdout.write(self.style.SUCCESS('No oversell'))
@@ -1,11 +1,16 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from django.core.validators import RegexValidator
 from products.models import Product
 import secrets
 import string
 
-def generate_tracking_code(length: int = 10) -> str:
+TRACKING_CODE_LENGTH = 10
+TRACKING_CODE_ATTEMPTS = 5
+
+
+def generate_tracking_code(length: int = TRACKING_CODE_LENGTH) -> str:
     alphabet = string.ascii_uppercase + string.digits
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
@@ -41,9 +46,17 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
+    # Set once the basket has been added to the product co-occurrence matrix
+    basket_recorded = models.BooleanField(default=False, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination walks (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            # Orders still waiting to be recorded (see products.cooccurrence)
+            models.Index(fields=['id'], condition=models.Q(basket_recorded=False), name='order_basket_pending_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.customer_name}"
@@ -66,15 +79,21 @@ class Order(models.Model):
         # Set delivered_at when status changes to delivered
         if self.status == 'delivered' and not self.delivered_at:
             self.delivered_at = timezone.now()
-        # Ensure tracking_code exists and is unique
-        if not self.tracking_code:
-            # Loop until a unique code is found
-            while True:
-                candidate = generate_tracking_code(10)
-                if not Order.objects.filter(tracking_code=candidate).exists():
-                    self.tracking_code = candidate
-                    break
-        super().save(*args, **kwargs)
+        if self.tracking_code:
+            super().save(*args, **kwargs)
+            return
+        # No pre-check query: rely on the unique index and retry the insert in a savepoint
+        # on the (~1 in 3.6e15 per pair) chance of a collision
+        for attempt in range(TRACKING_CODE_ATTEMPTS):
+            self.tracking_code = generate_tracking_code(TRACKING_CODE_LENGTH)
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError as exc:
+                self.tracking_code = ''
+                if 'tracking_code' not in str(exc) or attempt == TRACKING_CODE_ATTEMPTS - 1:
+                    raise
 
     @property
     def total_items(self):
@@ -153,3 +172,17 @@ class DeliveryInfo(models.Model):
         elif self.delivery_status == 'delivered':
             self.actual_delivery = timezone.now()
         super().save(*args, **kwargs)
+
+
+class IdempotencyKey(models.Model):
+    """A client's Idempotency-Key for order creation and the response it produced"""
+    key = models.CharField(max_length=255, unique=True)
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of the request body")
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    # Filled in the same transaction as the insert; null only while the first attempt runs
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} -> order #{self.order_id}"
@@ -1,7 +1,17 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from altivomart_backend.sparse import SparseFieldsetSerializerMixin
 from .models import Order, OrderItem, DeliveryInfo
+from products.models import Product
+from products.inventory import InsufficientStock, reserve_stock
 from products.serializers import ProductListSerializer
 
+DEFAULT_DELIVERY_DAYS = 3
+
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -89,51 +99,77 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         if not value:
             raise serializers.ValidationError("Order must contain at least one item.")
         
+        items = []
         for item in value:
-            if 'product_id' not in item or 'quantity' not in item:
+            if not isinstance(item, dict) or 'product_id' not in item or 'quantity' not in item:
                 raise serializers.ValidationError(
                     "Each item must have 'product_id' and 'quantity'."
                 )
-            if item['quantity'] <= 0:
+            try:
+                product_id, quantity = int(item['product_id']), int(item['quantity'])
+            except (TypeError, ValueError):
+                raise serializers.ValidationError("'product_id' and 'quantity' must be whole numbers.")
+            if quantity <= 0:
                 raise serializers.ValidationError("Quantity must be greater than 0.")
+            items.append({'product_id': product_id, 'quantity': quantity})
         
-        return value
+        return items
 
     def create(self, validated_data):
-        from products.models import Product
-        from decimal import Decimal
-        
+        """
+        Create the order, its items and its delivery info as one atomic unit.
+
+        The query count is fixed whatever the cart size: one in_bulk product fetch,
+        the order insert, one bulk_create for the items and the DeliveryInfo insert,
+        plus the batched stock reservation (products.inventory) for stock-tracked products.
+        """
         items_data = validated_data.pop('items')
-        
-        # Calculate total price
-        total_price = Decimal('0.00')
-        order_items = []
-        
-        for item_data in items_data:
+
+        with transaction.atomic():
+            products = Product.objects.filter(in_stock=True).only(
+                'id', 'name', 'price', 'estimated_delivery_days', 'stock_quantity'
+            ).in_bulk({item['product_id'] for item in items_data})
+
+            total_price = Decimal('0.00')
+            order_items = []
+            reserved = {}
+            for item_data in items_data:
+                product = products.get(item_data['product_id'])
+                if product is None:
+                    raise serializers.ValidationError(
+                        f"Product with id {item_data['product_id']} not found or out of stock."
+                    )
+                total_price += product.price * item_data['quantity']
+                order_items.append(OrderItem(product=product, quantity=item_data['quantity'], price=product.price))
+                if product.stock_quantity is not None:
+                    reserved[product.pk] = reserved.get(product.pk, 0) + item_data['quantity']
+
+            # Conditional decrements, not the quantities read above: the database decides who gets the last unit
             try:
-                product = Product.objects.get(id=item_data['product_id'], in_stock=True)
-            except Product.DoesNotExist:
-                raise serializers.ValidationError(
-                    f"Product with id {item_data['product_id']} not found or out of stock."
-                )
-            
-            quantity = item_data['quantity']
-            item_total = product.price * quantity
-            total_price += item_total
-            
-            order_items.append({
-                'product': product,
-                'quantity': quantity,
-                'price': product.price
-            })
-        
-        # Create order
-        order = Order.objects.create(total_price=total_price, **validated_data)
-        
-        # Create order items
-        for item_data in order_items:
-            OrderItem.objects.create(order=order, **item_data)
-        
+                reserve_stock(reserved)
+            except InsufficientStock as exc:
+                raise serializers.ValidationError([
+                    f"Only {left} left of {products[pk].name}." if left else f"{products[pk].name} is out of stock."
+                    for pk, left in exc.available.items()
+                ])
+
+            order = Order.objects.create(total_price=total_price, **validated_data)
+            for item in order_items:
+                item.order = order
+            OrderItem.objects.bulk_create(order_items)
+
+            # Delivery takes as long as the slowest product in the cart
+            max_days = max(
+                (product.estimated_delivery_days for product in products.values() if product.estimated_delivery_days),
+                default=DEFAULT_DELIVERY_DAYS,
+            )
+            DeliveryInfo.objects.create(
+                order=order,
+                delivery_status='assigned',
+                estimated_delivery=timezone.now() + timedelta(days=max_days),
+                delivery_notes='Delivery information initialized.',
+            )
+
         return order
 
 
@@ -149,7 +185,13 @@ class DeliveryInfoSerializer(serializers.ModelSerializer):
         ]
 
 
-class OrderListSerializer(serializers.ModelSerializer):
+ORDER_FIELD_DEPENDENCIES = {
+    'total_items': ['items'],
+    'full_address': ['address', 'city', 'state', 'landmark'],
+}
+
+
+class OrderListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for order list view"""
     total_items = serializers.ReadOnlyField()
     full_address = serializers.ReadOnlyField()
@@ -160,9 +202,11 @@ class OrderListSerializer(serializers.ModelSerializer):
             'id', 'customer_name', 'phone_number', 'customer_email', 'full_address', 'total_price', 
             'status', 'total_items', 'created_at', 'updated_at', 'tracking_code'
         ]
+        compact_fields = ['id', 'customer_name', 'total_price', 'status', 'total_items', 'created_at', 'tracking_code']
+        field_dependencies = ORDER_FIELD_DEPENDENCIES
 
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for order detail view"""
     items = OrderItemSerializer(many=True, read_only=True)
     delivery_info = DeliveryInfoSerializer(read_only=True)
@@ -177,6 +221,12 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             'total_price', 'status', 'total_items', 'items', 'tracking_code',
             'delivery_info', 'created_at', 'updated_at', 'delivered_at'
         ]
+        # ?profile=compact: the formatted address instead of its parts
+        compact_fields = [
+            'id', 'customer_name', 'phone_number', 'full_address', 'total_price', 'status',
+            'total_items', 'items', 'tracking_code', 'delivery_info', 'created_at', 'delivered_at'
+        ]
+        field_dependencies = ORDER_FIELD_DEPENDENCIES
 
 
 class OrderStatusUpdateSerializer(serializers.ModelSerializer):
@@ -1,3 +1,462 @@
-from django.test import TestCase
+import random
+import string
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Product
+from .models import TRACKING_CODE_ATTEMPTS, DeliveryInfo, IdempotencyKey, Order, OrderItem, generate_tracking_code
+from .serializers import OrderCreateSerializer
+
+
+def make_order(**kwargs):
+    defaults = {
+        'customer_name': 'Ada Obi',
+        'phone_number': '+2348012345678',
+        'address': '12 Allen Avenue',
+        'total_price': Decimal('5000.00'),
+    }
+    defaults.update(kwargs)
+    return Order.objects.create(**defaults)
+
+
+class TrackingConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.order = make_order()
+        self.delivery = DeliveryInfo.objects.create(order=self.order)
+
+    def test_unchanged_tracking_returns_304(self):
+        for url in [f'/api/orders/{self.order.id}/track/', f'/api/orders/track/{self.order.tracking_code}/']:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertIn('ETag', first)
+
+            with self.assertNumQueries(1):
+                second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(second.status_code, 304)
+
+            third = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(third.status_code, 304)
+
+    def test_delivery_change_produces_new_etag(self):
+        url = f'/api/orders/track/{self.order.tracking_code}/'
+        etag = self.client.get(url)['ETag']
+
+        self.delivery.delivery_status = 'in_transit'
+        self.delivery.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['delivery_status'], 'in_transit')
+
+    def test_missing_delivery_info_is_still_404(self):
+        order = make_order()
+
+        response = self.client.get(f'/api/orders/{order.id}/track/')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+
+class OrderSparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_authenticate(self.admin)
+        product = Product.objects.create(name='Lamp', description='Lamp', price=Decimal('2500.00'))
+        for _ in range(3):
+            order = make_order()
+            order.items.create(product=product, quantity=2, price=product.price)
+
+    def test_compact_order_list(self):
+        response = self.client.get('/api/orders/admin/?profile=compact')
+
+        row = response.data['results'][0]
+        self.assertEqual(
+            list(row), ['id', 'customer_name', 'total_price', 'status', 'total_items', 'created_at', 'tracking_code']
+        )
+        self.assertEqual(row['total_items'], 2)
+
+    def test_items_prefetch_dropped_when_not_selected(self):
+        with self.assertNumQueries(2):  # orders, items prefetch
+            self.client.get('/api/orders/admin/?fields=id,total_items')
+        with self.assertNumQueries(1):
+            self.client.get('/api/orders/admin/?fields=id,status')
+
+
+class OrderCreateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.products = [
+            Product.objects.create(
+                name=f'Product {index}', description='', price=Decimal('1000.00') * (index + 1),
+                estimated_delivery_days=index + 1,
+            )
+            for index in range(10)
+        ]
+        patcher = mock.patch('orders.views.send_order_confirmation')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def payload(self, products, quantity=1):
+        return {
+            'customer_name': 'Ada Obi', 'phone_number': '+2348012345678', 'address': '12 Allen Avenue',
+            'items': [{'product_id': product.pk, 'quantity': quantity} for product in products],
+        }
+
+    def create(self, products, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/orders/create/', self.payload(products, **kwargs), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response, len(queries.captured_queries)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        _, small = self.create(self.products[:1])
+        response, large = self.create(self.products, quantity=2)
+
+        self.assertEqual(small, large)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.items.count(), 10)
+        self.assertEqual(order.total_price, Decimal('110000.00'))
+
+    def test_delivery_info_uses_the_slowest_product(self):
+        response, _ = self.create([self.products[1], self.products[6]])
+
+        delivery = DeliveryInfo.objects.get(order_id=response.data['id'])
+        self.assertEqual(delivery.delivery_status, 'assigned')
+        expected = timezone.now() + timedelta(days=7)
+        self.assertLess(abs(delivery.estimated_delivery - expected), timedelta(minutes=1))
+
+    def test_unavailable_product_rejects_the_whole_order(self):
+        Product.objects.filter(pk=self.products[3].pk).update(in_stock=False)
+
+        response = self.client.post('/api/orders/create/', self.payload(self.products[:5]), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_item_values_are_rejected(self):
+        payload = self.payload(self.products[:1])
+        payload['items'][0]['quantity'] = 'two'
+
+        response = self.client.post('/api/orders/create/', payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+
+    def test_failure_after_order_insert_rolls_everything_back(self):
+        serializer = OrderCreateSerializer(data=self.payload(self.products[:3]))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        with mock.patch.object(DeliveryInfo.objects, 'create', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                serializer.save()
+
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+
+class TrackingCodeTests(TestCase):
+    def test_generated_codes_are_well_formed_and_distinct(self):
+        alphabet = set(string.ascii_uppercase + string.digits)
+        codes = [generate_tracking_code() for _ in range(5000)]
+        for code in codes:
+            self.assertEqual(len(code), 10)
+            self.assertLessEqual(set(code), alphabet)
+        self.assertEqual(len(set(codes)), len(codes))
+
+    def test_insert_has_no_pre_check_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            order = make_order()
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual([sql for sql in statements if not sql.startswith(('SAVEPOINT', 'RELEASE'))][0][:6], 'INSERT')
+        self.assertFalse(any(sql.startswith('SELECT') for sql in statements))
+        self.assertEqual(len(order.tracking_code), 10)
+
+    def test_collisions_retry_until_a_free_code(self):
+        rng = random.Random(7)
+        taken = [make_order().tracking_code for _ in range(5)]
+        for _ in range(20):
+            # Property: any run of collisions shorter than the attempt budget still saves, with a fresh code
+            collisions = rng.randrange(TRACKING_CODE_ATTEMPTS)
+            fresh = ''.join(rng.choices(string.ascii_uppercase, k=10))
+            codes = [rng.choice(taken) for _ in range(collisions)] + [fresh]
+            with mock.patch('orders.models.generate_tracking_code', side_effect=codes):
+                order = make_order()
+            self.assertEqual(order.tracking_code, fresh)
+            taken.append(fresh)
+        self.assertEqual(Order.objects.count(), 25)
+
+    def test_gives_up_after_the_attempt_budget(self):
+        taken = make_order().tracking_code
+        with mock.patch('orders.models.generate_tracking_code', return_value=taken):
+            with self.assertRaises(IntegrityError):
+                make_order()
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_explicit_code_is_kept(self):
+        self.assertEqual(make_order(tracking_code='CUSTOM0001').tracking_code, 'CUSTOM0001')
+
+
+class ConcurrentTrackingCodeTests(TransactionTestCase):
+    threads = 8
+    orders_per_thread = 10
+
+    def test_concurrent_inserts_with_colliding_codes(self):
+        # Every order's first attempt uses the same code, so all but one must retry
+        local = threading.local()
+
+        def colliding_codes(length=10):
+            local.calls = getattr(local, 'calls', 0) + 1
+            return 'COLLIDE000' if local.calls % 2 else generate_tracking_code(length)
+
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def insert():
+            # The in-memory test database is a shared-cache connection, whose table locks
+            # fail at once instead of waiting on the busy timeout; wait for them here
+            while True:
+                local.calls = 0
+                try:
+                    return make_order()
+                except OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    time.sleep(0.001)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.orders_per_thread):
+                    insert()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        with mock.patch('orders.models.generate_tracking_code', side_effect=colliding_codes):
+            workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        codes = list(Order.objects.values_list('tracking_code', flat=True))
+        self.assertEqual(len(codes), self.threads * self.orders_per_thread)
+        self.assertEqual(len(set(codes)), len(codes))
+        self.assertIn('COLLIDE000', codes)
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(name='Lamp', description='', price=Decimal('2500.00'))
+        patcher = mock.patch('orders.views.send_order_confirmation')
+        self.send_email = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def payload(self, quantity=1):
+        return {
+            'customer_name': 'Ada Obi', 'phone_number': '+2348012345678', 'address': '12 Allen Avenue',
+            'items': [{'product_id': self.product.pk, 'quantity': quantity}],
+        }
+
+    def post(self, payload=None, key='checkout-1'):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key is not None else {}
+        return self.client.post('/api/orders/create/', payload or self.payload(), format='json', **headers)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.post()
+
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', first)
+        # One indexed lookup of the key; products and orders are not touched
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.send_email.call_count, 1)
+        self.assertEqual(IdempotencyKey.objects.get().order_id, first.data['id'])
+
+    def test_fingerprint_ignores_key_order(self):
+        first = self.post()
+        reordered = dict(reversed(list(self.payload().items())))
+
+        self.assertEqual(self.post(reordered).data['id'], first.data['id'])
+
+    def test_key_reused_for_a_different_request(self):
+        self.post()
+
+        response = self.post(self.payload(quantity=2))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_requests_without_a_key_are_not_deduplicated(self):
+        self.post(key=None)
+        self.post(key=None)
+
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_invalid_key(self):
+        self.assertEqual(self.post(key='').status_code, 400)
+        self.assertEqual(self.post(key='x' * 256).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_failed_attempt_can_be_retried_with_the_same_key(self):
+        Product.objects.filter(pk=self.product.pk).update(in_stock=False)
+        self.assertEqual(self.post().status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        Product.objects.filter(pk=self.product.pk).update(in_stock=True)
+        response = self.post()
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_key_creates_a_new_order(self):
+        first = self.post()
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=25))
+
+        second = self.post()
+
+        self.assertEqual(second.status_code, 201)
+        self.assertNotEqual(second.data['id'], first.data['id'])
+        self.assertEqual(IdempotencyKey.objects.get().order_id, second.data['id'])
+
+    def test_purge_command_deletes_only_expired_keys(self):
+        self.post(key='old')
+        self.post(key='new')
+        IdempotencyKey.objects.filter(key='old').update(created_at=timezone.now() - timedelta(days=2))
+        out = StringIO()
+
+        call_command('purge_idempotency_keys', stdout=out)
+
+        self.assertIn('Purged 1 idempotency keys', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+        self.assertEqual(Order.objects.count(), 2)
+
+
+@override_settings(CATALOG_TASKS_ASYNC=False)
+class ConcurrentIdempotencyKeyTests(TransactionTestCase):
+    threads = 6
+
+    def test_concurrent_duplicates_create_one_order(self):
+        product = Product.objects.create(name='Lamp', description='', price=Decimal('2500.00'))
+        payload = {
+            'customer_name': 'Ada Obi', 'phone_number': '+2348012345678', 'address': '12 Allen Avenue',
+            'items': [{'product_id': product.pk, 'quantity': 1}],
+        }
+        barrier = threading.Barrier(self.threads)
+        responses, errors = [], []
+
+        def submit():
+            client = APIClient()
+            try:
+                barrier.wait()
+                while True:
+                    try:
+                        response = client.post(
+                            '/api/orders/create/', payload, format='json', HTTP_IDEMPOTENCY_KEY='same-checkout'
+                        )
+                        break
+                    except OperationalError as exc:
+                        # Shared-cache in-memory SQLite fails a blocked write at once instead of
+                        # waiting out the busy timeout as a file database does; retry like a client
+                        if 'locked' not in str(exc):
+                            raise
+                        time.sleep(0.001)
+                responses.append(response)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        with mock.patch('orders.views.send_order_confirmation'):
+            workers = [threading.Thread(target=submit) for _ in range(self.threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual([response.status_code for response in responses], [201] * self.threads)
+        self.assertEqual(len({response.data['id'] for response in responses}), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 1)
+
+
+class CheckoutStockTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lamp = Product.objects.create(name='Lamp', description='', price=Decimal('2500.00'), stock_quantity=3)
+        self.rake = Product.objects.create(name='Rake', description='', price=Decimal('1500.00'))
+        patcher = mock.patch('orders.views.send_order_confirmation')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, *lines):
+        return self.client.post('/api/orders/create/', {
+            'customer_name': 'Ada Obi', 'phone_number': '+2348012345678', 'address': '12 Allen Avenue',
+            'items': [{'product_id': product.pk, 'quantity': quantity} for product, quantity in lines],
+        }, format='json')
+
+    def test_checkout_takes_units_from_tracked_products_only(self):
+        response = self.post((self.lamp, 1), (self.rake, 5), (self.lamp, 1))
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.lamp.refresh_from_db()
+        self.rake.refresh_from_db()
+        self.assertEqual((self.lamp.stock_quantity, self.lamp.in_stock), (1, True))
+        self.assertEqual((self.rake.stock_quantity, self.rake.in_stock), (None, True))
+
+    def test_last_units_sell_out_the_product(self):
+        self.assertEqual(self.post((self.lamp, 3)).status_code, 201)
+
+        self.lamp.refresh_from_db()
+        self.assertEqual((self.lamp.stock_quantity, self.lamp.in_stock), (0, False))
+        self.assertEqual(self.post((self.lamp, 1)).status_code, 400)
+
+    def test_short_stock_rejects_the_whole_order(self):
+        with self.assertNoLogs('orders.views', level='ERROR'):
+            response = self.post((self.rake, 1), (self.lamp, 4))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, ['Only 3 left of Lamp.'])
+        self.assertFalse(Order.objects.exists())
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock_quantity, 3)
+
+
+@override_settings(CATALOG_TASKS_ASYNC=False)
+class StressCheckoutTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_oversell(self):
+        out = StringIO()
+
+        call_command('stress_checkout', threads=6, orders=60, stock=40, quantity=2, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('20 orders accepted, 40 rejected (sold out)', output)
+        self.assertIn('oversold: 0', output)
+        self.assertIn('No oversell', output)
+        # The fixture is cleaned up
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Product.objects.exists())
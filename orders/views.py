@@ -1,17 +1,24 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Order, DeliveryInfo
+from altivomart_backend.pagination import KeysetPagination
+from altivomart_backend.sparse import SparseFieldsetViewMixin
+from .idempotency import IDEMPOTENCY_HEADER, KEY_MAX_LENGTH, REPLAYED_HEADER, live_key, request_fingerprint
+from .models import Order, DeliveryInfo, IdempotencyKey
 from .serializers import (
     OrderCreateSerializer, OrderListSerializer, 
     OrderDetailSerializer, OrderStatusUpdateSerializer,
     DeliveryInfoSerializer, DeliveryStatusUpdateSerializer
 )
 from notifications.utils import send_order_confirmation, send_status_update
-from django.utils import timezone
-from datetime import timedelta
+from products.cooccurrence import schedule_order_recording
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,10 +30,52 @@ class OrderCreateView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
     def create(self, request, *args, **kwargs):
-        """Override to add detailed logging"""
+        """Override to add detailed logging and Idempotency-Key replays"""
         logger.info(f"Received order creation request")
         logger.info(f"Request data: {request.data}")
-        
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return self.create_order(request)
+        if not key or len(key) > KEY_MAX_LENGTH:
+            return Response(
+                {'detail': f'{IDEMPOTENCY_HEADER} must be 1-{KEY_MAX_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request.data)
+        stored = live_key(key)
+        if stored is None:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        # A concurrent duplicate waits on this insert until this attempt commits
+                        stored = IdempotencyKey.objects.create(key=key, fingerprint=fingerprint)
+                except IntegrityError:
+                    stored = None
+                else:
+                    response = self.create_order(request)
+                    if response.status_code != status.HTTP_201_CREATED:
+                        # Keep nothing, so the client can fix the request or retry with the same key
+                        transaction.set_rollback(True)
+                        return response
+                    stored.order_id = response.data['id']
+                    stored.response_status = response.status_code
+                    stored.response_body = response.data
+                    stored.save(update_fields=['order', 'response_status', 'response_body'])
+                    return response
+            # Lost the race: the first attempt has committed by now
+            stored = IdempotencyKey.objects.get(key=key)
+
+        if stored.fingerprint != fingerprint:
+            return Response(
+                {'detail': f'{IDEMPOTENCY_HEADER} was already used for a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        logger.info(f"Replaying order {stored.order_id} for {IDEMPOTENCY_HEADER} {key}")
+        return Response(stored.response_body, status=stored.response_status, headers={REPLAYED_HEADER: 'true'})
+
+    def create_order(self, request):
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
             logger.error(f"Order validation failed: {serializer.errors}")
@@ -39,45 +88,27 @@ class OrderCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         try:
             logger.info("Creating new order...")
-            order = serializer.save()
-            logger.info(f"Order {order.id} created successfully with tracking code {order.tracking_code}")
-            
-            # Send confirmation email (wrapped in try-except to prevent email failures from blocking order)
-            try:
-                send_order_confirmation(order)
-                logger.info(f"Order confirmation email sent for order {order.id}")
-            except UnicodeEncodeError as e:
-                logger.error(f"Unicode error sending email for order {order.id}: {e}")
-                # Order is still created, just email failed
-            except Exception as e:
-                logger.error(f"Error sending confirmation email for order {order.id}: {e}")
-            
-            # Create basic delivery info so tracking is available immediately
-            try:
-                # Determine estimated delivery based on items' products
-                max_days = 3
+            with transaction.atomic():
+                # Order, items and delivery info are written atomically by the serializer
+                order = serializer.save()
+                logger.info(f"Order {order.id} created successfully with tracking code {order.tracking_code}")
+                # Add the basket to the "frequently bought together" matrix off the request path
+                schedule_order_recording(order.id)
+
+                # Queue the confirmation email in the order's transaction (in a savepoint and
+                # try-except so an email failure never blocks the order)
                 try:
-                    item_days = []
-                    for item in order.items.all():
-                        days = getattr(item.product, 'estimated_delivery_days', None)
-                        if isinstance(days, int) and days > 0:
-                            item_days.append(days)
-                    if item_days:
-                        max_days = max(item_days)
+                    with transaction.atomic():
+                        send_order_confirmation(order)
+                    logger.info(f"Order confirmation email queued for order {order.id}")
+                except UnicodeEncodeError as e:
+                    logger.error(f"Unicode error queueing email for order {order.id}: {e}")
+                    # Order is still created, just email failed
                 except Exception as e:
-                    logger.warning(f"Error calculating delivery days: {e}")
-                
-                estimated = timezone.now() + timedelta(days=max_days)
-                DeliveryInfo.objects.create(
-                    order=order,
-                    delivery_status='assigned',
-                    estimated_delivery=estimated,
-                    delivery_notes='Delivery information initialized.',
-                )
-                logger.info(f"Delivery info created for order {order.id}")
-            except Exception as e:
-                logger.error(f"Error creating delivery info for order {order.id}: {e}")
-                # Do not fail order creation if delivery info init fails
+                    logger.error(f"Error queueing confirmation email for order {order.id}: {e}")
+        except ValidationError:
+            # Out-of-stock or invalid carts: an ordinary 400, not an error
+            raise
         except UnicodeEncodeError as e:
             logger.error(f"Unicode encoding error during order creation: {e}")
             raise
@@ -86,7 +117,7 @@ class OrderCreateView(generics.CreateAPIView):
             raise
 
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     """Public API for checking order status"""
     queryset = Order.objects.all()
     serializer_class = OrderDetailSerializer
@@ -95,18 +126,19 @@ class OrderDetailView(generics.RetrieveAPIView):
 
 
 # Admin Views
-class AdminOrderListView(generics.ListAPIView):
+class AdminOrderListView(SparseFieldsetViewMixin, generics.ListAPIView):
     """Admin API for listing all orders"""
-    queryset = Order.objects.all()
+    queryset = Order.objects.prefetch_related('items')
     serializer_class = OrderListSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'city', 'state']
     search_fields = ['customer_name', 'phone_number', 'address']
     ordering = ['-created_at']
 
 
-class AdminOrderDetailView(generics.RetrieveAPIView):
+class AdminOrderDetailView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     """Admin API for order details"""
     queryset = Order.objects.all()
     serializer_class = OrderDetailSerializer
@@ -122,11 +154,12 @@ def update_order_status(request, order_id):
     
     serializer = OrderStatusUpdateSerializer(order, data=request.data, partial=True)
     if serializer.is_valid():
-        serializer.save()
-        
-        # Send status update email if status changed
-        if old_status != order.status:
-            send_status_update(order, old_status)
+        with transaction.atomic():
+            serializer.save()
+
+            # Queue the status update email together with the change if status changed
+            if old_status != order.status:
+                send_status_update(order, old_status)
         
         return Response(
             OrderDetailSerializer(order).data,
@@ -190,20 +223,32 @@ def update_delivery_status(request, order_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def track_delivery(request, order_id):
-    """Public API to track delivery status"""
-    order = get_object_or_404(Order, id=order_id)
-    
-    if not hasattr(order, 'delivery_info'):
-        return Response(
-            {'error': 'Delivery information not available yet'}, 
-            status=status.HTTP_404_NOT_FOUND
-        )
-    
+def _tracking_validators(request, **lookup):
+    """(etag, last_modified) from the order/delivery timestamps, memoized per request"""
+    if not hasattr(request, '_tracking_validators'):
+        row = Order.objects.filter(**lookup).values_list('id', 'updated_at', 'delivery_info__updated_at').first()
+        if row is None or row[2] is None:
+            # Unknown order or no delivery info yet: let the view answer with a 404
+            request._tracking_validators = (None, None)
+        else:
+            digest = hashlib.md5(repr(row).encode('utf-8')).hexdigest()
+            request._tracking_validators = (f'W/"{digest}"', max(row[1], row[2]))
+    return request._tracking_validators
+
+
+def tracking_etag(request, order_id=None, code=None):
+    lookup = {'id': order_id} if order_id is not None else {'tracking_code': code}
+    return _tracking_validators(request, **lookup)[0]
+
+
+def tracking_last_modified(request, order_id=None, code=None):
+    lookup = {'id': order_id} if order_id is not None else {'tracking_code': code}
+    return _tracking_validators(request, **lookup)[1]
+
+
+def _tracking_response(order):
     delivery_info = order.delivery_info
-    return Response({
+    response = Response({
         'order_id': order.id,
         'tracking_code': order.tracking_code,
         'customer_name': order.customer_name,
@@ -215,28 +260,36 @@ def track_delivery(request, order_id):
         'last_attempt_date': delivery_info.last_attempt_date,
         'delivery_notes': delivery_info.delivery_notes,
     })
+    # Pollers must revalidate every time; unchanged state costs a 304
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@condition(etag_func=tracking_etag, last_modified_func=tracking_last_modified)
+def track_delivery(request, order_id):
+    """Public API to track delivery status"""
+    order = get_object_or_404(Order.objects.select_related('delivery_info'), id=order_id)
+    
+    if not hasattr(order, 'delivery_info'):
+        return Response(
+            {'error': 'Delivery information not available yet'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    return _tracking_response(order)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@condition(etag_func=tracking_etag, last_modified_func=tracking_last_modified)
 def track_by_code(request, code):
     """Public API to track delivery using tracking_code instead of numeric id"""
-    order = get_object_or_404(Order, tracking_code=code)
+    order = get_object_or_404(Order.objects.select_related('delivery_info'), tracking_code=code)
     if not hasattr(order, 'delivery_info'):
         return Response(
             {'error': 'Delivery information not available yet'},
             status=status.HTTP_404_NOT_FOUND
         )
-    delivery_info = order.delivery_info
-    return Response({
-        'order_id': order.id,
-        'tracking_code': order.tracking_code,
-        'customer_name': order.customer_name,
-        'status': order.status,
-        'delivery_status': delivery_info.delivery_status,
-        'estimated_delivery': delivery_info.estimated_delivery,
-        'tracking_number': delivery_info.tracking_number,
-        'delivery_attempts': delivery_info.delivery_attempts,
-        'last_attempt_date': delivery_info.last_attempt_date,
-        'delivery_notes': delivery_info.delivery_notes,
-    })
+    return _tracking_response(order)
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django import forms
 from django.core.exceptions import ValidationError
 import json
-from .models import Product, ProductImage, ProductVideo, Category
+from .models import Product, ProductImage, ProductVideo, Category, Tag
 
 
 class ProductImageInline(admin.TabularInline):
@@ -121,16 +121,19 @@ class ProductAdminForm(forms.ModelForm):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     form = ProductAdminForm
-    list_display = ['name', 'formatted_price', 'brand', 'in_stock', 'category', 'featured', 'created_at']
+    list_display = [
+        'name', 'sku', 'formatted_price', 'brand', 'stock_quantity', 'in_stock', 'category', 'featured', 'created_at'
+    ]
     list_filter = ['in_stock', 'category', 'featured', 'brand', 'created_at']
-    search_fields = ['name', 'description', 'brand', 'tags']
-    list_editable = ['in_stock', 'featured']
+    search_fields = ['name', 'sku', 'description', 'brand', 'tags']
+    # in_stock is derived from stock_quantity once that is set, so quantities are edited here
+    list_editable = ['stock_quantity', 'featured']
     inlines = [ProductImageInline, ProductVideoInline]
     readonly_fields = ['created_at', 'updated_at', 'formatted_price', 'details_list_display', 'benefits_list_display']
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('name', 'description', 'price', 'in_stock', 'category', 'featured')
+            'fields': ('name', 'sku', 'description', 'price', 'stock_quantity', 'in_stock', 'category', 'featured')
         }),
         ('Product Details & Brand', {
             'fields': ('brand', 'details_input', 'benefits_input'),
@@ -189,6 +192,17 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name']
 
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug']
+    search_fields = ['name', 'slug']
+    readonly_fields = ['slug']
+
+    def has_add_permission(self, request):
+        # Tags are created from Product.tags by sync_product_tags, which also sets the slug
+        return False
+
+
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ['product', 'alt_text', 'is_primary', 'created_at']
@@ -201,12 +215,18 @@ class ProductVideoAdmin(admin.ModelAdmin):
     list_filter = ['is_featured', 'autoplay', 'loop', 'muted', 'created_at']
     search_fields = ['product__name', 'title', 'description']
     list_editable = ['is_featured', 'autoplay']
-    readonly_fields = ['file_size_mb', 'created_at']
+    readonly_fields = [
+        'file_size_mb', 'duration_seconds', 'width', 'height', 'codec', 'content_hash', 'faststart', 'created_at'
+    ]
     
     fieldsets = (
         ('Video File', {
             'fields': ('product', 'video', 'file_size_mb')
         }),
+        ('Video Metadata', {
+            'fields': ('duration_seconds', 'width', 'height', 'codec', 'content_hash', 'faststart'),
+            'classes': ('collapse',)
+        }),
         ('Video Information', {
             'fields': ('title', 'description')
         }),
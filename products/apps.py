@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals  # noqa: F401
+        from .search import reinstall_search_triggers
+
+        post_migrate.connect(reinstall_search_triggers, sender=self)
@@ -0,0 +1,56 @@
+"""
+Catalog maintenance that must stay off the request path (homepage bundle, similar
+products, order basket co-occurrence).
+
+A CoalescingTask runs `func(items)` on a single shared worker thread once the
+scheduling transaction commits. Items scheduled while a run is already queued are
+merged into it, so a burst of writes costs one queued run. One worker for all tasks
+also keeps their writes from competing for the SQLite write lock. With
+CATALOG_TASKS_ASYNC = False, runs happen inline after commit (tests, scripts).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='catalog-tasks')
+
+
+class CoalescingTask:
+    def __init__(self, func):
+        self.func = func
+        self.lock = threading.Lock()
+        self.items = set()
+        self.queued = False
+
+    def schedule(self, *items):
+        """Run after the current transaction commits (immediately outside one)"""
+        transaction.on_commit(lambda: self._submit(items))
+
+    def _submit(self, items):
+        with self.lock:
+            self.items.update(items)
+            if self.queued:
+                return
+            self.queued = True
+        if settings.CATALOG_TASKS_ASYNC:
+            _executor.submit(self._run)
+        else:
+            self._run()
+
+    def _run(self):
+        with self.lock:
+            items, self.items = self.items, set()
+            self.queued = False
+        try:
+            self.func(items)
+        except Exception:
+            logger.exception(f'Background task {self.func.__name__} failed')
+        finally:
+            if settings.CATALOG_TASKS_ASYNC:
+                # Worker thread: don't leave its connection open between runs
+                connection.close()
@@ -0,0 +1,72 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def _initial_version():
+    # Time-based so a lost/evicted counter never restarts at a value with live cache entries
+    return int(time.time() * 1000)
+
+
+def get_catalog_version():
+    """Current catalog version, shared by every worker through the cache backend"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _initial_version(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, _initial_version())
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every catalog cache entry by moving to a new version"""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, _initial_version(), timeout=None)
+
+
+def invalidate_catalog():
+    """
+    Bump the catalog version now (so the writing request sees its own change) and again
+    once the transaction commits (so no worker caches pre-commit rows under the new version).
+    """
+    bump_catalog_version()
+    if connection.in_atomic_block:
+        transaction.on_commit(bump_catalog_version)
+
+
+def catalog_cache_key(prefix, request):
+    """Cache key for a request: host + path + normalized query string + catalog version"""
+    # Keys sorted, values kept in order (single-valued filters use the last one) and
+    # percent-encoded, so ?q=a,b and ?q=a&q=b never share a key
+    params = sorted(
+        (key, [value for value in values if value != ''])
+        for key, values in request.query_params.lists()
+    )
+    query = urlencode([(key, values) for key, values in params if values], doseq=True)
+    raw = f'{request.build_absolute_uri(request.path)}?{query}'
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'catalog:{prefix}:{get_catalog_version()}:{digest}'
+
+
+class CatalogCacheMixin:
+    """Serve GET responses from the shared cache until the catalog version changes"""
+    catalog_cache_prefix = 'response'
+
+    def get(self, request, *args, **kwargs):
+        key = catalog_cache_key(self.catalog_cache_prefix, request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,325 @@
+"""
+Streaming catalog import/export (CSV or JSON Lines), keyed on Product.sku.
+
+Rows are read and written one at a time, so memory stays flat regardless of file
+size. Imports upsert in batches: one bulk_create(update_conflicts=True) per batch
+(INSERT ... ON CONFLICT(sku) DO UPDATE), each batch in its own transaction. Only the
+columns a row supplies are written, so a file with just sku,name,price leaves stock,
+category, tags etc. of existing products alone. Categories are resolved from an
+in-memory name map. Images given as local paths are copied into storage (with
+derivatives) on a thread pool and only attached to products that have no images yet,
+so re-running an import is safe.
+"""
+import csv
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.core.files import File
+from django.db import transaction
+
+from .imaging import build_derivatives, srcset
+from .models import Category, Product, ProductImage, refresh_category_counts, sync_product_tags
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+
+# Column order for exports; imports accept any subset as long as sku, name and price are present
+FIELDS = [
+    'sku', 'name', 'description', 'price', 'stock_quantity', 'in_stock', 'category', 'brand', 'how_to_use',
+    'estimated_delivery_days', 'product_details', 'product_benefits', 'tags', 'featured', 'images',
+]
+LIST_FIELDS = ('product_details', 'product_benefits', 'images')
+# CSV cells hold lists as `a|b|c`
+LIST_SEPARATOR = '|'
+
+# Columns an upsert may overwrite; each batch writes only those its rows supply (plus updated_at)
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'stock_quantity', 'in_stock', 'category', 'brand', 'how_to_use',
+    'estimated_delivery_days', 'product_details', 'product_benefits', 'tags', 'featured',
+]
+IMAGE_WORKERS = 4
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(fileobj, fmt):
+    """Yield dicts from a CSV (header row) or JSON Lines stream"""
+    if fmt == 'csv':
+        yield from csv.DictReader(fileobj)
+        return
+    for line_number, line in enumerate(fileobj, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield {'_error': f'line {line_number}: {exc}'}
+
+
+def _as_list(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value).split(LIST_SEPARATOR) if item.strip()]
+
+
+def _as_bool(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def _as_quantity(value):
+    # Blank: stock not tracked, in_stock is taken as given
+    if value is None or value == '':
+        return None
+    quantity = int(value)
+    if quantity < 0:
+        raise ValueError(quantity)
+    return quantity
+
+
+# Optional columns and their cleaners; a cleaner raises TypeError/ValueError on bad input
+OPTIONAL_FIELDS = {
+    'description': lambda value: str(value or ''),
+    'stock_quantity': _as_quantity,
+    'in_stock': lambda value: _as_bool(value, True),
+    'category': lambda value: str(value or '').strip(),
+    'brand': lambda value: str(value or '').strip() or None,
+    'how_to_use': lambda value: str(value or '') or None,
+    'estimated_delivery_days': lambda value: int(value or 3),
+    'product_details': _as_list,
+    'product_benefits': _as_list,
+    'tags': lambda value: str(value or '').strip() or None,
+    'featured': lambda value: _as_bool(value, False),
+    'images': _as_list,
+}
+
+
+def clean_row(row):
+    """
+    Validate a raw row into model-ready values; raises RowError.
+
+    Optional columns missing from the row are missing from the result too, so the
+    upsert leaves them untouched on existing products (new ones get model defaults).
+    """
+    if '_error' in row:
+        raise RowError(row['_error'])
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    if not sku:
+        raise RowError('sku is required')
+    if not name:
+        raise RowError(f'{sku}: name is required')
+    try:
+        price = Decimal(str(row.get('price')).strip())
+    except (InvalidOperation, TypeError):
+        raise RowError(f'{sku}: invalid price {row.get("price")!r}')
+
+    cleaned = {'sku': sku, 'name': name, 'price': price}
+    for field, clean in OPTIONAL_FIELDS.items():
+        if field not in row:
+            continue
+        try:
+            cleaned[field] = clean(row[field])
+        except (TypeError, ValueError):
+            raise RowError(f'{sku}: invalid {field}')
+    if cleaned.get('stock_quantity') is not None:
+        # bulk upserts skip Product.save, so derive in_stock from a quantity here
+        cleaned['in_stock'] = cleaned['stock_quantity'] > 0
+    return cleaned
+
+
+class CatalogImporter:
+    """Upserts cleaned rows in batches; call `feed()` per row and `finish()` at the end"""
+
+    def __init__(self, batch_size=500, image_root=None, workers=IMAGE_WORKERS, progress=None):
+        self.batch_size = batch_size
+        self.image_root = image_root
+        self.workers = workers
+        self.progress = progress
+        self.categories = {category.name.lower(): category for category in Category.objects.all()}
+        self.image_field = ProductImage._meta.get_field('image')
+        self.batch = {}
+        self.created = self.updated = self.images = 0
+        self.errors = []
+
+    def feed(self, row):
+        try:
+            cleaned = clean_row(row)
+        except RowError as exc:
+            self.errors.append(str(exc))
+            return
+        # Last occurrence of a SKU in a batch wins
+        self.batch[cleaned['sku']] = cleaned
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def finish(self):
+        if self.batch:
+            self.flush()
+
+    def flush(self):
+        rows, self.batch = list(self.batch.values()), {}
+        self._resolve_categories(rows)
+
+        with transaction.atomic():
+            # Existing rows: image counts decide on image attachment, old categories need recounting
+            existing = Product.objects.filter(sku__in=[row['sku'] for row in rows]).values_list(
+                'sku', 'image_count', 'category_id'
+            )
+            image_counts, touched_categories = {}, set()
+            for sku, image_count, category_id in existing:
+                image_counts[sku] = image_count
+                touched_categories.add(category_id)
+            # One INSERT ... ON CONFLICT(sku) DO UPDATE per set of supplied columns (one for a
+            # CSV file); pks come back for both cases
+            groups = {}
+            for row in rows:
+                columns = tuple(field for field in UPDATE_FIELDS if field in row)
+                groups.setdefault(columns, []).append(row)
+            products, tagged = [], []
+            for columns, group in groups.items():
+                batch = []
+                for row in group:
+                    values = {field: row[field] for field in columns}
+                    if 'category' in values:
+                        values['category'] = self.categories.get(row['category'].lower()) if row['category'] else None
+                    batch.append(Product(sku=row['sku'], **values))
+                Product.objects.bulk_create(
+                    batch, batch_size=self.batch_size,
+                    update_conflicts=True, unique_fields=['sku'], update_fields=[*columns, 'updated_at'],
+                )
+                products += batch
+                if 'tags' in columns:
+                    tagged += batch
+            self.created += len(rows) - len(image_counts)
+            self.updated += len(image_counts)
+            # bulk_create skips Product.save() and its signals, so keep the tag index and counts in step here
+            sync_product_tags(tagged)
+            refresh_category_counts(touched_categories | {product.category_id for product in products})
+
+            for product in products:
+                product.image_count = image_counts.get(product.sku, 0)
+            self._attach_images(rows, {product.sku: product for product in products})
+
+        if self.progress:
+            self.progress(self)
+
+    def _resolve_categories(self, rows):
+        missing = {
+            row['category'] for row in rows
+            if row.get('category') and row['category'].lower() not in self.categories
+        }
+        new = {name.lower(): Category(name=name) for name in missing}
+        for category in Category.objects.bulk_create(new.values()):
+            self.categories[category.name.lower()] = category
+
+    def _attach_images(self, rows, products):
+        if not self.image_root:
+            return
+        wanted = [
+            (products[row['sku']], path) for row in rows for path in row.get('images', [])
+            if products[row['sku']].image_count == 0
+        ]
+        if not wanted:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            stored = list(pool.map(lambda item: (item[0], self._store_image(item[1])), wanted))
+
+        images, summaries = [], {}
+        for product, result in stored:
+            if result is None:
+                continue
+            name, derivatives = result
+            is_primary = product.pk not in summaries
+            images.append(ProductImage(
+                product=product, image=name, alt_text=f'Image for {product.name}',
+                is_primary=is_primary, derivatives=derivatives,
+            ))
+            if is_primary:
+                product.primary_image_url = self.image_field.storage.url(name)
+                product.primary_image_srcset = srcset(derivatives, self.image_field.storage)
+                summaries[product.pk] = product
+            product.image_count += 1
+
+        # bulk_create skips ProductImage.save(), so maintain the media summary columns here
+        ProductImage.objects.bulk_create(images, batch_size=self.batch_size)
+        Product.objects.bulk_update(
+            summaries.values(), ['primary_image_url', 'primary_image_srcset', 'image_count'],
+            batch_size=self.batch_size
+        )
+        self.images += len(images)
+
+    def _store_image(self, path):
+        full_path = path if os.path.isabs(path) else os.path.join(self.image_root, path)
+        try:
+            with open(full_path, 'rb') as source:
+                name = self.image_field.generate_filename(None, os.path.basename(full_path))
+                name = self.image_field.storage.save(name, File(source, name=name))
+            return name, build_derivatives(name, self.image_field.storage)
+        except OSError as exc:
+            self.errors.append(f'image {path}: {exc}')
+            return None
+
+
+def export_rows(queryset):
+    """Yield export dicts for products, streaming with a chunked iterator"""
+    queryset = queryset.select_related('category').prefetch_related(
+        'images'
+    ).order_by('id')
+    for product in queryset.iterator(chunk_size=1000):
+        images = sorted(product.images.all(), key=lambda image: (not image.is_primary, image.created_at))
+        yield {
+            'sku': product.sku or '',
+            'name': product.name,
+            'description': product.description,
+            'price': str(product.price),
+            'stock_quantity': '' if product.stock_quantity is None else product.stock_quantity,
+            'in_stock': product.in_stock,
+            'category': product.category.name if product.category else '',
+            'brand': product.brand or '',
+            'how_to_use': product.how_to_use or '',
+            'estimated_delivery_days': product.estimated_delivery_days,
+            'product_details': product.details_list,
+            'product_benefits': product.benefits_list,
+            'tags': product.tags or '',
+            'featured': product.featured,
+            'images': [image.image.name for image in images if image.image],
+        }
+
+
+def write_rows(rows, fileobj, fmt):
+    """Write export dicts as CSV or JSON Lines; returns the row count"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(fileobj, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({
+                field: LIST_SEPARATOR.join(value) if field in LIST_FIELDS else value
+                for field, value in row.items()
+            })
+            count += 1
+        return count
+    for row in rows:
+        fileobj.write(json.dumps(row, ensure_ascii=False) + '\n')
+        count += 1
+    return count
@@ -0,0 +1,198 @@
+"""
+"Frequently bought together" from order baskets.
+
+Every order's distinct products form a row of a sparse basket matrix B (orders x
+products); the co-occurrence matrix is C = Bᵀ B, so C[a, b] counts orders with
+both a and b and the diagonal C[a, a] counts orders with a. C is stored in
+ProductCooccurrence and maintained incrementally: new orders are turned into their
+own small Bᵀ B and added with one upsert per pair, never recomputed from scratch.
+Orders are claimed through Order.basket_recorded, so each basket is counted once.
+
+Companions are ranked by cosine similarity C[a, b] / sqrt(C[a, a] C[b, b]), which
+keeps best-sellers from topping every list, and the top RELATED_TOP_K per product
+are kept in RelatedProduct for the /related/ endpoint. After an incremental update
+only the products in the new baskets are re-ranked; their partners' scores drift
+slightly as frequencies change until the next full rebuild (build_related_products
+--full).
+"""
+import itertools
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import F
+from scipy import sparse
+
+from orders.models import Order, OrderItem
+
+from .background import CoalescingTask
+from .models import ProductCooccurrence, RelatedProduct
+
+RELATED_TOP_K = 10
+# Pairs bought together fewer times than this are never recommended
+MIN_SUPPORT = 1
+WRITE_BATCH_SIZE = 10000
+READ_CHUNK_SIZE = 20000
+
+
+def basket_arrays(items):
+    """(order_ids, product_ids) int64 arrays from a values_list('order_id', 'product_id') queryset"""
+    flat = np.fromiter(
+        itertools.chain.from_iterable(items.iterator(chunk_size=READ_CHUNK_SIZE)), dtype=np.int64
+    ).reshape(-1, 2)
+    return flat[:, 0], flat[:, 1]
+
+
+def cooccurrence_counts(order_ids, product_ids):
+    """(product, other, count) arrays of Bᵀ B for the given basket lines, diagonal included"""
+    if len(order_ids) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    orders, rows = np.unique(order_ids, return_inverse=True)
+    products, cols = np.unique(product_ids, return_inverse=True)
+    baskets = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(orders), len(products))
+    )
+    # A product listed twice in one order still counts once
+    baskets.sum_duplicates()
+    baskets.data[:] = 1
+    matrix = (baskets.T @ baskets).tocoo()
+    return products[matrix.row], products[matrix.col], matrix.data.astype(np.int64)
+
+
+def rank_companions(product, other, count, frequencies, k=RELATED_TOP_K):
+    """
+    Top-k companions per product, vectorized.
+
+    `frequencies` is a (product_ids, order_counts) pair covering every id in `product`
+    and `other`. Returns (product, related, rank, score, count) arrays.
+    """
+    freq_ids, freq_counts = frequencies
+    order = np.argsort(freq_ids)
+    freq_ids, freq_counts = freq_ids[order], freq_counts[order]
+
+    keep = (product != other) & (count >= MIN_SUPPORT)
+    product, other, count = product[keep], other[keep], count[keep]
+    score = count / np.sqrt(
+        freq_counts[np.searchsorted(freq_ids, product)].astype(np.float64) *
+        freq_counts[np.searchsorted(freq_ids, other)]
+    )
+
+    # Group by product, best score first; ties go to the more frequent pair, then the lower id
+    order = np.lexsort((other, -count, -score, product))
+    product, other, count, score = product[order], other[order], count[order], score[order]
+    starts = np.flatnonzero(np.r_[True, product[1:] != product[:-1]])
+    rank = np.arange(len(product)) - np.repeat(starts, np.diff(np.r_[starts, len(product)]))
+    top = rank < k
+    return product[top], other[top], rank[top], score[top], count[top]
+
+
+def _diagonal(product, other, count):
+    diagonal = product == other
+    return product[diagonal], count[diagonal]
+
+
+def _write_related(product, related, rank, score, count):
+    RelatedProduct.objects.bulk_create(
+        [
+            RelatedProduct(product_id=p, related_id=r, rank=n, score=float(s), count=c)
+            for p, r, n, s, c in zip(product.tolist(), related.tolist(), rank.tolist(), score.tolist(), count.tolist())
+        ],
+        batch_size=WRITE_BATCH_SIZE,
+    )
+
+
+def _write_pairs(product, other, count, increment=False):
+    """INSERT the pairs; with `increment`, add to existing counts (ON CONFLICT DO UPDATE)"""
+    quote = connection.ops.quote_name
+    table, count_column = quote(ProductCooccurrence._meta.db_table), quote('count')
+    sql = f'INSERT INTO {table} (product_id, other_id, {count_column}) VALUES (%s, %s, %s)'
+    if increment:
+        sql += (
+            f' ON CONFLICT (product_id, other_id)'
+            f' DO UPDATE SET {count_column} = {table}.{count_column} + excluded.{count_column}'
+        )
+    rows = list(zip(product.tolist(), other.tolist(), count.tolist()))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + WRITE_BATCH_SIZE])
+
+
+def rebuild_related_products():
+    """Recompute the whole matrix and every top-k list from all orders; returns the order count"""
+    with transaction.atomic():
+        # Claim first: the write lock keeps concurrent recorders out until we commit, and
+        # orders committed by others meanwhile stay unclaimed for the next sweep
+        Order.objects.filter(basket_recorded=False).update(basket_recorded=True)
+        order_ids, product_ids = basket_arrays(
+            OrderItem.objects.filter(order__basket_recorded=True).values_list('order_id', 'product_id')
+        )
+        product, other, count = cooccurrence_counts(order_ids, product_ids)
+
+        ProductCooccurrence.objects.all().delete()
+        RelatedProduct.objects.all().delete()
+        _write_pairs(product, other, count)
+        _write_related(*rank_companions(product, other, count, _diagonal(product, other, count)))
+    return len(np.unique(order_ids))
+
+
+def refresh_related(product_ids):
+    """Re-rank the top-k lists of the given products from the stored matrix"""
+    product_ids = list(product_ids)
+    pairs = ProductCooccurrence.objects.filter(product_id__in=product_ids).values_list(
+        'product_id', 'other_id', 'count'
+    )
+    product, other, count = np.array(list(pairs), dtype=np.int64).reshape(-1, 3).T
+    # Partner frequencies come from their diagonal cells
+    diagonal = ProductCooccurrence.objects.filter(
+        product_id__in=np.unique(other).tolist(), other_id=F('product_id')
+    ).values_list('product_id', 'count')
+    frequencies = np.array(list(diagonal), dtype=np.int64).reshape(-1, 2).T
+
+    RelatedProduct.objects.filter(product_id__in=product_ids).delete()
+    _write_related(*rank_companions(product, other, count, frequencies))
+
+
+def record_orders(order_ids):
+    """Add the given orders' baskets to the matrix (once each); returns the number recorded"""
+    with transaction.atomic():
+        pending = list(Order.objects.filter(pk__in=order_ids, basket_recorded=False).values_list('pk', flat=True))
+        if not pending:
+            return 0
+        claimed = Order.objects.filter(pk__in=pending, basket_recorded=False).update(basket_recorded=True)
+        if claimed != len(pending):
+            # Another worker got some of them first; leave the rest to the next sweep
+            transaction.set_rollback(True)
+            return 0
+
+        order_ids, product_ids = basket_arrays(
+            OrderItem.objects.filter(order_id__in=pending).values_list('order_id', 'product_id')
+        )
+        product, other, count = cooccurrence_counts(order_ids, product_ids)
+        if len(product):
+            _write_pairs(product, other, count, increment=True)
+            refresh_related(np.unique(product).tolist())
+    return len(pending)
+
+
+def record_pending_orders(batch_size=1000):
+    """Record every order not yet in the matrix, oldest first; returns the number recorded"""
+    recorded = 0
+    while True:
+        batch = list(
+            Order.objects.filter(basket_recorded=False).order_by('id').values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return recorded
+        done = record_orders(batch)
+        if not done:
+            # Lost a race for this batch: take what is left one order at a time
+            done = sum(record_orders([pk]) for pk in batch)
+        recorded += done
+
+
+_record_task = CoalescingTask(record_orders)
+
+
+def schedule_order_recording(*order_ids):
+    """Record new orders' baskets on the background worker once their transaction commits"""
+    _record_task.schedule(*order_ids)
@@ -0,0 +1,104 @@
+"""
+Facet counts for the product filter sidebar.
+
+Facets count exactly what the public listing (/api/products/) would return for the
+same query string: in-stock products only, filtered by ProductFilter (`category`,
+`brand`, `featured`, `min_price`, `max_price`, ...), `?q=` and `?tag=`. Facets are
+disjunctive: the counts for one facet apply every *other* active filter, so selecting
+brand=Solar still shows how many products each other brand has, and the price buckets
+ignore `min_price`/`max_price`. That costs exactly one grouped query per facet
+(category, brand, price buckets) no matter how many values or filters there are; the
+total is derived from the category facet without another query. Responses are cached
+per catalog version by the view.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Q
+from django_filters.utils import translate_validation
+
+from .filters import ProductFilter
+from .models import IN_STOCK, Product
+from .search import build_match_expression
+from .tagging import parse_tags
+
+# (key, label, lower bound inclusive, upper bound exclusive) in Naira
+PRICE_BUCKETS = [
+    ('under-5000', 'Under ₦5,000', None, Decimal('5000')),
+    ('5000-20000', '₦5,000 – ₦20,000', Decimal('5000'), Decimal('20000')),
+    ('20000-50000', '₦20,000 – ₦50,000', Decimal('20000'), Decimal('50000')),
+    ('50000-100000', '₦50,000 – ₦100,000', Decimal('50000'), Decimal('100000')),
+    ('100000-plus', '₦100,000 and above', Decimal('100000'), None),
+]
+# facet -> the ProductFilter params it ignores when counting its own values
+FACETS = {
+    'category': ('category',),
+    'brand': ('brand',),
+    'price': ('min_price', 'max_price'),
+}
+
+
+def _bucket_q(lower, upper):
+    q = Q()
+    if lower is not None:
+        q &= Q(price__gte=lower)
+    if upper is not None:
+        q &= Q(price__lt=upper)
+    return q
+
+
+def base_queryset(params):
+    """In-stock products matching the non-FilterSet filters (?q= full-text, ?tag=), as the listing does"""
+    queryset = Product.objects.filter(IN_STOCK)
+    query = params.get('q', '').strip()
+    if query:
+        expression = build_match_expression(query)
+        if not expression:
+            return queryset.none()
+        queryset = queryset.filter(search_index__document__match=expression)
+    for value in params.getlist('tag'):
+        for slug, _ in parse_tags(value):
+            queryset = queryset.filter(tag_links__tag__slug=slug)
+    return queryset
+
+
+def compute_facets(params):
+    """Facet counts for a listing query string (a QueryDict); invalid filters raise a 400 as the listing does"""
+    base = base_queryset(params)
+    filterset = ProductFilter(params, queryset=base)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+
+    def excluding(facet):
+        data = params.copy()
+        for name in FACETS[facet]:
+            data.pop(name, None)
+        return ProductFilter(data, queryset=base).qs.order_by()
+
+    categories = list(excluding('category').values('category_id', 'category__name').annotate(
+        count=Count('id')
+    ).order_by('-count', 'category__name'))
+    brands = excluding('brand').exclude(brand__isnull=True).exclude(brand='').values('brand').annotate(
+        count=Count('id')
+    ).order_by('-count', 'brand')
+    prices = excluding('price').aggregate(**{
+        key: Count('id', filter=_bucket_q(lower, upper)) for key, _, lower, upper in PRICE_BUCKETS
+    })
+
+    # Every other filter is applied to the category facet, so the total is its selected slice
+    selected = filterset.form.cleaned_data.get('category')
+    total = sum(
+        row['count'] for row in categories
+        if selected is None or row['category_id'] == selected.pk
+    )
+
+    return {
+        'total': total,
+        'category': [
+            {'id': row['category_id'], 'name': row['category__name'] or 'Uncategorized', 'count': row['count']}
+            for row in categories
+        ],
+        'brand': [{'value': row['brand'], 'count': row['count']} for row in brands],
+        'price': [
+            {'key': key, 'label': label, 'count': prices[key]} for key, label, _, _ in PRICE_BUCKETS
+        ],
+    }
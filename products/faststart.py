@@ -0,0 +1,193 @@
+"""
+Pure-Python MP4 "faststart": move the `moov` box in front of `mdat`.
+
+Browsers need `moov` (the sample index) before they can play anything, so an MP4
+with `moov` at the end must be almost fully downloaded first. Relocating it means
+every chunk offset (`stco`/`co64`) shifts by the size of `moov`; tables that would
+overflow 32 bits are upgraded from `stco` to `co64`. Only `moov` is held in memory,
+the rest of the file is streamed.
+"""
+import os
+import shutil
+import struct
+import tempfile
+
+from .media_probe import iter_boxes
+
+CHUNK_SIZE = 1024 * 1024
+
+# moov is normally a few hundred KB; refuse pathological files instead of buffering them
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+# Boxes that only contain other boxes on the path from moov to the chunk offset tables
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+
+class FaststartError(ValueError):
+    pass
+
+
+def _top_level_boxes(fileobj, size):
+    """[(type, box_start, box_end)] for top-level boxes (box_start includes the header)"""
+    boxes = []
+    offset = 0
+    for box_type, _, box_end in iter_boxes(fileobj, 0, size):
+        boxes.append((box_type, offset, box_end))
+        offset = box_end
+    return boxes
+
+
+def _parse_children(data):
+    """Split a container payload into [(type, payload)]"""
+    children = []
+    offset = 0
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header_size = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header_size or offset + size > len(data):
+            raise FaststartError(f'Corrupt box {box_type!r} inside moov')
+        children.append((box_type, data[offset + header_size:offset + size]))
+        offset += size
+    return children
+
+
+def _box(box_type, payload):
+    size = len(payload) + 8
+    if size > 0xFFFFFFFF:
+        return struct.pack('>I4sQ', 1, box_type, size + 8) + payload
+    return struct.pack('>I4s', size, box_type) + payload
+
+
+def _shift_offsets(box_type, payload, shift, force_co64):
+    """Return (type, payload) for a stco/co64 box with every chunk offset moved by `shift`"""
+    version_flags = payload[:4]
+    (count,) = struct.unpack('>I', payload[4:8])
+    if box_type == b'stco':
+        offsets = struct.unpack(f'>{count}I', payload[8:8 + 4 * count])
+    else:
+        offsets = struct.unpack(f'>{count}Q', payload[8:8 + 8 * count])
+    offsets = [offset + shift for offset in offsets]
+
+    if box_type == b'stco' and not force_co64 and (not offsets or max(offsets) <= 0xFFFFFFFF):
+        return b'stco', version_flags + struct.pack(f'>I{count}I', count, *offsets)
+    return b'co64', version_flags + struct.pack(f'>I{count}Q', count, *offsets)
+
+
+def _rewrite(box_type, payload, shift, force_co64):
+    if box_type in (b'stco', b'co64'):
+        box_type, payload = _shift_offsets(box_type, payload, shift, force_co64)
+        return _box(box_type, payload)
+    if box_type in CONTAINER_BOXES:
+        return _box(box_type, b''.join(
+            _rewrite(child_type, child_payload, shift, force_co64)
+            for child_type, child_payload in _parse_children(payload)
+        ))
+    return _box(box_type, payload)
+
+
+def relocate_moov(moov_payload, shift, force_co64=False):
+    """Serialize moov with chunk offsets moved by `shift` bytes"""
+    return _rewrite(b'moov', moov_payload, shift, force_co64)
+
+
+def _moov_mdat_order(fileobj):
+    """Top-level index of (moov, first mdat), or None if the file is not an MP4 with both"""
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    try:
+        types = [box_type for box_type, _, _ in _top_level_boxes(fileobj, size)]
+    except (ValueError, struct.error):
+        return None
+    if b'moov' not in types or b'mdat' not in types:
+        return None
+    return types.index(b'moov'), types.index(b'mdat')
+
+
+def needs_faststart(fileobj):
+    """True if the file is an MP4 whose moov box comes after its first mdat"""
+    order = _moov_mdat_order(fileobj)
+    return order is not None and order[0] > order[1]
+
+
+def is_faststart(fileobj):
+    """True if the file is an MP4 whose moov box precedes the media data"""
+    order = _moov_mdat_order(fileobj)
+    return order is not None and order[0] < order[1]
+
+
+def faststart(source, destination):
+    """
+    Copy `source` to `destination` with moov placed before the media data.
+
+    Returns False (writing nothing) if the file is already fast-start or is not an MP4.
+    """
+    source.seek(0, 2)
+    size = source.tell()
+    try:
+        boxes = _top_level_boxes(source, size)
+    except (ValueError, struct.error):
+        return False
+
+    types = [box_type for box_type, _, _ in boxes]
+    if b'moov' not in types or b'mdat' not in types or types.index(b'moov') < types.index(b'mdat'):
+        return False
+    if types.count(b'moov') != 1:
+        raise FaststartError('Multiple moov boxes')
+
+    _, moov_start, moov_end = boxes[types.index(b'moov')]
+    _, insert_at, _ = boxes[types.index(b'mdat')]
+    if moov_end - moov_start > MAX_MOOV_SIZE:
+        raise FaststartError('moov box too large to relocate')
+
+    source.seek(moov_start)
+    moov_box = source.read(moov_end - moov_start)
+    moov_payload = _parse_children(moov_box)[0][1]
+
+    # Media data moves down by the size of the new moov box. If any stco table had to be
+    # upgraded to co64 the box grew, so redo it with every table as co64 (size is then fixed).
+    new_moov = relocate_moov(moov_payload, len(moov_box))
+    if len(new_moov) != len(moov_box):
+        shift = len(relocate_moov(moov_payload, 0, force_co64=True))
+        new_moov = relocate_moov(moov_payload, shift, force_co64=True)
+
+    _copy_range(source, destination, 0, insert_at)
+    destination.write(new_moov)
+    _copy_range(source, destination, insert_at, moov_start)
+    _copy_range(source, destination, moov_end, size)
+    return True
+
+
+def _copy_range(source, destination, start, end):
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = source.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        destination.write(chunk)
+        remaining -= len(chunk)
+
+
+def faststart_file(path):
+    """Rewrite a local MP4 in place (via a temp file in the same directory); returns True if rewritten"""
+    directory = os.path.dirname(path) or '.'
+    with open(path, 'rb') as source:
+        if not needs_faststart(source):
+            return False
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False, suffix='.faststart') as temp:
+            try:
+                rewritten = faststart(source, temp)
+            except BaseException:
+                os.unlink(temp.name)
+                raise
+    if not rewritten:
+        os.unlink(temp.name)
+        return False
+    shutil.copymode(path, temp.name)
+    os.replace(temp.name, path)
+    return True
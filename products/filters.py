@@ -0,0 +1,47 @@
+import django_filters
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from .models import Product
+from .search import search_products
+from .tagging import parse_tags
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """Full-text product search through the FTS5 index (`?q=`)"""
+    search_param = 'q'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_products(queryset, query)
+
+
+class TagFilter(BaseFilterBackend):
+    """`?tag=solar` (repeat for products carrying every tag), matched on the normalized tag slug"""
+    tag_param = 'tag'
+
+    def filter_queryset(self, request, queryset, view):
+        for value in request.query_params.getlist(self.tag_param):
+            for slug, _ in parse_tags(value):
+                queryset = queryset.filter(tag_links__tag__slug=slug)
+        return queryset
+
+
+class ProductFilter(django_filters.FilterSet):
+    """Exact/range filters that map onto the composite indexes in Product.Meta"""
+    min_price = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
+    max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
+
+    class Meta:
+        model = Product
+        fields = ['category', 'in_stock', 'brand', 'featured']
+
+
+class ExplicitOrderingFilter(OrderingFilter):
+    """
+    Apply `?ordering=` only when requested. Without it the queryset keeps its own order
+    (bm25 rank for `?q=` searches); KeysetPagination falls back to the view's ordering.
+    """
+
+    def get_default_ordering(self, view):
+        return None
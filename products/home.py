@@ -0,0 +1,109 @@
+"""
+Pre-rendered homepage bundle served at /api/home/.
+
+The bundle (featured products, categories, latest arrivals) is rendered to JSON
+once, compressed with gzip (and brotli when the `brotli` package is installed) and
+stored under a single cache key together with its ETag and the catalog version it
+was built from. Serving it is one cache read and no queries: the view only picks
+the encoding the client accepts.
+
+Rebuilds happen off the request path (see products.background). Product saves
+that change `featured` or `in_stock`, and any image/video change, schedule one
+after the transaction commits. Any other catalog write only bumps the catalog version,
+which the view notices on the next read: it keeps serving the stale bundle and
+schedules a rebuild. Only a cold cache builds synchronously.
+"""
+import gzip
+import hashlib
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+from .background import CoalescingTask
+from .cache import get_catalog_version
+from .models import IN_STOCK, Category, Product
+from .serializers import CategorySerializer, HomeProductSerializer
+
+HOME_CACHE_KEY = 'home:bundle'
+HOME_FEATURED_LIMIT = 12
+HOME_LATEST_LIMIT = 12
+# Encodings in server preference order
+ENCODINGS = ('br', 'gzip')
+
+
+def render_home():
+    """The homepage document as JSON bytes"""
+    products = Product.objects.filter(IN_STOCK).select_related('category')
+    featured = products.filter(featured=True).order_by('-created_at')[:HOME_FEATURED_LIMIT]
+    latest = products.order_by('-created_at')[:HOME_LATEST_LIMIT]
+    document = {
+        'featured': HomeProductSerializer(featured, many=True).data,
+        'categories': CategorySerializer(Category.objects.order_by('name'), many=True).data,
+        'latest': HomeProductSerializer(latest, many=True).data,
+        'generated_at': timezone.now(),
+    }
+    return JSONRenderer().render(document)
+
+
+def build_home_bundle():
+    """Render, compress and store the bundle; returns it"""
+    # Read the version first: a write racing the render leaves the bundle marked stale
+    version = get_catalog_version()
+    body = render_home()
+    bundle = {
+        'version': version,
+        # Weak: the identity, gzip and br bodies are the same document
+        'etag': 'W/"%s"' % hashlib.md5(body).hexdigest(),
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9),
+    }
+    if brotli is not None:
+        bundle['br'] = brotli.compress(body, quality=11)
+    cache.set(HOME_CACHE_KEY, bundle, timeout=None)
+    return bundle
+
+
+def get_home_bundle():
+    """The stored bundle, building it synchronously only when there is none"""
+    bundle = cache.get(HOME_CACHE_KEY)
+    if bundle is None:
+        return build_home_bundle()
+    if bundle['version'] != get_catalog_version():
+        schedule_home_rebuild()
+    return bundle
+
+
+def _rebuild_home(items):
+    build_home_bundle()
+
+
+_home_task = CoalescingTask(_rebuild_home)
+
+
+def schedule_home_rebuild():
+    """Rebuild the bundle in the background once the current transaction commits"""
+    _home_task.schedule()
+
+
+def negotiate_encoding(bundle, accept_encoding):
+    """Best stored encoding the client accepts ('identity' when none)"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if encoding in bundle and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return 'identity'
@@ -0,0 +1,103 @@
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Widths (px) generated for every product image; larger than the original is skipped
+DERIVATIVE_WIDTHS = (320, 640, 1024)
+
+# format key -> (Pillow format, file extension, save options)
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(name, width, extension):
+    """
+    Preferred storage name of a derivative, stored next to the original.
+
+    Keeps the original's extension (shoe.png -> shoe.png-320w.webp) so same-stem
+    originals never compete for one name; storage.save still picks a free name if
+    it is taken, and the name it returns is what gets recorded.
+    """
+    return f'{name}-{width}w.{extension}'
+
+
+def _flatten(image):
+    """JPEG has no alpha channel: composite transparent images onto white"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def build_derivatives(name, storage=None):
+    """
+    Render resized WebP/JPEG copies of a stored image.
+
+    Returns {'webp': {'320': storage_name, ...}, 'jpeg': {...}}, or {} if the
+    original is missing or not an image. Existing files are never overwritten, and if
+    writing fails the derivatives already written are removed before the error propagates.
+    """
+    storage = storage or default_storage
+    try:
+        with storage.open(name, 'rb') as source:
+            original = ImageOps.exif_transpose(Image.open(source))
+            original.load()
+    except (OSError, UnidentifiedImageError) as exc:
+        logger.warning(f'Cannot build derivatives for {name}: {exc}')
+        return {}
+
+    derivatives = {key: {} for key in DERIVATIVE_FORMATS}
+    try:
+        for width in DERIVATIVE_WIDTHS:
+            if width >= original.width:
+                continue
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.Resampling.LANCZOS)
+
+            for key, (pil_format, extension, options) in DERIVATIVE_FORMATS.items():
+                image = _flatten(resized) if pil_format == 'JPEG' else resized
+                if image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA')
+                buffer = io.BytesIO()
+                image.save(buffer, pil_format, **options)
+
+                target = derivative_name(name, width, extension)
+                derivatives[key][str(width)] = storage.save(target, ContentFile(buffer.getvalue()))
+    except OSError:
+        delete_derivatives(derivatives, storage)
+        raise
+
+    return derivatives
+
+
+def delete_derivatives(derivatives, storage=None):
+    """Remove the files of a derivatives map (only ever one this image wrote)"""
+    storage = storage or default_storage
+    for sizes in (derivatives or {}).values():
+        for name in sizes.values():
+            try:
+                storage.delete(name)
+            except OSError:
+                logger.warning(f'Could not remove derivative {name}')
+
+
+def srcset(derivatives, storage=None):
+    """Turn a derivatives map into {'webp': 'url 320w, url 640w', ...}"""
+    storage = storage or default_storage
+    return {
+        key: ', '.join(
+            f'{storage.url(name)} {width}w'
+            for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+        )
+        for key, sizes in (derivatives or {}).items()
+        if sizes
+    }
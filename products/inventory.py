@@ -0,0 +1,83 @@
+"""
+Quantity-based stock.
+
+Product.stock_quantity counts the units on hand. NULL means stock is not tracked
+and in_stock stays a manual switch; otherwise in_stock is derived, kept equal to
+stock_quantity > 0 by Product.save and by reserve_stock.
+
+Checkout reserves stock with one conditional UPDATE per product,
+
+    UPDATE product SET stock_quantity = stock_quantity - n, in_stock = stock_quantity > n, updated_at = now
+    WHERE id = %s AND stock_quantity >= n
+
+sent as a single executemany inside the order's transaction. The guard makes the
+database the arbiter: no read-modify-write, no SELECT ... FOR UPDATE and no table
+lock, only the row lock (PostgreSQL) or the write lock the transaction already holds
+(SQLite). Two checkouts racing for the last unit both run the UPDATE; one matches the
+row and the other matches nothing and is rejected.
+
+The bulk UPDATE bypasses Product.save and its signals. It sets updated_at itself, so
+the product detail ETag/Last-Modified change with the stock, and products it sells out
+are passed to stock_depleted() to keep category counts, cached listings and the
+homepage bundle in step.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate_catalog
+from .home import schedule_home_rebuild
+from .models import Product, refresh_category_counts
+
+
+class InsufficientStock(Exception):
+    """Raised by reserve_stock; `available` maps each short product id to the units left"""
+
+    def __init__(self, available):
+        self.available = available
+        super().__init__(f'Insufficient stock for products {sorted(available)}')
+
+
+def reserve_stock(quantities):
+    """
+    Take {product_id: quantity} out of tracked stock in the current transaction.
+
+    Either every product is decremented or none is (InsufficientStock). Returns the
+    ids of products this reservation sold out.
+    """
+    if not quantities:
+        return []
+    quote = connection.ops.quote_name
+    table, stock, in_stock = quote(Product._meta.db_table), quote('stock_quantity'), quote('in_stock')
+    sql = (
+        f'UPDATE {table} SET {stock} = {stock} - %s, {in_stock} = {stock} > %s, {quote("updated_at")} = %s'
+        f' WHERE {quote("id")} = %s AND {stock} >= %s'
+    )
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    rows = [(quantity, quantity, now, pk, quantity) for pk, quantity in quantities.items()]
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+                # Each row matches at most one product, so the total says whether all matched
+                if cursor.rowcount != len(rows):
+                    raise InsufficientStock({})
+    except InsufficientStock:
+        # The savepoint is rolled back: these are the quantities the guard saw
+        left = dict(Product.objects.filter(pk__in=quantities).order_by().values_list('pk', 'stock_quantity'))
+        raise InsufficientStock({
+            pk: left.get(pk) or 0 for pk, quantity in quantities.items() if (left.get(pk) or 0) < quantity
+        }) from None
+
+    sold_out = list(
+        Product.objects.filter(pk__in=quantities, stock_quantity=0).order_by().values_list('pk', 'category_id')
+    )
+    if sold_out:
+        stock_depleted({category_id for _, category_id in sold_out})
+    return [pk for pk, _ in sold_out]
+
+
+def stock_depleted(category_ids):
+    """Follow-up for products that went out of stock outside Product.save"""
+    refresh_category_counts(category_ids)
+    invalidate_catalog()
+    schedule_home_rebuild()
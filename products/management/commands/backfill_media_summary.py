@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from products.cache import invalidate_catalog
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized primary image / featured video columns for all products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products updated per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = ['primary_image_url', 'primary_image_srcset', 'featured_video_url', 'image_count', 'video_count']
+        batch = []
+        updated = 0
+
+        for product in Product.objects.with_media().iterator(chunk_size=batch_size):
+            for field, value in product.media_summary().items():
+                setattr(product, field, value)
+            batch.append(product)
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Product.objects.bulk_update(batch, fields)
+            updated += len(batch)
+
+        if updated:
+            # bulk_update skips the save signals; cached list pages still hold the old summaries
+            invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Media summary refreshed for {updated} products'))
@@ -0,0 +1,117 @@
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from orders.models import Order, OrderItem
+from products.cooccurrence import (
+    basket_arrays, cooccurrence_counts, rank_companions, rebuild_related_products, record_orders
+)
+from products.models import Product, RelatedProduct
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the "frequently bought together" build on synthetic orders (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000000, help='Synthetic orders to insert')
+        parser.add_argument('--products', type=int, default=2000, help='Synthetic products to insert')
+        parser.add_argument('--new-orders', type=int, default=1000, help='Orders added incrementally afterwards')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        self.sequence = 0
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            product_ids = self.create_products(options['products'])
+            lines = self.create_orders(rng, product_ids, options['orders'])
+            self.stdout.write(
+                f"Inserted {options['orders']} orders ({lines} lines) over {len(product_ids)} products "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+            # The vectorized core alone, then the full rebuild including reads and writes
+            order_ids, item_product_ids = self.timed('read baskets', lambda: basket_arrays(
+                OrderItem.objects.values_list('order_id', 'product_id')
+            ))
+            product, other, count = self.timed('Bᵀ B', lambda: cooccurrence_counts(order_ids, item_product_ids))
+            diagonal = product == other
+            frequencies = (product[diagonal], count[diagonal])
+            self.timed('rank top-k', lambda: rank_companions(product, other, count, frequencies))
+            self.stdout.write(f'{len(product)} non-zero matrix cells')
+            self.timed('full rebuild', rebuild_related_products)
+
+            new_ids = self.timed(
+                f"insert {options['new_orders']} orders",
+                lambda: self.create_orders(rng, product_ids, options['new_orders'], return_ids=True)
+            )
+            self.timed(f"record {options['new_orders']} orders", lambda: record_orders(new_ids))
+            self.timed('record 1 order', lambda: record_orders(
+                self.create_orders(rng, product_ids, 1, return_ids=True)
+            ))
+
+            best = min(
+                self.timed_quiet(lambda: list(RelatedProduct.objects.filter(product_id=pk).values_list('related_id')))
+                for pk in product_ids[:200]
+            )
+            self.stdout.write(f'{"top-k lookup":<24}{best * 1000:>10.3f} ms (best of 200)')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (fixture rolled back)'))
+
+    def create_products(self, count, batch_size=5000):
+        products = Product.objects.bulk_create(
+            [
+                Product(name=f'Benchmark product {index}', description='', price=Decimal('1000'))
+                for index in range(count)
+            ],
+            batch_size=batch_size,
+        )
+        return np.array([product.pk for product in products], dtype=np.int64)
+
+    def create_orders(self, rng, product_ids, count, batch_size=5000, return_ids=False):
+        """Baskets of 1-6 products with Zipf-like popularity; every tenth product has a usual companion"""
+        weights = 1.0 / np.arange(1, len(product_ids) + 1)
+        weights /= weights.sum()
+        lines = 0
+        ids = []
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            orders = Order.objects.bulk_create([
+                Order(
+                    customer_name='Benchmark', phone_number='08000000000', address='Lagos',
+                    total_price=Decimal('1000'), tracking_code=f'BM{self.sequence + index:014d}',
+                )
+                for index in range(size)
+            ])
+            self.sequence += size
+            basket_sizes = rng.integers(1, 7, size=size)
+            picks = rng.choice(len(product_ids), size=basket_sizes.sum(), p=weights)
+            owners = np.repeat(np.arange(size), basket_sizes)
+            # Companion lines: product 10n is usually bought with 10n + 1
+            anchors = picks[(picks % 10 == 0) & (picks + 1 < len(product_ids))]
+            anchor_owners = owners[(picks % 10 == 0) & (picks + 1 < len(product_ids))]
+            picks = np.concatenate([picks, anchors + 1])
+            owners = np.concatenate([owners, anchor_owners])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=orders[owner], product_id=int(product_ids[pick]), quantity=1, price=Decimal('1000'))
+                for owner, pick in zip(owners.tolist(), picks.tolist())
+            ], batch_size=batch_size)
+            lines += len(picks)
+            ids.extend(order.pk for order in orders)
+        return ids if return_ids else lines
+
+    def timed(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        self.stdout.write(f'{label:<24}{(time.perf_counter() - started) * 1000:>10.1f} ms')
+        return result
+
+    def timed_quiet(self, func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
@@ -0,0 +1,83 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from products.models import Product
+from products.search import search_products
+
+WORDS = [
+    'cordless', 'grass', 'cutter', 'rechargeable', 'spray', 'paint', 'car', 'wash', 'battery',
+    'portable', 'kitchen', 'blender', 'stainless', 'steel', 'garden', 'lawn', 'cleaning', 'pressure',
+    'washer', 'electric', 'drill', 'solar', 'lamp', 'outdoor', 'waterproof', 'speaker', 'bluetooth',
+    'wireless', 'charger', 'phone', 'holder', 'massage', 'gun', 'hair', 'dryer', 'iron', 'fan',
+]
+BRANDS = ['Makita', 'Bosch', 'Tefal', 'Philips', 'Anker', 'Xiaomi', 'Generic']
+
+
+class Command(BaseCommand):
+    help = 'Compare FTS5 search against an icontains (LIKE) scan on a synthetic catalog (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Synthetic products to insert')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (best time is reported)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        queries = ['grass', 'spray paint', 'wirel', 'stainless blender', 'solar lamp outdoor']
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.create_fixture(rng, options['products'])
+            self.stdout.write(f"Inserted {options['products']} products in {time.perf_counter() - started:.1f}s")
+
+            self.stdout.write(f"{'query':<22}{'matches':>9}{'fts ms':>10}{'like ms':>10}")
+            for query in queries:
+                fts_ms, matches = self.best_of(options['repeat'], lambda: self.run_fts(query))
+                like_ms, _ = self.best_of(options['repeat'], lambda: self.run_like(query))
+                self.stdout.write(f'{query:<22}{matches:>9}{fts_ms:>10.2f}{like_ms:>10.2f}')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (fixture rolled back)'))
+
+    def create_fixture(self, rng, count, batch_size=5000):
+        for start in range(0, count, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    name=' '.join(rng.sample(WORDS, 3)).title(),
+                    description=' '.join(rng.choices(WORDS, k=40)),
+                    price=Decimal(rng.randint(1000, 500000)),
+                    brand=rng.choice(BRANDS),
+                    tags=', '.join(rng.sample(WORDS, 4)),
+                )
+                for _ in range(min(batch_size, count - start))
+            ])
+
+    def run_fts(self, query):
+        queryset = search_products(Product.objects.filter(in_stock=True), query)
+        list(queryset[:20])
+        return queryset.count()
+
+    def run_like(self, query):
+        condition = Q()
+        for term in query.split():
+            condition &= (
+                Q(name__icontains=term) | Q(description__icontains=term) |
+                Q(brand__icontains=term) | Q(tags__icontains=term)
+            )
+        queryset = Product.objects.filter(condition, in_stock=True)
+        list(queryset[:20])
+        return queryset.count()
+
+    def best_of(self, repeat, func):
+        timings = []
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings), result
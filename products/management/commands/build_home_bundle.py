@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from products.home import build_home_bundle
+
+
+class Command(BaseCommand):
+    help = 'Render and store the pre-compressed /api/home/ bundle (e.g. after a deploy or cache flush)'
+
+    def handle(self, *args, **options):
+        bundle = build_home_bundle()
+        sizes = ', '.join(
+            f'{encoding} {len(bundle[encoding])} bytes' for encoding in ('identity', 'gzip', 'br') if encoding in bundle
+        )
+        self.stdout.write(self.style.SUCCESS(f'Home bundle built: {sizes}'))
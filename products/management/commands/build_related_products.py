@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from products.cooccurrence import rebuild_related_products, record_pending_orders
+
+
+class Command(BaseCommand):
+    help = 'Add unrecorded orders to the "frequently bought together" tables (--full: rebuild from all orders)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute the matrix from scratch')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders recorded per transaction')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['full']:
+            orders = rebuild_related_products()
+            action = 'rebuilt from'
+        else:
+            orders = record_pending_orders(options['batch_size'])
+            action = 'updated with'
+        self.stdout.write(self.style.SUCCESS(
+            f'Related products {action} {orders} orders in {time.perf_counter() - started:.1f}s'
+        ))
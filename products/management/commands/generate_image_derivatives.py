@@ -0,0 +1,78 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from products.cache import invalidate_catalog
+from products.imaging import build_derivatives, delete_derivatives
+from products.models import ProductImage, refresh_media_summary
+
+
+def _render(task):
+    image_id, name = task
+    return image_id, build_derivatives(name)
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/JPEG derivatives for existing product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Worker processes')
+        parser.add_argument('--force', action='store_true', help='Regenerate images that already have derivatives')
+        parser.add_argument('--batch-size', type=int, default=100, help='Rows written per UPDATE batch')
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.exclude(image='')
+        if not options['force']:
+            images = images.filter(derivatives={})
+        tasks = list(images.values_list('id', 'image'))
+        product_ids = dict(images.values_list('id', 'product_id'))
+        # --force: the files being replaced, removed once the new ones are recorded
+        previous = [derivatives for derivatives in images.values_list('derivatives', flat=True) if derivatives]
+
+        if not tasks:
+            self.stdout.write(self.style.SUCCESS('No images need derivatives'))
+            return
+
+        # Workers only touch storage; never share the parent's DB connections with them
+        connections.close_all()
+
+        started = time.perf_counter()
+        batch, done, failed = [], 0, 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for image_id, derivatives in pool.map(_render, tasks, chunksize=4):
+                if not derivatives:
+                    failed += 1
+                batch.append(ProductImage(id=image_id, derivatives=derivatives))
+                done += 1
+                if len(batch) >= options['batch_size']:
+                    ProductImage.objects.bulk_update(batch, ['derivatives'])
+                    batch = []
+                    self.stdout.write(f'  {done}/{len(tasks)} images processed')
+        if batch:
+            ProductImage.objects.bulk_update(batch, ['derivatives'])
+        if previous:
+            self.remove_replaced(previous)
+
+        for product_id in set(product_ids.values()):
+            refresh_media_summary(product_id)
+        invalidate_catalog()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {done} images ({failed} unreadable) in {elapsed:.1f}s'
+        ))
+
+    def remove_replaced(self, previous):
+        """Delete replaced derivative files that no image references any more"""
+        in_use = {
+            name
+            for derivatives in ProductImage.objects.exclude(derivatives={}).values_list('derivatives', flat=True)
+            for sizes in derivatives.values() for name in sizes.values()
+        }
+        for derivatives in previous:
+            delete_derivatives({
+                key: {width: name for width, name in sizes.items() if name not in in_use}
+                for key, sizes in derivatives.items()
+            })
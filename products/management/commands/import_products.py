@@ -0,0 +1,63 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from products.cache import invalidate_catalog
+from products.catalog_io import FORMATS, IMAGE_WORKERS, CatalogImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Upsert products (keyed on sku) from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV/JSONL file, or '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension (csv)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per transaction')
+        parser.add_argument(
+            '--image-root', default='.', help='Directory that relative image paths are resolved against'
+        )
+        parser.add_argument('--workers', type=int, default=IMAGE_WORKERS, help='Threads copying images')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+        started = time.perf_counter()
+        seen = [0]
+
+        def progress(importer):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'  {seen[0]} rows, {importer.created} created, {importer.updated} updated '
+                f'({seen[0] / elapsed if elapsed else 0:.0f} rows/s)'
+            )
+
+        importer = CatalogImporter(
+            batch_size=options['batch_size'], image_root=options['image_root'],
+            workers=options['workers'], progress=progress,
+        )
+        try:
+            source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(f'Cannot open {path}: {exc}')
+        try:
+            for row in read_rows(source, fmt):
+                seen[0] += 1
+                importer.feed(row)
+            importer.finish()
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        if importer.created or importer.updated:
+            invalidate_catalog()
+
+        for error in importer.errors[:20]:
+            self.stderr.write(f'  skipped: {error}')
+        if len(importer.errors) > 20:
+            self.stderr.write(f'  ... and {len(importer.errors) - 20} more')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {seen[0]} rows in {elapsed:.1f}s: {importer.created} created, {importer.updated} updated, '
+            f'{importer.images} images, {len(importer.errors)} errors'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from products.cache import invalidate_catalog
+from products.models import ProductVideo
+
+
+class Command(BaseCommand):
+    help = 'Extract size, duration, dimensions, codec and hash for product videos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-probe videos that already have metadata')
+        parser.add_argument(
+            '--faststart', action='store_true',
+            help='Also move the moov box ahead of mdat in MP4s that are not fast-start yet'
+        )
+
+    def handle(self, *args, **options):
+        videos = ProductVideo.objects.exclude(video='')
+        if options['faststart'] and not options['force']:
+            videos = videos.filter(faststart=False)
+        elif not options['force']:
+            videos = videos.filter(file_size__isnull=True)
+
+        probed = 0
+        for video in videos.iterator():
+            if options['faststart'] and video.apply_faststart():
+                self.stdout.write(f'  {video.video.name}: moov moved ahead of mdat')
+            metadata = video.extract_metadata()
+            ProductVideo.objects.filter(pk=video.pk).update(**metadata)
+            probed += 1
+            duration = metadata['duration_seconds']
+            self.stdout.write(
+                f'  {video.video.name}: {metadata["file_size"]} bytes, '
+                f'{duration if duration is not None else "?"}s, '
+                f'{metadata["width"]}x{metadata["height"]} {metadata["codec"] or "?"}'
+            )
+
+        if probed:
+            invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Probed {probed} videos'))
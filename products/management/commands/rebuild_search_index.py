@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from products.models import Product
+from products.search import install_search_triggers
+
+
+class Command(BaseCommand):
+    help = 'Rebuild and optimize the FTS5 product search index'
+
+    def handle(self, *args, **options):
+        install_search_triggers()
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO products_product_fts(products_product_fts) VALUES('rebuild')")
+            cursor.execute("INSERT INTO products_product_fts(products_product_fts) VALUES('optimize')")
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index rebuilt for {Product.objects.count()} products'
+        ))
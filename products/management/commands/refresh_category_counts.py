@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from products.cache import invalidate_catalog
+from products.models import Category, refresh_category_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute Category.product_count (in-stock products) for all categories'
+
+    def handle(self, *args, **options):
+        refresh_category_counts()
+        invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Product counts refreshed for {Category.objects.count()} categories'))
@@ -0,0 +1,245 @@
+"""
+Minimal pure-Python readers for video container metadata.
+
+Only the boxes/elements needed for duration, frame size and codec are parsed:
+ISO BMFF (MP4/MOV/M4V) `moov` boxes and Matroska/WebM `Info`/`Tracks` elements.
+Media data is never read, so probing a 100MB file costs a handful of small reads.
+"""
+import hashlib
+import struct
+
+CHUNK_SIZE = 1024 * 1024
+
+EBML_MAGIC = b'\x1a\x45\xdf\xa3'
+
+# Matroska element IDs
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_TYPE = 0x83
+MKV_CODEC_ID = 0x86
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_CLUSTER = 0x1F43B675
+
+
+class ProbeError(ValueError):
+    pass
+
+
+def empty_metadata():
+    return {'duration_seconds': None, 'width': None, 'height': None, 'codec': ''}
+
+
+def file_digest(fileobj):
+    """(size in bytes, sha256 hex) of a file object, read in chunks"""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def probe_video(fileobj):
+    """Return {'duration_seconds', 'width', 'height', 'codec'} for an MP4/MOV or WebM/MKV file"""
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    head = fileobj.read(12)
+    if head[:4] == EBML_MAGIC:
+        return probe_matroska(fileobj, size)
+    if head[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip'):
+        return probe_mp4(fileobj, size)
+    raise ProbeError('Unrecognised video container')
+
+
+# ISO base media file format (MP4 / MOV)
+
+def iter_boxes(fileobj, start, end):
+    """Yield (type, payload_start, box_end) for the boxes in [start, end)"""
+    offset = start
+    while offset + 8 <= end:
+        fileobj.seek(offset)
+        header = fileobj.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', fileobj.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            raise ProbeError(f'Corrupt box {box_type!r} at {offset}')
+        yield box_type, offset + header_size, min(offset + size, end)
+        offset += size
+
+
+def find_box(fileobj, start, end, path):
+    """Find the first box at `path` (e.g. [b'moov', b'mvhd']); returns (payload_start, end) or None"""
+    for box_type, payload, box_end in iter_boxes(fileobj, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload, box_end
+            found = find_box(fileobj, payload, box_end, path[1:])
+            if found:
+                return found
+    return None
+
+
+def probe_mp4(fileobj, size):
+    metadata = empty_metadata()
+    moov = find_box(fileobj, 0, size, [b'moov'])
+    if moov is None:
+        raise ProbeError('No moov box')
+
+    mvhd = find_box(fileobj, moov[0], moov[1], [b'mvhd'])
+    if mvhd:
+        fileobj.seek(mvhd[0])
+        version = fileobj.read(4)[0]
+        if version == 1:
+            _, _, timescale, duration = struct.unpack('>QQIQ', fileobj.read(28))
+        else:
+            _, _, timescale, duration = struct.unpack('>IIII', fileobj.read(16))
+        if timescale:
+            metadata['duration_seconds'] = round(duration / timescale, 3)
+
+    for box_type, payload, box_end in iter_boxes(fileobj, moov[0], moov[1]):
+        if box_type != b'trak':
+            continue
+        hdlr = find_box(fileobj, payload, box_end, [b'mdia', b'hdlr'])
+        if not hdlr:
+            continue
+        fileobj.seek(hdlr[0] + 8)
+        if fileobj.read(4) != b'vide':
+            continue
+
+        tkhd = find_box(fileobj, payload, box_end, [b'tkhd'])
+        if tkhd:
+            fileobj.seek(tkhd[0])
+            version = fileobj.read(4)[0]
+            # Skip times/ids/duration/reserved/layer/group/volume/matrix up to width
+            fileobj.seek(tkhd[0] + (88 if version == 1 else 76))
+            width, height = struct.unpack('>II', fileobj.read(8))
+            metadata['width'], metadata['height'] = width >> 16, height >> 16
+
+        stsd = find_box(fileobj, payload, box_end, [b'mdia', b'minf', b'stbl', b'stsd'])
+        if stsd:
+            fileobj.seek(stsd[0] + 8 + 4)
+            metadata['codec'] = fileobj.read(4).decode('latin-1').strip()
+        break
+
+    return metadata
+
+
+# Matroska / WebM (EBML)
+
+def _read_vint(fileobj, keep_marker):
+    first = fileobj.read(1)
+    if not first:
+        raise EOFError
+    byte = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not byte & mask:
+        length += 1
+        mask >>= 1
+    if length > 8:
+        raise ProbeError('Invalid EBML variable-length integer')
+    value = byte if keep_marker else byte & (mask - 1)
+    all_ones = value == mask - 1
+    for extra in fileobj.read(length - 1):
+        value = (value << 8) | extra
+        all_ones = all_ones and extra == 0xFF
+    return value, (all_ones and not keep_marker)
+
+
+def iter_elements(fileobj, start, end):
+    """Yield (element_id, data_start, data_end) for the EBML elements in [start, end)"""
+    fileobj.seek(start)
+    while fileobj.tell() < end:
+        try:
+            element_id, _ = _read_vint(fileobj, keep_marker=True)
+            size, unknown = _read_vint(fileobj, keep_marker=False)
+        except EOFError:
+            return
+        data_start = fileobj.tell()
+        data_end = end if unknown else min(data_start + size, end)
+        yield element_id, data_start, data_end
+        fileobj.seek(data_end)
+
+
+def _read_uint(fileobj, start, end):
+    fileobj.seek(start)
+    return int.from_bytes(fileobj.read(end - start), 'big')
+
+
+def _read_float(fileobj, start, end):
+    fileobj.seek(start)
+    data = fileobj.read(end - start)
+    if len(data) == 4:
+        return struct.unpack('>f', data)[0]
+    if len(data) == 8:
+        return struct.unpack('>d', data)[0]
+    return None
+
+
+def probe_matroska(fileobj, size):
+    metadata = empty_metadata()
+    segment = None
+    for element_id, start, end in iter_elements(fileobj, 0, size):
+        if element_id == MKV_SEGMENT:
+            segment = (start, end)
+            break
+    if segment is None:
+        raise ProbeError('No Segment element')
+
+    timecode_scale = 1000000
+    duration = None
+    for element_id, start, end in iter_elements(fileobj, *segment):
+        if element_id == MKV_CLUSTER:
+            break  # Info and Tracks precede the media clusters
+        if element_id == MKV_INFO:
+            for child_id, child_start, child_end in iter_elements(fileobj, start, end):
+                if child_id == MKV_TIMECODE_SCALE:
+                    timecode_scale = _read_uint(fileobj, child_start, child_end)
+                elif child_id == MKV_DURATION:
+                    duration = _read_float(fileobj, child_start, child_end)
+        elif element_id == MKV_TRACKS:
+            for entry_id, entry_start, entry_end in iter_elements(fileobj, start, end):
+                if entry_id != MKV_TRACK_ENTRY:
+                    continue
+                track = _read_track(fileobj, entry_start, entry_end)
+                if track.get('type') == 1:
+                    metadata['codec'] = track.get('codec', '')
+                    metadata['width'] = track.get('width')
+                    metadata['height'] = track.get('height')
+                    break
+
+    if duration is not None:
+        metadata['duration_seconds'] = round(duration * timecode_scale / 1e9, 3)
+    return metadata
+
+
+def _read_track(fileobj, start, end):
+    track = {}
+    for element_id, data_start, data_end in iter_elements(fileobj, start, end):
+        if element_id == MKV_TRACK_TYPE:
+            track['type'] = _read_uint(fileobj, data_start, data_end)
+        elif element_id == MKV_CODEC_ID:
+            fileobj.seek(data_start)
+            track['codec'] = fileobj.read(data_end - data_start).decode('ascii', 'replace').rstrip('\x00')
+        elif element_id == MKV_VIDEO:
+            for video_id, video_start, video_end in iter_elements(fileobj, data_start, data_end):
+                if video_id == MKV_PIXEL_WIDTH:
+                    track['width'] = _read_uint(fileobj, video_start, video_end)
+                elif video_id == MKV_PIXEL_HEIGHT:
+                    track['height'] = _read_uint(fileobj, video_start, video_end)
+    return track
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:44
+
+from django.db import migrations, models
+from django.db.models import Prefetch
+
+BATCH_SIZE = 500
+
+
+def backfill_media_summary(apps, schema_editor):
+    # Same values as Product.media_summary(), which historical models don't have
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+    ProductVideo = apps.get_model('products', 'ProductVideo')
+    products = Product.objects.order_by('id').prefetch_related(
+        Prefetch('images', queryset=ProductImage.objects.order_by('-is_primary', 'created_at')),
+        Prefetch('videos', queryset=ProductVideo.objects.order_by('-is_featured', 'order', 'created_at')),
+    )
+    fields = ['primary_image_url', 'featured_video_url', 'image_count', 'video_count']
+    batch = []
+    for product in products.iterator(chunk_size=BATCH_SIZE):
+        images, videos = list(product.images.all()), list(product.videos.all())
+        product.primary_image_url = images[0].image.url if images else None
+        product.featured_video_url = videos[0].video.url if videos else None
+        product.image_count = len(images)
+        product.video_count = len(videos)
+        batch.append(product)
+        if len(batch) >= BATCH_SIZE:
+            Product.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_productvideo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='featured_video_url',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_url',
+            field=models.CharField(blank=True, editable=False, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_media_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:44
+
+import django.db.models.deletion
+import products.models
+from django.db import migrations, models
+
+
+CREATE_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE products_product_fts USING fts5(
+        name, description, brand, tags,
+        content='products_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    );
+    """,
+    # Weight matches in name > brand > tags > description
+    "INSERT INTO products_product_fts(products_product_fts, rank) VALUES('rank', 'bm25(10.0, 1.0, 5.0, 3.0)');",
+    """
+    CREATE TRIGGER products_product_fts_ai AFTER INSERT ON products_product BEGIN
+        INSERT INTO products_product_fts(rowid, name, description, brand, tags)
+        VALUES (new.id, new.name, new.description, new.brand, new.tags);
+    END;
+    """,
+    """
+    CREATE TRIGGER products_product_fts_ad AFTER DELETE ON products_product BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, description, brand, tags)
+        VALUES ('delete', old.id, old.name, old.description, old.brand, old.tags);
+    END;
+    """,
+    """
+    CREATE TRIGGER products_product_fts_au AFTER UPDATE OF name, description, brand, tags ON products_product BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, description, brand, tags)
+        VALUES ('delete', old.id, old.name, old.description, old.brand, old.tags);
+        INSERT INTO products_product_fts(rowid, name, description, brand, tags)
+        VALUES (new.id, new.name, new.description, new.brand, new.tags);
+    END;
+    """,
+    "INSERT INTO products_product_fts(products_product_fts) VALUES('rebuild');",
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS products_product_fts_au;",
+    "DROP TRIGGER IF EXISTS products_product_fts_ad;",
+    "DROP TRIGGER IF EXISTS products_product_fts_ai;",
+    "DROP TABLE IF EXISTS products_product_fts;",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_media_summary'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEARCH_INDEX, reverse_sql=DROP_SEARCH_INDEX),
+        migrations.CreateModel(
+            name='ProductSearchIndex',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='products.product')),
+                ('document', products.models.SearchDocumentField(db_column='products_product_fts')),
+                ('rank', models.FloatField(db_column='rank')),
+            ],
+            options={
+                'db_table': 'products_product_fts',
+                'managed': False,
+            },
+        ),
+    ]
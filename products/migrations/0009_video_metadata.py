@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvideo',
+            name='codec',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='productvideo',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 of the file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='productvideo',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='productvideo',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, help_text='Size in bytes', null=True),
+        ),
+        migrations.AddField(
+            model_name='productvideo',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='productvideo',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_video_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvideo',
+            name='faststart',
+            field=models.BooleanField(default=False, editable=False, help_text='MP4 index (moov) is ahead of the media data, so playback starts before the download finishes'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_productvideo_faststart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Stock keeping unit; the key used by import_products/export_products', max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+from django.utils.text import slugify
+
+BATCH_SIZE = 500
+TAG_MAX_LENGTH = 50
+
+
+def parse_tags(text):
+    # Frozen copy of products.tagging.parse_tags as of this migration
+    tags = {}
+    for raw in (text or '').split(','):
+        name = raw.strip()[:TAG_MAX_LENGTH]
+        slug = slugify(name)[:TAG_MAX_LENGTH]
+        if slug and slug not in tags:
+            tags[slug] = name
+    return list(tags.items())
+
+
+def backfill_tags(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Tag = apps.get_model('products', 'Tag')
+    ProductTag = apps.get_model('products', 'ProductTag')
+
+    last_id = 0
+    while True:
+        rows = list(
+            Product.objects.filter(id__gt=last_id).exclude(tags__isnull=True).exclude(tags='')
+            .order_by('id').values_list('id', 'tags')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        parsed = {product_id: parse_tags(tags) for product_id, tags in rows}
+        names = {}
+        for tags in parsed.values():
+            for slug, name in tags:
+                names.setdefault(slug, name)
+        Tag.objects.bulk_create([Tag(slug=slug, name=name) for slug, name in names.items()], ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(slug__in=names).values_list('slug', 'id'))
+        ProductTag.objects.bulk_create(
+            [
+                ProductTag(product_id=product_id, tag_id=tag_ids[slug])
+                for product_id, tags in parsed.items() for slug, _ in tags
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:09
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+    counts = Product.objects.filter(in_stock=True, category=models.OuterRef('pk')).order_by().values(
+        'category'
+    ).annotate(count=models.Count('id')).values('count')
+    Category.objects.update(product_count=Coalesce(models.Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'ordering': ['name'], 'verbose_name_plural': 'Categories'},
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_similar_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_quantity',
+            field=models.PositiveIntegerField(blank=True, help_text='Units available; leave empty to set In stock by hand', null=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='in_stock',
+            field=models.BooleanField(default=True, help_text='Derived from stock quantity when it is set'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:55
+
+import secrets
+
+from django.db import migrations, models
+from django.db.models import Q
+
+BATCH_SIZE = 500
+
+
+def generate_sku():
+    # Frozen copy of products.models.generate_sku as of this migration
+    return f'AM-{secrets.token_hex(4).upper()}'
+
+
+def backfill_skus(apps, schema_editor):
+    """Give every product without a SKU a generated one, so exports re-import"""
+    Product = apps.get_model('products', 'Product')
+    taken = set(Product.objects.exclude(Q(sku__isnull=True) | Q(sku='')).values_list('sku', flat=True))
+
+    while True:
+        products = list(Product.objects.filter(Q(sku__isnull=True) | Q(sku='')).only('id')[:BATCH_SIZE])
+        if not products:
+            break
+        for product in products:
+            sku = generate_sku()
+            while sku in taken:
+                sku = generate_sku()
+            taken.add(sku)
+            product.sku = sku
+        Product.objects.bulk_update(products, ['sku'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_product_stock_quantity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Stock keeping unit; the key used by import_products/export_products. Generated if left empty', max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_skus, migrations.RunPython.noop),
+    ]
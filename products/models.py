@@ -1,5 +1,21 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from .cache import invalidate_catalog
+from .imaging import build_derivatives, srcset
+from .faststart import FaststartError, faststart_file, is_faststart
+from .media_probe import ProbeError, empty_metadata, file_digest, probe_video
+from .tagging import TAG_MAX_LENGTH, parse_tags
+import copy
+import logging
+import secrets
+import struct
+
+logger = logging.getLogger(__name__)
+
+
+# Product text the similar-products index is built from; see products.similarity
+SIMILARITY_TEXT_FIELDS = ('name', 'brand', 'tags', 'description', 'product_details', 'product_benefits')
 
 
 class Category(models.Model):
@@ -7,19 +23,46 @@ class Category(models.Model):
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # In-stock products in this category, maintained by refresh_category_counts()
+    product_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = "Categories"
+        ordering = ['name']
 
     def __str__(self):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_media(self):
+        """Join the category and prefetch ordered images/videos in one plan"""
+        return self.select_related('category').prefetch_related(
+            models.Prefetch('images', queryset=ProductImage.objects.order_by('-is_primary', 'created_at')),
+            models.Prefetch('videos', queryset=ProductVideo.objects.order_by('-is_featured', 'order', 'created_at')),
+        )
+
+
+IN_STOCK = models.Q(in_stock=True)
+
+
+def generate_sku():
+    """A random SKU for products saved without one; import/export is keyed on it"""
+    return f'AM-{secrets.token_hex(4).upper()}'
+
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
+    sku = models.CharField(
+        max_length=64, unique=True, blank=True, null=True,
+        help_text="Stock keeping unit; the key used by import_products/export_products. Generated if left empty"
+    )
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Price in Nigerian Naira (₦)")
-    in_stock = models.BooleanField(default=True)
+    in_stock = models.BooleanField(default=True, help_text="Derived from stock quantity when it is set")
+    stock_quantity = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Units available; leave empty to set In stock by hand"
+    )
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     
     # Product details
@@ -47,21 +90,108 @@ class Product(models.Model):
     
     # SEO and marketing
     tags = models.CharField(max_length=500, blank=True, null=True, help_text="Comma-separated tags for search")
+    # Normalized copy of `tags`, maintained on save (see sync_product_tags)
+    tag_set = models.ManyToManyField(
+        'Tag', through='ProductTag', related_name='products', blank=True, editable=False
+    )
     featured = models.BooleanField(default=False, help_text="Featured product on homepage")
     
+    # Denormalized media summary, maintained by ProductImage/ProductVideo writes
+    primary_image_url = models.CharField(max_length=500, blank=True, null=True, editable=False)
+    primary_image_srcset = models.JSONField(default=dict, blank=True, editable=False)
+    featured_video_url = models.CharField(max_length=500, blank=True, null=True, editable=False)
+    image_count = models.PositiveIntegerField(default=0, editable=False)
+    video_count = models.PositiveIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination walks (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            # Public listing sorted by ?ordering=. Partial on in_stock because Django renders
+            # in_stock=True as a bare `WHERE in_stock`, which SQLite cannot use as an equality
+            # term on an (in_stock, ...) index but does match against an identical index WHERE.
+            # SQLite appends the rowid (id), so the keyset tie-break is covered too.
+            models.Index(fields=['created_at'], condition=IN_STOCK, name='product_stock_created_idx'),
+            models.Index(fields=['price'], condition=IN_STOCK, name='product_stock_price_idx'),
+            models.Index(fields=['name'], condition=IN_STOCK, name='product_stock_name_idx'),
+            # Equality filters combined with the common sorts
+            models.Index(fields=['category', 'created_at'], condition=IN_STOCK, name='product_cat_created_idx'),
+            models.Index(fields=['category', 'price'], condition=IN_STOCK, name='product_cat_price_idx'),
+            models.Index(fields=['brand', 'created_at'], condition=IN_STOCK, name='product_brand_created_idx'),
+            models.Index(
+                fields=['created_at'], condition=IN_STOCK & models.Q(featured=True),
+                name='product_featured_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_tags = instance.__dict__.get('tags')
+        instance._loaded_home_state = (instance.__dict__.get('featured'), instance.__dict__.get('in_stock'))
+        instance._loaded_category_state = (instance.__dict__.get('category_id'), instance.__dict__.get('in_stock'))
+        # Copied: product_details/product_benefits lists are edited in place
+        instance._loaded_text_state = tuple(copy.copy(instance.__dict__.get(f)) for f in SIMILARITY_TEXT_FIELDS)
+        return instance
+
+    def save(self, *args, **kwargs):
+        tags_changed = getattr(self, '_loaded_tags', None) != self.tags or self._state.adding
+        if not self.sku:
+            self.sku = generate_sku()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'sku'}
+        if self.stock_quantity is not None:
+            # Tracked stock: in_stock follows the quantity (see products.inventory)
+            self.in_stock = self.stock_quantity > 0
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'stock_quantity' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'in_stock'}
+        super().save(*args, **kwargs)
+        if tags_changed:
+            sync_product_tags([self])
+            self._loaded_tags = self.tags
+
+    def media_summary(self):
+        """Compute the denormalized media columns from the images/videos relations"""
+        images = self._prefetched('images')
+        if images is None:
+            images = list(self.images.order_by('-is_primary', 'created_at'))
+        videos = self._prefetched('videos')
+        if videos is None:
+            videos = list(self.videos.order_by('-is_featured', 'order', 'created_at'))
+        return {
+            'primary_image_url': images[0].image.url if images else None,
+            'primary_image_srcset': images[0].srcset if images else {},
+            'featured_video_url': videos[0].video.url if videos else None,
+            'image_count': len(images),
+            'video_count': len(videos),
+        }
+
+    def _prefetched(self, relation):
+        """Return the prefetched rows for a relation, or None if not prefetched"""
+        cache = getattr(self, '_prefetched_objects_cache', {})
+        if relation in cache:
+            return list(cache[relation])
+        return None
+
     @property
     def main_image(self):
         """Get the first image for this product"""
-        first_image = self.images.first()
+        images = self._prefetched('images')
+        if images is not None:
+            first_image = images[0] if images else None
+        else:
+            first_image = self.images.first()
         return first_image.image.url if first_image else None
 
     @property
@@ -72,6 +202,11 @@ class Product(models.Model):
     @property
     def main_video(self):
         """Get the first/featured video for this product"""
+        videos = self._prefetched('videos')
+        if videos is not None:
+            featured_video = next((video for video in videos if video.is_featured), None)
+            first_video = featured_video or (videos[0] if videos else None)
+            return first_video.video.url if first_video else None
         featured_video = self.videos.filter(is_featured=True).first()
         if featured_video:
             return featured_video.video.url
@@ -90,7 +225,10 @@ class Product(models.Model):
             'muted': video.muted,
             'show_controls': video.show_controls,
             'is_featured': video.is_featured,
-            'file_size_mb': video.file_size_mb
+            'file_size_mb': video.file_size_mb,
+            'duration_seconds': video.duration_seconds,
+            'width': video.width,
+            'height': video.height,
         } for video in self.videos.all()]
     
     @property
@@ -149,11 +287,181 @@ class Product(models.Model):
             self.product_benefits.remove(benefit)
 
 
+def refresh_media_summary(product_id):
+    """Recompute and store the media summary columns for one product"""
+    product = Product(pk=product_id)
+    summary = product.media_summary()
+    Product.objects.filter(pk=product_id).update(updated_at=timezone.now(), **summary)
+
+
+def refresh_category_counts(category_ids=None):
+    """Recount in-stock products for the given categories (all when None) in one UPDATE"""
+    if category_ids is not None:
+        category_ids = {pk for pk in category_ids if pk is not None}
+        if not category_ids:
+            return
+    counts = Product.objects.filter(IN_STOCK, category=models.OuterRef('pk')).order_by().values(
+        'category'
+    ).annotate(count=models.Count('id')).values('count')
+    categories = Category.objects.all() if category_ids is None else Category.objects.filter(pk__in=category_ids)
+    categories.update(product_count=Coalesce(models.Subquery(counts), 0))
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=TAG_MAX_LENGTH)
+    slug = models.SlugField(max_length=TAG_MAX_LENGTH, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class ProductTag(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='product_links')
+
+    class Meta:
+        constraints = [
+            # Also the index for ?tag= lookups: tag_id first, product_id covered
+            models.UniqueConstraint(fields=['tag', 'product'], name='product_tag_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}:{self.tag_id}"
+
+
+def sync_product_tags(products):
+    """
+    Make the ProductTag rows of `products` match their `tags` strings.
+
+    A fixed number of queries for any number of products: missing Tag rows are
+    bulk-inserted, stale links deleted and new links bulk-inserted.
+    """
+    wanted = {product.pk: dict(parse_tags(product.tags)) for product in products}
+    names = {}
+    for tags in wanted.values():
+        for slug, name in tags.items():
+            names.setdefault(slug, name)
+
+    Tag.objects.bulk_create(
+        [Tag(slug=slug, name=name) for slug, name in names.items()], ignore_conflicts=True
+    )
+    tag_ids = dict(Tag.objects.filter(slug__in=names).values_list('slug', 'id'))
+    wanted_links = {(product_id, tag_ids[slug]) for product_id, tags in wanted.items() for slug in tags}
+
+    current = {
+        (product_id, tag_id): link_id
+        for link_id, product_id, tag_id in ProductTag.objects.filter(
+            product_id__in=wanted
+        ).values_list('id', 'product_id', 'tag_id')
+    }
+    stale = [link_id for key, link_id in current.items() if key not in wanted_links]
+    if stale:
+        ProductTag.objects.filter(id__in=stale).delete()
+    ProductTag.objects.bulk_create(
+        [ProductTag(product_id=product_id, tag_id=tag_id) for product_id, tag_id in wanted_links - current.keys()],
+        ignore_conflicts=True,
+    )
+    if stale or wanted_links - current.keys():
+        invalidate_catalog()
+
+
+class ProductCooccurrence(models.Model):
+    """
+    Basket co-occurrence matrix: orders containing both products, stored in both directions.
+
+    The diagonal (product == other) holds the number of orders containing the product.
+    Maintained incrementally by products.cooccurrence.
+    """
+    # Leading column of the unique constraint, so no separate index
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', db_index=False)
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='product_cooccurrence_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}+{self.other_id}: {self.count}"
+
+
+class RelatedProduct(models.Model):
+    """Precomputed top-k "frequently bought together" companions of a product"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links', db_index=False)
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='companion_links')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            # Also the index /related/ walks: product_id, rank
+            models.UniqueConstraint(fields=['product', 'rank'], name='related_product_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} (#{self.rank})"
+
+
+class SimilarProduct(models.Model):
+    """Precomputed top-k content-based neighbours of a product (TF-IDF cosine similarity)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_links', db_index=False)
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_to_links')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='similar_product_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} ~ {self.similar_id} (#{self.rank})"
+
+
+class SearchDocumentField(models.TextField):
+    """FTS5 hidden column named after its table; the left-hand side of MATCH queries"""
+
+
+@SearchDocumentField.register_lookup
+class FullTextMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class ProductSearchIndex(models.Model):
+    """Read-only view of the products_product_fts FTS5 table (kept in sync by triggers)"""
+    product = models.OneToOneField(
+        Product, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_index', on_delete=models.DO_NOTHING
+    )
+    document = SearchDocumentField(db_column='products_product_fts')
+    rank = models.FloatField(db_column='rank')
+
+    class Meta:
+        managed = False
+        db_table = 'products_product_fts'
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='products/')
     alt_text = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
+    derivatives = models.JSONField(
+        default=dict, blank=True, editable=False,
+        help_text="Resized WebP/JPEG copies: {format: {width: storage name}}"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -166,7 +474,18 @@ class ProductImage(models.Model):
         # If this is set as primary, remove primary from other images
         if self.is_primary:
             ProductImage.objects.filter(product=self.product, is_primary=True).update(is_primary=False)
+        # A freshly uploaded file is not committed to storage until super().save()
+        uploaded = bool(self.image) and not self.image._committed
         super().save(*args, **kwargs)
+        if uploaded:
+            self.derivatives = build_derivatives(self.image.name, self.image.storage)
+            ProductImage.objects.filter(pk=self.pk).update(derivatives=self.derivatives)
+        refresh_media_summary(self.product_id)
+
+    @property
+    def srcset(self):
+        """Responsive sources per format, e.g. {'webp': '/media/a-320w.webp 320w, ...'}"""
+        return srcset(self.derivatives, self.image.storage)
 
 
 class ProductVideo(models.Model):
@@ -200,6 +519,18 @@ class ProductVideo(models.Model):
     order = models.PositiveIntegerField(default=0, help_text="Order of video display (lower numbers first)")
     is_featured = models.BooleanField(default=False, help_text="Featured video (shown first)")
     
+    # Metadata extracted once at upload (see products.media_probe)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, help_text="Size in bytes")
+    duration_seconds = models.FloatField(null=True, blank=True, editable=False)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    codec = models.CharField(max_length=32, blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, help_text="SHA-256 of the file")
+    faststart = models.BooleanField(
+        default=False, editable=False,
+        help_text="MP4 index (moov) is ahead of the media data, so playback starts before the download finishes"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -213,7 +544,43 @@ class ProductVideo(models.Model):
         # If this is set as featured, remove featured from other videos for this product
         if self.is_featured:
             ProductVideo.objects.filter(product=self.product, is_featured=True).update(is_featured=False)
+        # A freshly uploaded file is not committed to storage until super().save()
+        uploaded = bool(self.video) and not self.video._committed
         super().save(*args, **kwargs)
+        if uploaded:
+            self.apply_faststart()
+            metadata = self.extract_metadata()
+            for field, value in metadata.items():
+                setattr(self, field, value)
+            ProductVideo.objects.filter(pk=self.pk).update(**metadata)
+        refresh_media_summary(self.product_id)
+
+    def apply_faststart(self):
+        """Move the MP4 moov box ahead of mdat in the stored file (local storage only)"""
+        try:
+            path = self.video.path
+        except NotImplementedError:
+            return False
+        try:
+            return faststart_file(path)
+        except (OSError, FaststartError, struct.error) as exc:
+            logger.warning(f'Faststart failed for video {self.video.name}: {exc}')
+            return False
+
+    def extract_metadata(self):
+        """Read size, hash and container metadata from the stored file (one pass + header reads)"""
+        metadata = {'file_size': None, 'content_hash': '', 'faststart': False, **empty_metadata()}
+        try:
+            with self.video.storage.open(self.video.name, 'rb') as fileobj:
+                metadata['file_size'], metadata['content_hash'] = file_digest(fileobj)
+                metadata['faststart'] = is_faststart(fileobj)
+                try:
+                    metadata.update(probe_video(fileobj))
+                except (ProbeError, struct.error) as exc:
+                    logger.warning(f'Could not probe video {self.video.name}: {exc}')
+        except OSError as exc:
+            logger.warning(f'Could not read video {self.video.name}: {exc}')
+        return metadata
 
     @property
     def video_url(self):
@@ -222,8 +589,7 @@ class ProductVideo(models.Model):
 
     @property
     def file_size_mb(self):
-        """Get file size in MB"""
-        try:
-            return round(self.video.size / (1024 * 1024), 2) if self.video else 0
-        except:
+        """Get file size in MB (from the stored column, no storage access)"""
+        if self.file_size is None:
             return 0
+        return round(self.file_size / (1024 * 1024), 2)
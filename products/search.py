@@ -0,0 +1,82 @@
+import re
+
+from django.db import connections
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+SNIPPET_TOKENS = 16
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# SQLite drops triggers when Django remakes products_product for a schema change,
+# so these are (re)installed after every migrate; see ProductsConfig.ready().
+SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_ai AFTER INSERT ON products_product BEGIN
+        INSERT INTO products_product_fts(rowid, name, description, brand, tags)
+        VALUES (new.id, new.name, new.description, new.brand, new.tags);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_ad AFTER DELETE ON products_product BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, description, brand, tags)
+        VALUES ('delete', old.id, old.name, old.description, old.brand, old.tags);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_fts_au
+    AFTER UPDATE OF name, description, brand, tags ON products_product BEGIN
+        INSERT INTO products_product_fts(products_product_fts, rowid, name, description, brand, tags)
+        VALUES ('delete', old.id, old.name, old.description, old.brand, old.tags);
+        INSERT INTO products_product_fts(rowid, name, description, brand, tags)
+        VALUES (new.id, new.name, new.description, new.brand, new.tags);
+    END;
+    """,
+]
+
+
+def install_search_triggers(using='default'):
+    """Create the FTS sync triggers if the search table exists and they are missing"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_product_fts'"
+        )
+        if cursor.fetchone() is None:
+            return
+        for statement in SEARCH_TRIGGERS:
+            cursor.execute(statement)
+
+
+def reinstall_search_triggers(sender, using='default', **kwargs):
+    """post_migrate receiver"""
+    install_search_triggers(using)
+
+
+def build_match_expression(query):
+    """Turn free text into an FTS5 query: every term must match, each as a prefix"""
+    terms = _TOKEN_RE.findall(query or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_products(queryset, query):
+    """Filter a Product queryset by full-text query, ranked best match first (bm25)"""
+    expression = build_match_expression(query)
+    if not expression:
+        return queryset.none()
+
+    return queryset.filter(search_index__document__match=expression).annotate(
+        search_rank=F('search_index__rank'),
+        search_highlight=RawSQL(
+            'highlight(products_product_fts, 0, %s, %s)',
+            (HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE)
+        ),
+        search_snippet=RawSQL(
+            'snippet(products_product_fts, 1, %s, %s, %s, %s)',
+            (HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, '…', SNIPPET_TOKENS)
+        ),
+    ).order_by('search_rank', 'id')
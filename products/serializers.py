@@ -1,17 +1,28 @@
 from rest_framework import serializers
-from .models import Product, ProductImage, ProductVideo, Category
+from altivomart_backend.sparse import SparseFieldsetSerializerMixin
+from .models import Product, ProductImage, ProductVideo, Category, Tag
 
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'description', 'product_count', 'created_at', 'updated_at']
+
+
+class TagCountSerializer(serializers.ModelSerializer):
+    product_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Tag
+        fields = ['name', 'slug', 'product_count']
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.ReadOnlyField()
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'is_primary']
+        fields = ['id', 'image', 'srcset', 'alt_text', 'is_primary']
 
 
 class ProductVideoSerializer(serializers.ModelSerializer):
@@ -23,30 +34,69 @@ class ProductVideoSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'video', 'video_url', 'title', 'description', 
             'autoplay', 'loop', 'muted', 'show_controls', 
-            'is_featured', 'order', 'file_size_mb', 'created_at'
+            'is_featured', 'order', 'file_size_mb', 'duration_seconds',
+            'width', 'height', 'codec', 'created_at'
         ]
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+# Serializer fields backed by model properties, mapped to the columns/relations they read
+PRODUCT_FIELD_DEPENDENCIES = {
+    'formatted_price': ['price'],
+    'tag_list': ['tags'],
+    'details_list': ['product_details'],
+    'benefits_list': ['product_benefits'],
+    'all_images': ['images'],
+    'all_videos': ['videos'],
+    'video_urls': ['videos'],
+    'main_video': ['videos'],
+}
+
+
+class ProductListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for product list view (minimal data)"""
-    main_image = serializers.ReadOnlyField()
-    main_video = serializers.ReadOnlyField()
+    main_image = serializers.ReadOnlyField(source='primary_image_url')
+    main_image_srcset = serializers.ReadOnlyField(source='primary_image_srcset')
+    main_video = serializers.ReadOnlyField(source='featured_video_url')
     category_name = serializers.CharField(source='category.name', read_only=True)
     formatted_price = serializers.ReadOnlyField()
     tag_list = serializers.ReadOnlyField()
     details_list = serializers.ReadOnlyField()
     benefits_list = serializers.ReadOnlyField()
+    # Only present on `?q=` search results
+    search_highlight = serializers.ReadOnlyField()
+    search_snippet = serializers.ReadOnlyField()
 
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'price', 'formatted_price', 'in_stock', 'main_image', 'main_video',
-            'category_name', 'brand', 'featured', 'tag_list', 'created_at',
-            'product_details', 'details_list', 'product_benefits', 'benefits_list'
+            'id', 'name', 'price', 'formatted_price', 'in_stock', 'main_image', 'main_image_srcset',
+            'main_video', 'image_count', 'video_count', 'category_name', 'brand', 'featured', 'tag_list', 'created_at',
+            'product_details', 'details_list', 'product_benefits', 'benefits_list',
+            'search_highlight', 'search_snippet'
+        ]
+        # ?profile=compact: no duplicated list/property variants, only what a product card renders
+        compact_fields = [
+            'id', 'name', 'price', 'formatted_price', 'in_stock', 'main_image', 'main_image_srcset',
+            'main_video', 'category_name', 'brand', 'featured', 'tag_list', 'created_at',
+            'product_details', 'product_benefits', 'search_highlight', 'search_snippet'
+        ]
+        field_dependencies = {
+            **PRODUCT_FIELD_DEPENDENCIES,
+            # Denormalized here, not derived from the videos relation
+            'main_video': ['featured_video_url'],
+        }
+
+
+class HomeProductSerializer(ProductListSerializer):
+    """Product cards in the pre-rendered homepage bundle (compact profile, no search fields)"""
+
+    class Meta(ProductListSerializer.Meta):
+        fields = [
+            field for field in ProductListSerializer.Meta.compact_fields if not field.startswith('search_')
         ]
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for product detail view (full data)"""
     images = ProductImageSerializer(many=True, read_only=True)
     videos = ProductVideoSerializer(many=True, read_only=True)
@@ -63,7 +113,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'formatted_price', 'in_stock', 
+            'id', 'name', 'sku', 'description', 'price', 'formatted_price', 'in_stock', 
             'category', 'category_name', 'images', 'all_images', 'videos', 'all_videos', 
             'video_urls', 'main_video',
             
@@ -84,6 +134,13 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             
             'created_at', 'updated_at'
         ]
+        # ?profile=compact: images/videos once (no all_images/all_videos/video_urls copies)
+        compact_fields = [
+            'id', 'name', 'description', 'price', 'formatted_price', 'in_stock', 'category_name',
+            'images', 'videos', 'brand', 'how_to_use', 'estimated_delivery_days',
+            'product_details', 'product_benefits', 'tag_list', 'featured', 'updated_at'
+        ]
+        field_dependencies = PRODUCT_FIELD_DEPENDENCIES
 
 
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
@@ -92,7 +149,7 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'in_stock', 'category',
+            'id', 'name', 'sku', 'description', 'price', 'stock_quantity', 'in_stock', 'category',
             
             # Product details
             'brand',
@@ -0,0 +1,83 @@
+import copy
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .cache import invalidate_catalog
+from .home import schedule_home_rebuild
+from .models import (
+    SIMILARITY_TEXT_FIELDS, Category, Product, ProductImage, ProductVideo, SimilarProduct, refresh_category_counts,
+    refresh_media_summary,
+)
+from .similarity import schedule_similar_refresh
+
+
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=ProductVideo)
+def media_deleted(sender, instance, **kwargs):
+    """Keep the product's media summary columns in sync when media is removed"""
+    refresh_media_summary(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVideo)
+@receiver(post_delete, sender=ProductVideo)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+    """Any catalog write invalidates cached catalog responses"""
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Product)
+def product_category_count(sender, instance, created, **kwargs):
+    """Keep Category.product_count in step when a product moves category or stock state"""
+    state = (instance.__dict__.get('category_id'), instance.__dict__.get('in_stock'))
+    loaded = getattr(instance, '_loaded_category_state', (None, None))
+    if created or loaded != state:
+        refresh_category_counts({loaded[0], state[0]})
+    instance._loaded_category_state = state
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    refresh_category_counts({instance.category_id})
+
+
+# Registered after catalog_changed so the rebuild runs after its on-commit version bump
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    """Rebuild the homepage bundle when a product enters or leaves it"""
+    state = (instance.__dict__.get('featured'), instance.__dict__.get('in_stock'))
+    if created or getattr(instance, '_loaded_home_state', None) != state:
+        schedule_home_rebuild()
+    instance._loaded_home_state = state
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVideo)
+@receiver(post_delete, sender=ProductVideo)
+def home_media_changed(sender, **kwargs):
+    """Product removals and media changes alter the cards in the homepage bundle"""
+    schedule_home_rebuild()
+
+
+@receiver(post_save, sender=Product)
+def product_text_changed(sender, instance, created, **kwargs):
+    """Re-rank similar products around a product whose text changed"""
+    state = tuple(instance.__dict__.get(field) for field in SIMILARITY_TEXT_FIELDS)
+    if created or getattr(instance, '_loaded_text_state', None) != state:
+        schedule_similar_refresh(instance.pk)
+    instance._loaded_text_state = tuple(copy.copy(value) for value in state)
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleting(sender, instance, **kwargs):
+    """Products listing a deleted product as similar need a replacement neighbour"""
+    owners = SimilarProduct.objects.filter(similar=instance).values_list('product_id', flat=True)
+    # The deleted product itself is included so its row leaves the stored index
+    schedule_similar_refresh(instance.pk, *owners)
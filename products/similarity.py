@@ -0,0 +1,255 @@
+"""
+Content-based "similar products" from product text.
+
+Each product is a TF-IDF vector over the words of its name, description, brand,
+tags, details and benefits (name weighted highest). Rows are L2-normalised, so the
+cosine similarity of every pair is one sparse product X Xᵀ, computed in dense
+blocks of rows to bound memory. The top SIMILAR_TOP_K neighbours per product are
+stored in SimilarProduct; requests only read that table.
+
+The term frequencies, vocabulary and document frequencies are kept in the shared cache as a
+SimilarityIndex. Saving a product whose text changed schedules refresh_similar() on
+the background worker (see products.background). It reads and vectorizes only the
+changed products and swaps their rows into the stored term frequencies (updating
+document frequencies, adding new terms); re-weighting the stored rows is a few
+vectorized array operations. It then re-ranks the saved product and only the
+products whose lists it enters, leaves or moves within. Scores of untouched lists
+drift slightly with the IDF weights until the next full rebuild
+(build_similar_products), which is also needed after bulk imports since bulk
+upserts skip the save signals. If the stored index is missing (evicted, first run),
+one refresh loads the whole catalog to rebuild it.
+"""
+import re
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from scipy import sparse
+
+from .background import CoalescingTask
+from .models import SIMILARITY_TEXT_FIELDS, Product, SimilarProduct
+
+SIMILAR_TOP_K = 10
+# Neighbours scoring below this share little more than a common word
+MIN_SIMILARITY = 0.05
+# Keys must match models.SIMILARITY_TEXT_FIELDS
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'brand': 2.0,
+    'tags': 2.0,
+    'description': 1.0,
+    'product_details': 1.0,
+    'product_benefits': 1.0,
+}
+# Dense cells per block, for both the similarity block and the densified rows (float64: 32 MB)
+BLOCK_CELLS = 1 << 22
+WRITE_BATCH_SIZE = 5000
+INDEX_CACHE_KEY = 'similarity:index'
+
+_TOKEN_RE = re.compile(r'[^\W\d_]{2,}', re.UNICODE)
+STOP_WORDS = frozenset('''
+    a an and are as at be by for from has have in is it its of on or our the this to with your you
+    can will use used using all any more most very also into per not no other than that these those
+'''.split())
+
+
+def product_terms(values):
+    """{term: weight} for one product's text fields (a dict keyed like SIMILARITY_TEXT_FIELDS)"""
+    terms = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = values.get(field)
+        if isinstance(value, list):
+            value = ' '.join(str(item) for item in value)
+        for token in _TOKEN_RE.findall(str(value or '').lower()):
+            if token not in STOP_WORDS:
+                terms[token] = terms.get(token, 0.0) + weight
+    return terms
+
+
+class SimilarityIndex:
+    """
+    Term frequencies of the catalog plus the vocabulary, kept so a save only has to
+    tokenize the changed products.
+
+    `tf` holds sublinear term frequencies (1 + log tf), one row per entry of the sorted
+    `product_ids`; `vocabulary` maps a term to its column and `df` counts the products
+    containing each term. matrix() weights them with the smoothed IDF
+    (1 + log((1 + n) / (1 + df))) and L2-normalises the rows.
+    """
+
+    def __init__(self):
+        self.product_ids = np.empty(0, dtype=np.int64)
+        self.tf = sparse.csr_matrix((0, 0))
+        self.vocabulary = {}
+        self.df = np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def build(cls, rows):
+        """Index an iterable of (pk, {field: value}) rows"""
+        index = cls()
+        index.update(rows)
+        return index
+
+    def update(self, rows, removed_ids=()):
+        """Replace (or add) the rows for `rows` and drop the products in `removed_ids`"""
+        rows = list(rows)
+        replaced = np.isin(self.product_ids, [pk for pk, _ in rows] + list(removed_ids))
+        # Products leaving the index no longer count towards document frequencies
+        self.df = self.df - np.bincount(self.tf[replaced].indices, minlength=len(self.df))
+
+        product_ids, documents, columns, weights = [], [], [], []
+        for index, (pk, values) in enumerate(rows):
+            product_ids.append(pk)
+            for term, weight in product_terms(values).items():
+                documents.append(index)
+                columns.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                weights.append(weight)
+        width = len(self.vocabulary)
+        tf = sparse.csr_matrix(
+            (np.array(weights, dtype=float), (np.array(documents, dtype=np.int64), np.array(columns, dtype=np.int64))),
+            shape=(len(product_ids), width),
+        )
+        tf.data = 1.0 + np.log(tf.data)
+        self.df = np.concatenate([self.df, np.zeros(width - len(self.df), dtype=np.int64)])
+        self.df += np.bincount(tf.indices, minlength=width)
+
+        kept = self.tf[~replaced]
+        kept = sparse.csr_matrix((kept.data, kept.indices, kept.indptr), shape=(kept.shape[0], width))
+        product_ids = np.concatenate([self.product_ids[~replaced], np.array(product_ids, dtype=np.int64)])
+        order = np.argsort(product_ids, kind='stable')
+        self.product_ids = product_ids[order]
+        self.tf = sparse.vstack([kept, tf], format='csr')[order]
+
+    def matrix(self):
+        """CSR matrix of L2-normalised TF-IDF rows"""
+        idf = 1.0 + np.log((1.0 + len(self.product_ids)) / (1.0 + self.df))
+        matrix = self.tf @ sparse.diags(idf)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return (sparse.diags(1.0 / norms) @ matrix).tocsr()
+
+
+def tfidf_matrix(rows):
+    """(product_ids, X) for an iterable of (pk, {field: value}) rows; X is a CSR matrix of TF-IDF rows"""
+    index = SimilarityIndex.build(rows)
+    return index.product_ids, index.matrix()
+
+
+def _text_rows(queryset):
+    rows = queryset.order_by('id').values_list('id', *SIMILARITY_TEXT_FIELDS).iterator(chunk_size=2000)
+    return ((row[0], dict(zip(SIMILARITY_TEXT_FIELDS, row[1:]))) for row in rows)
+
+
+def load_index():
+    """The stored index, or one built from every product (and stored) if there is none"""
+    index = cache.get(INDEX_CACHE_KEY)
+    if index is None:
+        index = SimilarityIndex.build(_text_rows(Product.objects.all()))
+        cache.set(INDEX_CACHE_KEY, index, timeout=None)
+    return index
+
+
+def _blocks(positions, matrix):
+    size = max(1, BLOCK_CELLS // max(*matrix.shape, 1))
+    for start in range(0, len(positions), size):
+        yield positions[start:start + size]
+
+
+def _similarities(matrix, block):
+    """Dense (len(block) x n) cosine similarities; sparse x dense beats sparse x sparse here"""
+    return np.ascontiguousarray((matrix @ matrix[block].T.toarray()).T)
+
+
+def nearest_neighbours(matrix, positions, k=SIMILAR_TOP_K):
+    """
+    Top-k rows by cosine similarity for each row position, excluding the row itself.
+
+    Returns (source, target, rank, score) arrays of row positions, best first.
+    """
+    results = []
+    count = matrix.shape[0]
+    for block in _blocks(np.asarray(positions, dtype=np.int64), matrix):
+        scores = _similarities(matrix, block)
+        scores[np.arange(len(block)), block] = -1.0
+        width = min(k, count - 1)
+        if width <= 0:
+            continue
+        top = np.argpartition(-scores, width - 1, axis=1)[:, :width]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        # Best first; ties go to the lower row (= lower product id)
+        order = np.lexsort((top, -top_scores), axis=1)
+        top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+        source = np.repeat(block, width)
+        rank = np.tile(np.arange(width), len(block))
+        # Scores are sorted, so ranks stay dense after dropping weak neighbours
+        keep = top_scores.ravel() >= MIN_SIMILARITY
+        results.append((source[keep], top.ravel()[keep], rank[keep], top_scores.ravel()[keep]))
+    if not results:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0)
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+def _write(product_ids, source, target, rank, score):
+    SimilarProduct.objects.bulk_create(
+        [
+            SimilarProduct(product_id=p, similar_id=s, rank=r, score=v)
+            for p, s, r, v in zip(
+                product_ids[source].tolist(), product_ids[target].tolist(), rank.tolist(), score.tolist()
+            )
+        ],
+        batch_size=WRITE_BATCH_SIZE,
+    )
+
+
+def rebuild_similar_products():
+    """Recompute every product's neighbour list; returns the number of products"""
+    index = SimilarityIndex.build(_text_rows(Product.objects.all()))
+    cache.set(INDEX_CACHE_KEY, index, timeout=None)
+    product_ids, matrix = index.product_ids, index.matrix()
+    neighbours = nearest_neighbours(matrix, np.arange(len(product_ids)))
+    with transaction.atomic():
+        SimilarProduct.objects.all().delete()
+        _write(product_ids, *neighbours)
+    return len(product_ids)
+
+
+def refresh_similar(changed_ids):
+    """Re-rank the given products and every list they now enter, leave or move within"""
+    index = load_index()
+    # Only the changed rows are read and vectorized; deleted products drop out
+    index.update(_text_rows(Product.objects.filter(pk__in=changed_ids)), removed_ids=changed_ids)
+    cache.set(INDEX_CACHE_KEY, index, timeout=None)
+    product_ids, matrix = index.product_ids, index.matrix()
+    changed = np.flatnonzero(np.isin(product_ids, list(changed_ids)))
+    if not len(changed):
+        return
+
+    # Current lists: the k-th best score is the bar a changed product must beat to enter
+    current = np.array(list(SimilarProduct.objects.values_list('product_id', 'similar_id', 'score')))
+    current = current.reshape(-1, 3)
+    owners = np.searchsorted(product_ids, current[:, 0].astype(np.int64))
+    list_sizes = np.bincount(owners, minlength=len(product_ids))
+    bars = np.full(len(product_ids), np.inf)
+    np.minimum.at(bars, owners, current[:, 2])
+    bars[list_sizes < SIMILAR_TOP_K] = MIN_SIMILARITY
+
+    enters = np.zeros(len(product_ids), dtype=bool)
+    for block in _blocks(changed, matrix):
+        enters |= (_similarities(matrix, block) >= bars).any(axis=0)
+    listed = np.zeros(len(product_ids), dtype=bool)
+    listed[owners[np.isin(current[:, 1].astype(np.int64), product_ids[changed])]] = True
+    affected = np.union1d(changed, np.flatnonzero(enters | listed))
+
+    neighbours = nearest_neighbours(matrix, affected)
+    with transaction.atomic():
+        SimilarProduct.objects.filter(product_id__in=product_ids[affected].tolist()).delete()
+        _write(product_ids, *neighbours)
+
+
+_similar_task = CoalescingTask(refresh_similar)
+
+
+def schedule_similar_refresh(*product_ids):
+    """Refresh the neighbour lists around these products in the background after commit"""
+    _similar_task.schedule(*product_ids)
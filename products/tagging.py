@@ -0,0 +1,14 @@
+from django.utils.text import slugify
+
+TAG_MAX_LENGTH = 50
+
+
+def parse_tags(text):
+    """Split a comma-separated tag string into ordered, de-duplicated (slug, name) pairs"""
+    tags = {}
+    for raw in (text or '').split(','):
+        name = raw.strip()[:TAG_MAX_LENGTH]
+        slug = slugify(name)[:TAG_MAX_LENGTH]
+        if slug and slug not in tags:
+            tags[slug] = name
+    return list(tags.items())
@@ -1,3 +1,1505 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import quote
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from altivomart_backend.pagination import KeysetPagination
+from orders.models import Order
+
+from .cache import invalidate_catalog
+from .catalog_io import CatalogImporter
+from .cooccurrence import rebuild_related_products, record_orders, record_pending_orders
+from .similarity import product_terms, rebuild_similar_products
+from .home import HOME_CACHE_KEY, negotiate_encoding
+from .inventory import InsufficientStock, reserve_stock
+from .faststart import faststart, is_faststart, needs_faststart, relocate_moov
+from .media_probe import iter_boxes, probe_video
+from .filters import TagFilter
+from .models import (
+    Category, Product, ProductCooccurrence, ProductImage, ProductVideo, RelatedProduct, SimilarProduct, Tag,
+    refresh_category_counts,
+)
+from .search import search_products
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CATALOG_TASKS_ASYNC=False,
+)
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+
+def make_product(category=None, **kwargs):
+    defaults = {
+        'name': 'Test product',
+        'description': 'A product used in tests',
+        'price': Decimal('1000.00'),
+        'category': category,
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(**defaults)
+
+
+class ProductListQueryCountTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Gadgets')
+
+    def create_products(self, count):
+        for index in range(count):
+            product = make_product(self.category, name=f'Product {index}')
+            ProductImage.objects.create(product=product, image=f'products/{index}-a.jpg')
+            ProductImage.objects.create(product=product, image=f'products/{index}-b.jpg', is_primary=True)
+            ProductVideo.objects.create(product=product, video=f'products/videos/{index}.mp4')
+            ProductVideo.objects.create(product=product, video=f'products/videos/{index}-f.mp4', is_featured=True)
+
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_public_list_query_count_is_constant(self):
+        self.create_products(2)
+        small_count, _ = self.count_list_queries('/api/products/')
+
+        self.create_products(18)
+        large_count, response = self.count_list_queries('/api/products/')
+
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(small_count, large_count)
+
+    def test_main_media_served_from_summary_columns(self):
+        self.create_products(1)
+        _, response = self.count_list_queries('/api/products/')
+
+        row = response.data['results'][0]
+        self.assertEqual(row['main_image'], '/media/products/0-b.jpg')
+        self.assertEqual(row['main_video'], '/media/products/videos/0-f.mp4')
+        self.assertEqual(row['category_name'], 'Gadgets')
+
+    def test_properties_fall_back_without_prefetch(self):
+        self.create_products(1)
+        product = Product.objects.get()
+
+        self.assertEqual(product.main_image, '/media/products/0-b.jpg')
+        self.assertEqual(product.main_video, '/media/products/videos/0-f.mp4')
+
+
+class ProductMediaSummaryTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = make_product()
+
+    def test_summary_follows_primary_and_featured_changes(self):
+        first = ProductImage.objects.create(product=self.product, image='products/first.jpg')
+        ProductImage.objects.create(product=self.product, image='products/second.jpg', is_primary=True)
+        ProductVideo.objects.create(product=self.product, video='products/videos/clip.mp4')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_url, '/media/products/second.jpg')
+        self.assertEqual(self.product.featured_video_url, '/media/products/videos/clip.mp4')
+        self.assertEqual((self.product.image_count, self.product.video_count), (2, 1))
+
+        first.is_primary = True
+        first.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_url, '/media/products/first.jpg')
+
+    def test_summary_updated_on_delete(self):
+        image = ProductImage.objects.create(product=self.product, image='products/only.jpg')
+        image.delete()
+
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.primary_image_url)
+        self.assertEqual(self.product.image_count, 0)
+
+    def test_backfill_command_refreshes_cached_lists(self):
+        ProductImage.objects.create(product=self.product, image='products/only.jpg')
+        Product.objects.filter(pk=self.product.pk).update(primary_image_url=None, image_count=0)
+        self.client.get('/api/products/')
+
+        call_command('backfill_media_summary', stdout=io.StringIO())
+
+        product = self.client.get('/api/products/').data['results'][0]
+        self.assertEqual(product['main_image'], '/media/products/only.jpg')
+
+
+class ProductSearchTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cutter = make_product(
+            name='Cordless grass cutter', description='Trims edges quickly',
+            brand='Makita', tags='garden, lawn'
+        )
+        self.washer = make_product(
+            name='Car wash gun', description='Rechargeable washer, also handy in the garden',
+            tags='car, cleaning'
+        )
+        make_product(name='Hidden blender', description='Kitchen garden blender', in_stock=False)
+
+    def search(self, query):
+        response = self.client.get('/api/products/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_prefix_match_ranked_by_bm25(self):
+        results = self.search('gard')
+
+        self.assertEqual([row['id'] for row in results], [self.cutter.id, self.washer.id])
+        self.assertIn('<mark>garden</mark>', results[1]['search_snippet'])
+
+    def test_all_terms_must_match(self):
+        results = self.search('recharg wash')
+
+        self.assertEqual([row['id'] for row in results], [self.washer.id])
+        self.assertEqual(results[0]['search_highlight'], 'Car <mark>wash</mark> gun')
+
+    def test_index_follows_updates_and_deletes(self):
+        self.washer.name = 'Pressure sprayer'
+        self.washer.save()
+        self.assertEqual([row['id'] for row in self.search('pressure')], [self.washer.id])
+
+        self.washer.delete()
+        self.assertEqual(self.search('pressure'), [])
+
+    def test_results_without_query_have_no_search_fields(self):
+        row = self.client.get('/api/products/').data['results'][0]
+
+        self.assertNotIn('search_highlight', row)
+
+
+class ProductKeysetPaginationTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = [make_product(name=f'Product {index}') for index in range(25)]
+        # Force timestamp ties so the id tie-break matters
+        now = timezone.now()
+        for index, product in enumerate(self.products):
+            Product.objects.filter(pk=product.pk).update(created_at=now - timedelta(minutes=index // 3))
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_walks_every_row_once_in_stable_order(self):
+        ids = self.walk('/api/products/?page_size=7')
+
+        expected = list(
+            Product.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_previous_cursor_returns_prior_page(self):
+        first = self.client.get('/api/products/?page_size=10').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+
+        self.assertIsNone(first['previous'])
+        self.assertEqual(
+            [row['id'] for row in back['results']],
+            [row['id'] for row in first['results']]
+        )
+
+    def test_page_queries_do_not_use_offset(self):
+        first = self.client.get('/api/products/?page_size=10').data
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first['next'])
+
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_approximate_count_is_capped(self):
+        response = self.client.get('/api/products/?count=approx')
+        self.assertEqual((response.data['count'], response.data['count_is_exact']), (25, True))
+
+        cache.clear()
+        with mock.patch.object(KeysetPagination, 'approximate_count_cap', 10):
+            response = self.client.get('/api/products/?count=approx')
+        self.assertEqual((response.data['count'], response.data['count_is_exact']), (10, False))
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/api/products/?cursor=not-a-cursor')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class CatalogResponseCacheTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Garden')
+        self.product = make_product(self.category, name='Lawn mower')
+
+    def test_repeat_requests_are_served_from_cache(self):
+        # The detail view still runs its one-row ETag/Last-Modified lookup
+        urls = [('/api/products/', 0), (f'/api/products/{self.product.pk}/', 1), ('/api/products/categories/', 0)]
+        for url, queries in urls:
+            self.client.get(url)
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_query_string_is_normalized(self):
+        self.client.get('/api/products/?page_size=5&category=%d' % self.category.pk)
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/?category=%d&page_size=5&q=' % self.category.pk)
+
+    def test_repeated_and_comma_values_are_distinct_keys(self):
+        make_product(self.category, name='Hedge trimmer', brand='Stihl')
+
+        repeated = self.client.get('/api/products/?brand=Honda&brand=Stihl').data['results']
+        comma = self.client.get('/api/products/?brand=Honda,Stihl').data['results']
+
+        # The last value wins for a single-valued filter; the comma one is a literal brand
+        self.assertEqual([row['name'] for row in repeated], ['Hedge trimmer'])
+        self.assertEqual(comma, [])
+
+    def test_catalog_writes_invalidate(self):
+        url = f'/api/products/{self.product.pk}/'
+        self.client.get(url)
+
+        self.product.name = 'Ride-on mower'
+        self.product.save()
+        self.assertEqual(self.client.get(url).data['name'], 'Ride-on mower')
+
+        ProductImage.objects.create(product=self.product, image='products/mower.jpg')
+        self.assertEqual(len(self.client.get(url).data['images']), 1)
+
+        self.category.name = 'Outdoor'
+        self.category.save()
+        self.assertEqual(self.client.get(url).data['category_name'], 'Outdoor')
+
+
+class ProductConditionalGetTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = make_product(name='Blender')
+        self.url = f'/api/products/{self.product.pk}/'
+
+    def test_unchanged_product_returns_304_without_serializing(self):
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_media_change_invalidates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        ProductImage.objects.create(product=self.product, image='products/blender.jpg')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_product_is_404(self):
+        self.assertEqual(self.client.get('/api/products/999999/').status_code, 404)
+
+
+def make_image_upload(name='photo.png', size=(1200, 800), mode='RGBA'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 40, 40, 255) if mode == 'RGBA' else (200, 40, 40)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageDerivativeTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.product = make_product(name='Spray paint gun')
+
+    def test_upload_generates_derivatives_smaller_than_original(self):
+        image = ProductImage.objects.create(product=self.product, image=make_image_upload(size=(700, 400)))
+
+        self.assertEqual(sorted(image.derivatives['webp']), ['320', '640'])
+        with Image.open(f"{self.media_root}/{image.derivatives['jpeg']['320']}") as jpeg:
+            self.assertEqual((jpeg.format, jpeg.size), ('JPEG', (320, 183)))
+        self.assertRegex(image.srcset['webp'], r'^/media/products/photo.*-320w\.webp 320w, .*-640w\.webp 640w$')
+
+    def test_same_stem_uploads_keep_their_own_derivatives(self):
+        red = ProductImage.objects.create(product=self.product, image=make_image_upload('shoe.png', size=(700, 400)))
+        buffer = io.BytesIO()
+        Image.new('RGB', (700, 400), (0, 0, 255)).save(buffer, 'JPEG')
+        blue = ProductImage.objects.create(
+            product=make_product(name='Blue shoe'), image=SimpleUploadedFile('shoe.jpg', buffer.getvalue())
+        )
+
+        self.assertNotEqual(red.derivatives['jpeg']['320'], blue.derivatives['jpeg']['320'])
+        self.assertTrue(red.derivatives['webp']['320'].endswith('shoe.png-320w.webp'))
+        with Image.open(f"{self.media_root}/{red.derivatives['jpeg']['320']}") as jpeg:
+            self.assertGreater(jpeg.getpixel((10, 10))[0], 150)
+        with Image.open(f"{self.media_root}/{blue.derivatives['jpeg']['320']}") as jpeg:
+            self.assertGreater(jpeg.getpixel((10, 10))[2], 150)
+
+    def test_force_regeneration_replaces_files(self):
+        image = ProductImage.objects.create(product=self.product, image=make_image_upload(size=(700, 400)))
+        old = set(image.derivatives['webp'].values()) | set(image.derivatives['jpeg'].values())
+
+        call_command('generate_image_derivatives', '--force', workers=1, stdout=io.StringIO())
+
+        image.refresh_from_db()
+        new = set(image.derivatives['webp'].values()) | set(image.derivatives['jpeg'].values())
+        self.assertEqual(len(new), 4)
+        self.assertFalse(old & new)
+        storage = ProductImage._meta.get_field('image').storage
+        self.assertTrue(all(storage.exists(name) for name in new))
+        self.assertFalse(any(storage.exists(name) for name in old))
+
+    def test_srcset_exposed_in_detail_and_list(self):
+        ProductImage.objects.create(product=self.product, image=make_image_upload(), is_primary=True)
+
+        detail = self.client.get(f'/api/products/{self.product.pk}/').data
+        row = self.client.get('/api/products/').data['results'][0]
+
+        self.assertIn('1024w', detail['images'][0]['srcset']['jpeg'])
+        self.assertEqual(row['main_image_srcset'], detail['images'][0]['srcset'])
+
+    def test_backfill_command_processes_existing_images(self):
+        name = self.product.images.model.image.field.storage.save('products/old.png', make_image_upload())
+        image = ProductImage.objects.create(product=self.product, image=name)
+        self.assertEqual(image.derivatives, {})
+
+        call_command('generate_image_derivatives', workers=2, stdout=io.StringIO())
+
+        image.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(len(image.derivatives['webp']), 3)
+        self.assertEqual(self.product.primary_image_srcset, image.srcset)
+
+
+class BatchedImageUploadTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.product = make_product(name='Car wash kit')
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_authenticate(admin)
+        self.url = f'/api/products/admin/{self.product.pk}/images/'
+
+    def test_uploads_commit_in_one_insert_with_per_file_errors(self):
+        good = [make_image_upload(f'good-{index}.png', size=(400, 300)) for index in range(3)]
+        bad_checksum = make_image_upload('tampered.png')
+        not_image = SimpleUploadedFile('notes.png', b'plain text', content_type='image/png')
+        checksums = [hashlib.sha256(upload.read()).hexdigest() for upload in good]
+        for upload in good:
+            upload.seek(0)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {
+                'images': good + [bad_checksum, not_image],
+                'checksums': checksums + ['0' * 64, ''],
+                'alt_text': 'Car wash kit photo',
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['images']), 3)
+        self.assertEqual(
+            response.data['errors'],
+            [{'file': 'tampered.png', 'error': 'Checksum mismatch'},
+             {'file': 'notes.png', 'error': 'Not a valid image'}]
+        )
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "products_productimage"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_count, 3)
+        self.assertEqual(
+            set(self.product.images.values_list('alt_text', flat=True)), {'Car wash kit photo'}
+        )
+        self.assertIn('320', self.product.images.first().derivatives['webp'])
+
+    def test_same_stem_uploads_in_one_batch(self):
+        response = self.client.post(self.url, {
+            'images': [make_image_upload('kit.png', size=(400, 300)), make_image_upload('kit.jpg', size=(400, 300))],
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        names = [
+            name for image in ProductImage.objects.all()
+            for sizes in image.derivatives.values() for name in sizes.values()
+        ]
+        self.assertEqual(len(names), 4)
+        self.assertEqual(len(set(names)), 4)
+
+    def test_failed_derivative_removes_stored_files(self):
+        storage = ProductImage._meta.get_field('image').storage
+        save = storage.save
+
+        def flaky_save(name, content, *args, **kwargs):
+            if name.endswith('-640w.webp'):
+                raise OSError('disk full')
+            return save(name, content, *args, **kwargs)
+
+        with mock.patch.object(storage, 'save', side_effect=flaky_save):
+            response = self.client.post(self.url, {
+                'images': [make_image_upload('big.png', size=(700, 400))],
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], [{'file': 'big.png', 'error': 'Could not store file'}])
+        self.assertEqual(ProductImage.objects.count(), 0)
+        stored = [name for _, _, files in os.walk(self.media_root) for name in files]
+        self.assertEqual(stored, [])
+
+    def test_all_invalid_is_400(self):
+        response = self.client.post(self.url, {
+            'images': [SimpleUploadedFile('x.png', b'nope')],
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ProductImage.objects.count(), 0)
+
+
+def mp4_box(box_type, payload):
+    return struct.pack('>I', 8 + len(payload)) + box_type + payload
+
+
+def make_mp4(width=640, height=360, timescale=1000, duration=12500, codec=b'avc1', mdat=b'\x11' * 64):
+    """A tiny but structurally valid MP4 (ftyp, mdat, moov) with one video track"""
+    ftyp = mp4_box(b'ftyp', b'isom\x00\x00\x02\x00isomavc1')
+    mdat_box = mp4_box(b'mdat', mdat)
+    mvhd = mp4_box(b'mvhd', b'\x00' * 12 + struct.pack('>II', timescale, duration) + b'\x00' * 80)
+    tkhd = mp4_box(b'tkhd', b'\x00' * 76 + struct.pack('>II', width << 16, height << 16))
+    hdlr = mp4_box(b'hdlr', b'\x00' * 8 + b'vide' + b'\x00' * 13)
+    stsd = mp4_box(b'stsd', b'\x00' * 4 + struct.pack('>I', 1) + mp4_box(codec, b'\x00' * 78))
+    chunk_offsets = [len(ftyp) + 8, len(ftyp) + 8 + len(mdat) // 2]
+    stco = mp4_box(b'stco', b'\x00' * 4 + struct.pack('>I', 2) + b''.join(struct.pack('>I', o) for o in chunk_offsets))
+    stbl = mp4_box(b'stbl', stsd + stco)
+    mdia = mp4_box(b'mdia', hdlr + mp4_box(b'minf', stbl))
+    moov = mp4_box(b'moov', mvhd + mp4_box(b'trak', tkhd + mdia))
+    return ftyp + mdat_box + moov
+
+
+def ebml(element_id, payload):
+    size = len(payload)
+    return element_id + bytes([0x01]) + size.to_bytes(7, 'big') + payload
+
+
+def make_webm(width=1280, height=720, duration_ms=4200.0, codec=b'V_VP9'):
+    header = ebml(b'\x1a\x45\xdf\xa3', ebml(b'\x42\x82', b'webm'))
+    info = ebml(b'\x15\x49\xa9\x66', ebml(b'\x2a\xd7\xb1', (1000000).to_bytes(3, 'big'))
+                + ebml(b'\x44\x89', struct.pack('>d', duration_ms)))
+    video = ebml(b'\xe0', ebml(b'\xb0', width.to_bytes(2, 'big')) + ebml(b'\xba', height.to_bytes(2, 'big')))
+    audio_track = ebml(b'\xae', ebml(b'\x83', b'\x02') + ebml(b'\x86', b'A_OPUS'))
+    video_track = ebml(b'\xae', ebml(b'\x83', b'\x01') + ebml(b'\x86', codec) + video)
+    tracks = ebml(b'\x16\x54\xae\x6b', audio_track + video_track)
+    cluster = ebml(b'\x1f\x43\xb6\x75', b'\x00' * 32)
+    return header + ebml(b'\x18\x53\x80\x67', info + tracks + cluster)
+
+
+class VideoMetadataTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.product = make_product(name='Grass cutter')
+
+    def test_probe_mp4(self):
+        metadata = probe_video(io.BytesIO(make_mp4()))
+
+        self.assertEqual(metadata, {'duration_seconds': 12.5, 'width': 640, 'height': 360, 'codec': 'avc1'})
+
+    def test_probe_webm(self):
+        metadata = probe_video(io.BytesIO(make_webm()))
+
+        self.assertEqual(metadata, {'duration_seconds': 4.2, 'width': 1280, 'height': 720, 'codec': 'V_VP9'})
+
+    def test_upload_stores_metadata_and_detail_does_no_file_io(self):
+        data = make_mp4()
+        video = ProductVideo.objects.create(
+            product=self.product, video=SimpleUploadedFile('demo.mp4', data, content_type='video/mp4')
+        )
+        video.refresh_from_db()
+        self.assertEqual((video.file_size, video.width, video.height), (len(data), 640, 360))
+        with video.video.open('rb') as stored:
+            self.assertEqual(video.content_hash, hashlib.sha256(stored.read()).hexdigest())
+
+        with mock.patch('django.core.files.storage.FileSystemStorage.size') as size, \
+                mock.patch('django.core.files.storage.FileSystemStorage.open') as open_:
+            response = self.client.get(f'/api/products/{self.product.pk}/')
+        size.assert_not_called()
+        open_.assert_not_called()
+        self.assertEqual(response.data['videos'][0]['duration_seconds'], 12.5)
+        self.assertEqual(response.data['all_videos'][0]['width'], 640)
+
+    def test_backfill_command(self):
+        name = ProductVideo._meta.get_field('video').storage.save('products/videos/old.webm', io.BytesIO(make_webm()))
+        video = ProductVideo.objects.create(product=self.product, video=name)
+        self.assertIsNone(video.file_size)
+
+        call_command('probe_videos', stdout=io.StringIO())
+
+        video.refresh_from_db()
+        self.assertEqual((video.codec, video.duration_seconds), ('V_VP9', 4.2))
+
+
+def chunk_offsets(data):
+    """(box type, chunk offsets) from the stco/co64 box in an MP4 built by make_mp4"""
+    for box_type in (b'stco', b'co64'):
+        start = data.find(box_type)
+        if start != -1:
+            count = struct.unpack('>I', data[start + 8:start + 12])[0]
+            fmt = 'I' if box_type == b'stco' else 'Q'
+            return box_type, struct.unpack(f'>{count}{fmt}', data[start + 12:start + 12 + count * struct.calcsize(fmt)])
+    return None, ()
+
+
+class FaststartTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.product = make_product(name='Grass cutter')
+
+    def test_faststart_moves_moov_and_keeps_chunk_offsets_valid(self):
+        mdat = bytes(range(64))
+        data = make_mp4(mdat=mdat)
+        _, offsets = chunk_offsets(data)
+        chunks = [data[offset:offset + 4] for offset in offsets]
+
+        output = io.BytesIO()
+        self.assertTrue(needs_faststart(io.BytesIO(data)))
+        self.assertTrue(faststart(io.BytesIO(data), output))
+        rewritten = output.getvalue()
+
+        self.assertEqual(len(rewritten), len(data))
+        types = [box_type for box_type, _, _ in iter_boxes(io.BytesIO(rewritten), 0, len(rewritten))]
+        self.assertEqual(types, [b'ftyp', b'moov', b'mdat'])
+        _, new_offsets = chunk_offsets(rewritten)
+        self.assertEqual([rewritten[offset:offset + 4] for offset in new_offsets], chunks)
+        self.assertEqual(probe_video(io.BytesIO(rewritten))['width'], 640)
+        self.assertFalse(faststart(io.BytesIO(rewritten), io.BytesIO()))
+
+    def test_offsets_beyond_32_bits_are_upgraded_to_co64(self):
+        data = make_mp4()
+        moov_start = data.index(b'moov') - 4
+        moov_payload = data[moov_start + 8:]
+        _, offsets = chunk_offsets(data)
+
+        relocated = relocate_moov(moov_payload, 2 ** 32)
+
+        box_type, new_offsets = chunk_offsets(relocated)
+        self.assertEqual(box_type, b'co64')
+        self.assertEqual(list(new_offsets), [offset + 2 ** 32 for offset in offsets])
+
+    def test_upload_is_rewritten_and_flagged(self):
+        data = make_mp4()
+        video = ProductVideo.objects.create(
+            product=self.product, video=SimpleUploadedFile('demo.mp4', data, content_type='video/mp4')
+        )
+        video.refresh_from_db()
+
+        self.assertTrue(video.faststart)
+        with video.video.open('rb') as stored:
+            self.assertTrue(is_faststart(stored))
+        self.assertEqual((video.file_size, video.duration_seconds), (len(data), 12.5))
+
+    def test_webm_upload_is_left_alone(self):
+        data = make_webm()
+        video = ProductVideo.objects.create(
+            product=self.product, video=SimpleUploadedFile('demo.webm', data, content_type='video/webm')
+        )
+        video.refresh_from_db()
+
+        self.assertFalse(video.faststart)
+        with video.video.open('rb') as stored:
+            self.assertEqual(stored.read(), data)
+
+    def test_backfill_command_rewrites_existing_files(self):
+        storage = ProductVideo._meta.get_field('video').storage
+        name = storage.save('products/videos/old.mp4', io.BytesIO(make_mp4()))
+        video = ProductVideo.objects.create(product=self.product, video=name)
+        self.assertFalse(video.faststart)
+
+        call_command('probe_videos', '--faststart', stdout=io.StringIO())
+
+        video.refresh_from_db()
+        self.assertTrue(video.faststart)
+        with storage.open(name) as stored:
+            self.assertTrue(is_faststart(stored))
+
+
+class MediaServingTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=self.media_root, MEDIA_SENDFILE_BACKEND='')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.data = bytes(range(256)) * 4
+        ProductVideo._meta.get_field('video').storage.save('products/videos/clip.mp4', io.BytesIO(self.data))
+        self.url = '/media/products/videos/clip.mp4'
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_response_has_cache_headers(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_single_and_suffix_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(self.body(response), self.data[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(self.body(response), self.data[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(self.body(response), self.data[1000:])
+
+    def test_multi_range_is_multipart(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9, 20-29, 5-12')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges; boundary='))
+        body = self.body(response)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        self.assertIn(b'Content-Range: bytes 0-12/1024\r\n\r\n' + self.data[0:13], body)
+        self.assertIn(b'Content-Range: bytes 20-29/1024\r\n\r\n' + self.data[20:30], body)
+
+    def test_unsatisfiable_and_malformed_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-6000')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=abc')
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_path_traversal_is_rejected(self):
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/products/').status_code, 404)
+
+    def test_sendfile_offload(self):
+        with self.settings(MEDIA_SENDFILE_BACKEND='x-accel-redirect', MEDIA_SENDFILE_PREFIX='/protected-media/'):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/products/videos/clip.mp4')
+        self.assertEqual(response.content, b'')
+
+        with self.settings(MEDIA_SENDFILE_BACKEND='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertTrue(response['X-Sendfile'].endswith('products/videos/clip.mp4'))
+
+    def test_sendfile_offload_quotes_the_path(self):
+        storage = ProductVideo._meta.get_field('video').storage
+        name = storage.save('products/videos/café clip?.mp4', io.BytesIO(self.data))
+
+        with self.settings(MEDIA_SENDFILE_BACKEND='x-accel-redirect', MEDIA_SENDFILE_PREFIX='/protected-media/'):
+            response = self.client.get(f'/media/{quote(name)}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{quote(name)}')
+        self.assertIn('caf%C3%A9%20clip%3F', response['X-Accel-Redirect'])
+
+
+class SparseFieldsetTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Gadgets')
+        self.product = make_product(self.category, name='Solar lamp', tags='solar, lamp')
+        ProductImage.objects.create(product=self.product, image='products/lamp.jpg', is_primary=True)
+        ProductVideo.objects.create(product=self.product, video='products/videos/lamp.mp4')
+
+    def test_fields_and_omit_on_list(self):
+        response = self.client.get('/api/products/?fields=id,name,formatted_price')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'name', 'formatted_price'])
+        self.assertEqual(response.data['results'][0]['formatted_price'], '₦1,000.00')
+
+        response = self.client.get('/api/products/?omit=details_list,benefits_list')
+        row = response.data['results'][0]
+        self.assertNotIn('details_list', row)
+        self.assertIn('product_details', row)
+
+    def test_compact_profile_drops_duplicates(self):
+        row = self.client.get('/api/products/?profile=compact').data['results'][0]
+        self.assertNotIn('details_list', row)
+        self.assertEqual(row['main_image'], '/media/products/lamp.jpg')
+
+        detail = self.client.get(f'/api/products/{self.product.pk}/?profile=compact').data
+        for duplicate in ('all_images', 'all_videos', 'video_urls', 'details_list'):
+            self.assertNotIn(duplicate, detail)
+        self.assertEqual(len(detail['images']), 1)
+        self.assertEqual(len(detail['videos']), 1)
+
+    def test_queryset_is_pruned_to_selected_fields(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/products/{self.product.pk}/?fields=id,name,tag_list')
+        self.assertEqual(response.data, {'id': self.product.pk, 'name': 'Solar lamp', 'tag_list': ['solar', 'lamp']})
+        # ETag validators + the product row; no media prefetches, no category join, no deferred loads
+        self.assertEqual(len(ctx.captured_queries), 2)
+        product_sql = ctx.captured_queries[-1]['sql']
+        self.assertNotIn('"description"', product_sql)
+        self.assertNotIn('products_category', product_sql)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/products/?fields=id,name,category_name')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('products_category', ctx.captured_queries[0]['sql'])
+
+    def test_requested_ordering_column_is_not_deferred(self):
+        make_product(self.category, name='Fan')
+        for ordering in ('name', '-price'):
+            with self.subTest(ordering=ordering), self.assertNumQueries(1):
+                response = self.client.get(f'/api/products/?fields=id&ordering={ordering}&page_size=1')
+            self.assertIsNotNone(response.data['next'])
+
+    def test_nested_serializers_are_not_pruned(self):
+        order = Order.objects.create(
+            customer_name='Ada Obi', phone_number='+2348012345678', address='12 Allen Avenue',
+            total_price=Decimal('1000.00')
+        )
+        order.items.create(product=self.product, quantity=1, price=Decimal('1000.00'))
+
+        response = self.client.get(f'/api/orders/{order.pk}/?fields=id,items')
+
+        self.assertEqual(list(response.data), ['id', 'items'])
+        self.assertIn('details_list', response.data['items'][0]['product_details'])
+
+
+class CatalogImportExportTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.source_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.source_dir, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write(self, name, content):
+        path = f'{self.source_dir}/{name}'
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def test_csv_import_upserts_by_sku(self):
+        Image.new('RGB', (800, 600), 'green').save(f'{self.source_dir}/lamp.png')
+        path = self.write('catalog.csv', (
+            'sku,name,price,category,product_details,images,in_stock\n'
+            'LAMP-1,Solar lamp,2500,Lighting,Bright|Solar powered,lamp.png,true\n'
+            'FAN-1,Desk fan,4000,lighting,,,false\n'
+            ',No sku,100,,,,\n'
+            'BAD-1,Bad price,abc,,,,\n'
+        ))
+
+        out = io.StringIO()
+        call_command('import_products', path, '--image-root', self.source_dir, '--batch-size', '2',
+                     stdout=out, stderr=io.StringIO())
+
+        self.assertIn('2 created, 0 updated, 1 images, 2 errors', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        lamp = Product.objects.get(sku='LAMP-1')
+        self.assertEqual(lamp.product_details, ['Bright', 'Solar powered'])
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertEqual(Product.objects.get(sku='FAN-1').category, lamp.category)
+        self.assertFalse(Product.objects.get(sku='FAN-1').in_stock)
+        self.assertEqual(lamp.image_count, 1)
+        self.assertEqual(lamp.category.product_count, 1)
+        self.assertTrue(lamp.primary_image_url.startswith('/media/products/'))
+        self.assertEqual(set(lamp.primary_image_srcset), {'webp', 'jpeg'})
+
+        path = self.write('update.jsonl', '{"sku": "LAMP-1", "name": "Solar lamp XL", "price": "3000", '
+                                          '"images": ["lamp.png"]}\n')
+        call_command('import_products', path, '--image-root', self.source_dir, stdout=io.StringIO())
+
+        lamp.refresh_from_db()
+        self.assertEqual((lamp.name, lamp.price, lamp.image_count), ('Solar lamp XL', Decimal('3000.00'), 1))
+        self.assertEqual(list(search_products(Product.objects.all(), 'XL')), [lamp])
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(ProductImage.objects.count(), 1)
+
+    def test_export_round_trips(self):
+        category = Category.objects.create(name='Garden')
+        make_product(category, name='Hose', sku='HOSE-1', product_benefits=['Long'], tags='garden, water')
+        make_product(name='Rake', sku='RAKE-1', in_stock=False)
+        make_product(name='Hoe', sku='HOE-1', stock_quantity=0)
+
+        for fmt in ('csv', 'jsonl'):
+            path = f'{self.source_dir}/export.{fmt}'
+            call_command('export_products', path, stdout=io.StringIO())
+            Product.objects.all().delete()
+            call_command('import_products', path, stdout=io.StringIO())
+
+            hose = Product.objects.get(sku='HOSE-1')
+            self.assertEqual((hose.name, hose.category.name, hose.product_benefits), ('Hose', 'Garden', ['Long']))
+            self.assertFalse(Product.objects.get(sku='RAKE-1').in_stock)
+            self.assertEqual(Product.objects.get(sku='RAKE-1').stock_quantity, None)
+            hoe = Product.objects.get(sku='HOE-1')
+            self.assertEqual((hoe.stock_quantity, hoe.in_stock), (0, False))
+            # bulk_create still feeds the full-text index (SQL triggers)
+            self.assertEqual(list(search_products(Product.objects.all(), 'hose')), [hose])
+
+    def test_import_only_writes_supplied_columns(self):
+        category = Category.objects.create(name='Garden')
+        hose = make_product(category, name='Hose', sku='HOSE-1', brand='Aqua', tags='garden', stock_quantity=7)
+        path = self.write('prices.csv', 'sku,name,price\nHOSE-1,Garden hose,1500\nRAKE-1,Rake,900\n')
+
+        call_command('import_products', path, stdout=io.StringIO())
+
+        hose.refresh_from_db()
+        self.assertEqual((hose.name, hose.price), ('Garden hose', Decimal('1500.00')))
+        self.assertEqual(
+            (hose.stock_quantity, hose.in_stock, hose.category, hose.brand, hose.tags), (7, True, category, 'Aqua', 'garden')
+        )
+        self.assertEqual(list(hose.tag_set.values_list('slug', flat=True)), ['garden'])
+        rake = Product.objects.get(sku='RAKE-1')
+        self.assertEqual((rake.stock_quantity, rake.in_stock, rake.estimated_delivery_days), (None, True, 3))
+
+    def test_products_saved_without_sku_get_one(self):
+        make_product(name='Hose')
+        make_product(name='Rake', sku='')
+        skus = list(Product.objects.values_list('sku', flat=True))
+        self.assertTrue(all(skus))
+        self.assertEqual(len(set(skus)), 2)
+
+        path = f'{self.source_dir}/export.csv'
+        call_command('export_products', path, stdout=io.StringIO())
+        Product.objects.all().delete()
+        out = io.StringIO()
+        call_command('import_products', path, stdout=out, stderr=io.StringIO())
+
+        self.assertIn('2 created, 0 updated, 0 images, 0 errors', out.getvalue())
+        self.assertEqual(sorted(Product.objects.values_list('sku', flat=True)), sorted(skus))
+
+
+class ProductTagTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lamp = make_product(name='Solar lamp', tags='Solar, Lighting, solar')
+        self.fan = make_product(name='Desk fan', tags='Cooling, lighting')
+
+    def test_tags_synced_on_save(self):
+        self.assertEqual(sorted(self.lamp.tag_set.values_list('slug', flat=True)), ['lighting', 'solar'])
+        self.assertEqual(Tag.objects.count(), 3)
+
+        self.lamp.tags = 'solar, outdoor'
+        self.lamp.save()
+
+        self.assertEqual(sorted(self.lamp.tag_set.values_list('slug', flat=True)), ['outdoor', 'solar'])
+
+    def test_unchanged_tags_skip_sync(self):
+        product = Product.objects.get(pk=self.lamp.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            product.name = 'Solar lamp 2'
+            product.save()
+        self.assertFalse(any('products_producttag' in query['sql'] for query in ctx.captured_queries))
+
+    def test_tag_filter_uses_index(self):
+        response = self.client.get('/api/products/?tag=lighting')
+        self.assertEqual({row['id'] for row in response.data['results']}, {self.lamp.pk, self.fan.pk})
+
+        response = self.client.get('/api/products/?tag=lighting&tag=Cooling')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.fan.pk])
+
+        queryset = TagFilter().filter_queryset(
+            mock.Mock(query_params=QueryDict('tag=solar')), Product.objects.all(), None
+        )
+        plan = queryset.explain()
+        self.assertIn('SEARCH products_producttag USING COVERING INDEX', plan)
+        self.assertNotIn('SCAN products_product', plan)
+
+    def test_tag_cloud_counts_in_stock_products(self):
+        make_product(name='Old fan', tags='cooling', in_stock=False)
+
+        response = self.client.get('/api/products/tags/')
+
+        self.assertEqual(response.data, [
+            {'name': 'Lighting', 'slug': 'lighting', 'product_count': 2},
+            {'name': 'Cooling', 'slug': 'cooling', 'product_count': 1},
+            {'name': 'Solar', 'slug': 'solar', 'product_count': 1},
+        ])
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/tags/')
+
+        self.fan.tags = 'cooling'
+        self.fan.save()
+        self.assertEqual(self.client.get('/api/products/tags/').data[0]['product_count'], 1)
+
+
+    def test_admin_cannot_add_tags(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+
+        self.assertEqual(self.client.get('/admin/products/tag/add/').status_code, 403)
+        self.assertEqual(self.client.get(f'/admin/products/tag/{Tag.objects.first().pk}/change/').status_code, 200)
+
+class ProductFacetTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gadgets = Category.objects.create(name='Gadgets')
+        self.garden = Category.objects.create(name='Garden')
+        make_product(self.gadgets, name='Solar lamp', brand='Sunny', price=Decimal('4000'), featured=True)
+        make_product(self.gadgets, name='Solar fan', brand='Sunny', price=Decimal('15000'))
+        make_product(self.gadgets, name='Phone', brand='Tecno', price=Decimal('30000'))
+        make_product(self.gadgets, name='Radio', brand='Tecno', price=Decimal('25000'), in_stock=False)
+        make_product(self.garden, name='Hose', brand='Aqua', price=Decimal('150000'), tags='water')
+
+    def facets(self, query=''):
+        response = self.client.get(f'/api/products/facets/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counts(self, rows, key):
+        return {row[key]: row['count'] for row in rows}
+
+    def test_unfiltered_counts_only_in_stock(self):
+        data = self.facets()
+
+        self.assertEqual(data['total'], 4)
+        self.assertEqual(self.counts(data['category'], 'name'), {'Gadgets': 3, 'Garden': 1})
+        self.assertEqual(self.counts(data['brand'], 'value'), {'Sunny': 2, 'Tecno': 1, 'Aqua': 1})
+        self.assertEqual(self.counts(data['price'], 'key')['20000-50000'], 1)
+        self.assertNotIn('in_stock', data)
+
+    def test_facets_are_disjunctive(self):
+        data = self.facets(f'?brand=Sunny&category={self.gadgets.pk}&max_price=10000')
+
+        self.assertEqual(data['total'], 1)
+        # Brand counts ignore the brand filter but honour category and price
+        self.assertEqual(self.counts(data['brand'], 'value'), {'Sunny': 1})
+        # Category counts ignore the category filter
+        self.assertEqual(self.counts(data['category'], 'name'), {'Gadgets': 1})
+        # Price buckets ignore min_price/max_price
+        self.assertEqual(
+            self.counts(data['price'], 'key'),
+            {'under-5000': 1, '5000-20000': 1, '20000-50000': 0, '50000-100000': 0, '100000-plus': 0}
+        )
+
+    def test_total_matches_the_listing(self):
+        for query in (
+            '', f'?category={self.gadgets.pk}', '?brand=Tecno', '?featured=true', '?min_price=10000',
+            '?min_price=5000&max_price=30000', '?in_stock=false', '?q=solar', '?tag=water', '?q=solar&brand=Aqua',
+        ):
+            with self.subTest(query=query):
+                listed = self.client.get(f'/api/products/{query}').data['results']
+                self.assertEqual(self.facets(query)['total'], len(listed))
+
+    def test_invalid_filter_is_400_like_the_listing(self):
+        self.assertEqual(self.client.get('/api/products/facets/?min_price=cheap').status_code, 400)
+        self.assertEqual(self.client.get('/api/products/?min_price=cheap').status_code, 400)
+
+    def test_fixed_query_count_and_cache(self):
+        with self.assertNumQueries(3):
+            self.facets('?brand=Sunny&min_price=5000&q=solar')
+        for index in range(20):
+            make_product(self.garden, name=f'Rake {index}', brand=f'Brand {index}')
+        cache.clear()
+        with self.assertNumQueries(3):
+            self.facets('?brand=Sunny&min_price=5000&q=solar')
+        with self.assertNumQueries(0):
+            self.facets('?min_price=5000&q=solar&brand=Sunny')
+
+
+class ProductFilterOrderingTests(CatalogTestCase):
+    # (query string, index the plan must use)
+    SUPPORTED = [
+        ('', 'product_stock_created_idx'),
+        ('?ordering=created_at', 'product_stock_created_idx'),
+        ('?ordering=price', 'product_stock_price_idx'),
+        ('?ordering=-price', 'product_stock_price_idx'),
+        ('?ordering=name', 'product_stock_name_idx'),
+        ('?ordering=-name', 'product_stock_name_idx'),
+        ('?min_price=1000&max_price=5000&ordering=price', 'product_stock_price_idx'),
+        ('?category={category}', 'product_cat_created_idx'),
+        ('?category={category}&ordering=price', 'product_cat_price_idx'),
+        ('?category={category}&ordering=-price', 'product_cat_price_idx'),
+        ('?brand=Sunny', 'product_brand_created_idx'),
+        ('?featured=true', 'product_featured_created_idx'),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Gadgets')
+        for index in range(30):
+            make_product(
+                self.category if index % 2 else None, name=f'Product {index:02d}', price=Decimal(500 + index * 250),
+                brand='Sunny' if index % 3 else 'Tecno', featured=index % 5 == 0, in_stock=index % 7 != 0,
+            )
+
+    def test_price_range_brand_and_featured_filters(self):
+        rows = self.client.get('/api/products/?min_price=1000&max_price=2000').data['results']
+        self.assertTrue(rows)
+        self.assertTrue(all(1000 <= Decimal(row['price']) <= 2000 for row in rows))
+
+        rows = self.client.get('/api/products/?brand=Tecno&featured=true').data['results']
+        self.assertTrue(all(row['brand'] == 'Tecno' and row['featured'] for row in rows))
+
+    def test_ordering_is_applied_and_pages_consistently(self):
+        prices = []
+        url = '/api/products/?ordering=-price&page_size=7'
+        while url:
+            data = self.client.get(url).data
+            prices.extend(Decimal(row['price']) for row in data['results'])
+            url = data['next']
+        self.assertEqual(prices, sorted(prices, reverse=True))
+        self.assertEqual(len(prices), Product.objects.filter(in_stock=True).count())
+
+        names = [row['name'] for row in self.client.get('/api/products/?ordering=name').data['results']]
+        self.assertEqual(names, sorted(names))
+
+    def test_supported_combinations_use_an_index_without_temp_sort(self):
+        for query, index in self.SUPPORTED:
+            query = query.format(category=self.category.pk)
+            with self.subTest(query=query):
+                with CaptureQueriesContext(connection) as ctx:
+                    self.assertEqual(self.client.get(f'/api/products/{query}').status_code, 200)
+                sql = next(q['sql'] for q in ctx.captured_queries if 'FROM "products_product"' in q['sql'])
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plan = ' | '.join(row[-1] for row in cursor.fetchall())
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+class HomeBundleTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name='Lighting')
+        self.featured = make_product(category, name='Solar lamp', featured=True)
+        self.plain = make_product(category, name='Torch')
+        make_product(category, name='Old stock', featured=True, in_stock=False)
+
+    def fetch(self, **headers):
+        return self.client.get('/api/home/', **headers)
+
+    def test_bundle_contents(self):
+        response = self.fetch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = json.loads(response.content)
+        self.assertEqual([product['name'] for product in data['featured']], ['Solar lamp'])
+        self.assertEqual({product['name'] for product in data['latest']}, {'Solar lamp', 'Torch'})
+        self.assertEqual([category['name'] for category in data['categories']], ['Lighting'])
+        self.assertNotIn('search_snippet', data['featured'][0])
+
+    def test_served_from_one_cache_read_without_queries(self):
+        self.fetch()
+        with mock.patch('products.home.cache.get', wraps=cache.get) as cache_get:
+            with self.assertNumQueries(0):
+                response = self.fetch(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [call.args[0] for call in cache_get.call_args_list if call.args[0] == HOME_CACHE_KEY], [HOME_CACHE_KEY]
+        )
+
+    def test_gzip_and_conditional_responses(self):
+        identity = self.fetch()
+        response = self.fetch(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+        self.assertNotIn('Content-Encoding', identity)
+
+        not_modified = self.fetch(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_negotiate_encoding(self):
+        bundle = {'identity': b'', 'gzip': b'', 'br': b''}
+        self.assertEqual(negotiate_encoding(bundle, 'gzip, br'), 'br')
+        self.assertEqual(negotiate_encoding(bundle, 'br;q=0, gzip'), 'gzip')
+        self.assertEqual(negotiate_encoding({'identity': b'', 'gzip': b''}, 'br'), 'identity')
+        self.assertEqual(negotiate_encoding(bundle, '*'), 'br')
+        self.assertEqual(negotiate_encoding(bundle, ''), 'identity')
+
+    def test_rebuilt_after_commit_when_featured_changes(self):
+        self.fetch()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.plain.featured = True
+            self.plain.save()
+        self.assertTrue(callbacks)
+        data = json.loads(self.fetch().content)
+        self.assertEqual({product['name'] for product in data['featured']}, {'Solar lamp', 'Torch'})
+
+    def test_unrelated_save_does_not_schedule_rebuild(self):
+        product = Product.objects.get(pk=self.plain.pk)
+        with mock.patch('products.signals.schedule_home_rebuild') as schedule:
+            product.price = Decimal('1500.00')
+            product.save()
+            product.in_stock = False
+            product.save()
+        self.assertEqual(schedule.call_count, 1)
+
+    def test_stale_bundle_is_served_while_rebuilding(self):
+        self.fetch()
+        Product.objects.filter(pk=self.featured.pk).update(name='Solar lantern')
+        invalidate_catalog()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            stale = json.loads(self.fetch().content)
+        self.assertEqual(stale['featured'][0]['name'], 'Solar lamp')
+        self.assertEqual(len(callbacks), 1)
+        fresh = json.loads(self.fetch().content)
+        self.assertEqual(fresh['featured'][0]['name'], 'Solar lantern')
+
+
+class CategoryCountTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lighting = Category.objects.create(name='Lighting')
+        self.power = Category.objects.create(name='Power')
+
+    def counts(self):
+        return dict(Category.objects.values_list('name', 'product_count'))
+
+    def test_counts_follow_product_writes(self):
+        lamp = make_product(self.lighting, name='Solar lamp')
+        make_product(self.lighting, name='Torch')
+        make_product(self.lighting, name='Old stock', in_stock=False)
+        self.assertEqual(self.counts(), {'Lighting': 2, 'Power': 0})
+
+        lamp = Product.objects.get(pk=lamp.pk)
+        lamp.category = self.power
+        lamp.save()
+        self.assertEqual(self.counts(), {'Lighting': 1, 'Power': 1})
+
+        lamp.in_stock = False
+        lamp.save()
+        self.assertEqual(self.counts(), {'Lighting': 1, 'Power': 0})
+
+        Product.objects.filter(category=self.lighting).delete()
+        self.assertEqual(self.counts(), {'Lighting': 0, 'Power': 0})
+
+    def test_refresh_recounts_after_bulk_updates(self):
+        make_product(self.lighting)
+        make_product(self.lighting)
+        Product.objects.update(category=self.power)
+        refresh_category_counts()
+        self.assertEqual(self.counts(), {'Lighting': 0, 'Power': 2})
+
+    def test_list_reads_counts_without_touching_products(self):
+        make_product(self.power, name='Inverter')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['name'], row['product_count']) for row in response.data['results']],
+            [('Lighting', 0), ('Power', 1)],
+        )
+        self.assertFalse(any('products_product' in query['sql'] for query in queries.captured_queries))
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/categories/')
+        make_product(self.lighting)
+        response = self.client.get('/api/products/categories/')
+        self.assertEqual(response.data['results'][0]['product_count'], 1)
+
+
+class RelatedProductTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lamp, self.panel, self.battery, self.torch = (
+            make_product(name=name) for name in ('Solar lamp', 'Solar panel', 'Battery', 'Torch')
+        )
+
+    def order(self, *products):
+        order = Order.objects.create(
+            customer_name='Ada Obi', phone_number='+2348012345678', address='12 Allen Avenue',
+            total_price=Decimal('1000.00')
+        )
+        for product in products:
+            order.items.create(product=product, quantity=1, price=product.price)
+        return order
+
+    def related(self, product):
+        return list(RelatedProduct.objects.filter(product=product).values_list('related__name', flat=True))
+
+    def matrix(self):
+        return {
+            (product, other): count
+            for product, other, count in ProductCooccurrence.objects.values_list('product_id', 'other_id', 'count')
+        }
+
+    def test_full_build_ranks_by_cosine_similarity(self):
+        for _ in range(3):
+            self.order(self.lamp, self.panel)
+        self.order(self.lamp, self.battery, self.battery)
+        self.order(self.battery, self.torch)
+        self.order(self.battery, self.torch, self.panel)
+
+        self.assertEqual(rebuild_related_products(), 6)
+
+        matrix = self.matrix()
+        self.assertEqual(matrix[self.lamp.pk, self.lamp.pk], 4)
+        # A product listed twice in one order counts once
+        self.assertEqual(matrix[self.battery.pk, self.battery.pk], 3)
+        self.assertEqual(matrix[self.lamp.pk, self.panel.pk], matrix[self.panel.pk, self.lamp.pk])
+        self.assertEqual(self.related(self.lamp), ['Solar panel', 'Battery'])
+        self.assertEqual(self.related(self.torch), ['Battery', 'Solar panel'])
+        self.assertFalse(Order.objects.filter(basket_recorded=False).exists())
+
+    def test_incremental_updates_match_a_full_rebuild(self):
+        self.order(self.lamp, self.panel)
+        rebuild_related_products()
+        new = [self.order(self.lamp, self.battery), self.order(self.lamp, self.battery, self.torch)]
+
+        self.assertEqual(record_orders([order.pk for order in new]), 2)
+        # Recorded orders are never counted twice
+        self.assertEqual(record_orders([order.pk for order in new]), 0)
+        incremental = self.matrix()
+        self.assertEqual(self.related(self.lamp), ['Battery', 'Solar panel', 'Torch'])
+
+        rebuild_related_products()
+        self.assertEqual(self.matrix(), incremental)
+
+    def test_sweep_records_pending_orders(self):
+        for _ in range(5):
+            self.order(self.panel, self.battery)
+        self.assertEqual(record_pending_orders(batch_size=2), 5)
+        self.assertEqual(self.matrix()[self.panel.pk, self.battery.pk], 5)
+
+    def test_new_api_order_is_recorded_after_commit(self):
+        payload = {
+            'customer_name': 'Ada Obi', 'phone_number': '+2348012345678', 'address': '12 Allen Avenue',
+            'items': [{'product_id': self.lamp.pk, 'quantity': 1}, {'product_id': self.torch.pk, 'quantity': 2}],
+        }
+        with self.captureOnCommitCallbacks(execute=True), mock.patch('orders.views.send_order_confirmation'):
+            response = self.client.post('/api/orders/create/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.related(self.torch), ['Solar lamp'])
+
+    def test_endpoint_serves_in_stock_companions_in_rank_order(self):
+        self.order(self.lamp, self.panel, self.battery)
+        self.order(self.lamp, self.panel)
+        self.order(self.lamp, self.torch)
+        rebuild_related_products()
+        Product.objects.filter(pk=self.torch.pk).update(in_stock=False)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/products/{self.lamp.pk}/related/?profile=compact')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['name'] for product in response.data], ['Solar panel', 'Battery'])
+
+        self.assertEqual(self.client.get(f'/api/products/{make_product().pk}/related/').data, [])
+        self.assertEqual(self.client.get('/api/products/999999/related/').status_code, 404)
+
+
+class SimilarProductTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lamp = make_product(name='Solar lamp', description='Outdoor solar powered lamp', tags='solar, garden')
+        self.panel = make_product(name='Solar panel kit', description='Charge batteries from solar power')
+        self.drill = make_product(name='Cordless drill', brand='Makita', description='Rechargeable drill')
+        self.bits = make_product(name='Drill bits', brand='Makita', product_details=['Fits any cordless drill'])
+        self.blender = make_product(name='Blender', description='Kitchen blender, stainless jug')
+        rebuild_similar_products()
+
+    def similar(self, product):
+        return list(SimilarProduct.objects.filter(product=product).values_list('similar__name', flat=True))
+
+    def snapshot(self):
+        return sorted(SimilarProduct.objects.values_list('product_id', 'similar_id', 'rank'))
+
+    def test_product_terms_weight_fields(self):
+        terms = product_terms({'name': 'Solar lamp', 'description': 'A solar lamp', 'product_details': ['LED']})
+        self.assertEqual(terms, {'solar': 4.0, 'lamp': 4.0, 'led': 1.0})
+
+    def test_neighbours_share_words(self):
+        self.assertEqual(self.similar(self.lamp), ['Solar panel kit'])
+        self.assertEqual(self.similar(self.drill), ['Drill bits'])
+        self.assertEqual(self.similar(self.blender), [])
+
+    def test_saving_changed_text_refreshes_affected_lists(self):
+        self.blender.name = 'Solar blender'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blender.save()
+        self.assertIn('Solar blender', self.similar(self.lamp))
+        self.assertIn('Solar lamp', self.similar(self.blender))
+        incremental = self.snapshot()
+
+        rebuild_similar_products()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_refresh_reads_only_the_changed_products(self):
+        self.drill.description = 'Rechargeable hammer drill'
+        with mock.patch('products.similarity.SimilarityIndex.build') as build, \
+                CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            self.drill.save()
+            sofa = make_product(name='Velvet sofa', description='Velvet sofa with hammer stitching')
+        build.assert_not_called()
+        # Text reads for the index: one per refresh, each limited to the changed product
+        reads = [q['sql'] for q in ctx.captured_queries if 'AS "product_benefits" FROM' in q['sql']]
+        self.assertEqual(len(reads), 2)
+        self.assertTrue(all('"products_product"."id" IN (' in sql for sql in reads))
+        self.assertIn('Cordless drill', self.similar(sofa))
+        incremental = self.snapshot()
+
+        rebuild_similar_products()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_unchanged_text_does_not_schedule_refresh(self):
+        product = Product.objects.get(pk=self.drill.pk)
+        with mock.patch('products.signals.schedule_similar_refresh') as schedule:
+            product.price = Decimal('2000.00')
+            product.save()
+            product.product_details = ['Two batteries']
+            product.save()
+        self.assertEqual(schedule.call_count, 1)
+
+    def test_deleting_a_neighbour_refreshes_its_owners(self):
+        make_product(name='Impact drill', brand='Makita', description='Cordless impact drill')
+        rebuild_similar_products()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bits.delete()
+        self.assertEqual(self.similar(self.drill), ['Impact drill'])
+
+    def test_endpoints_read_the_precomputed_table(self):
+        with mock.patch('products.similarity.tfidf_matrix') as build, self.assertNumQueries(1):
+            response = self.client.get(f'/api/products/{self.drill.pk}/similar/')
+        build.assert_not_called()
+        self.assertEqual([product['name'] for product in response.data], ['Drill bits'])
+
+        # No order history: /related/ falls back to the similar products
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/products/{self.drill.pk}/related/')
+        self.assertEqual([product['name'] for product in response.data], ['Drill bits'])
+        self.assertEqual(self.client.get('/api/products/999999/similar/').status_code, 404)
+
+
+class InventoryTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Lighting')
+        self.lamp = make_product(self.category, name='Lamp', stock_quantity=5)
+        self.torch = make_product(self.category, name='Torch', stock_quantity=1)
+
+    def stock(self, product):
+        return Product.objects.values_list('stock_quantity', 'in_stock').get(pk=product.pk)
+
+    def test_save_derives_in_stock_from_quantity(self):
+        product = make_product(name='Fan', stock_quantity=0, in_stock=True)
+        self.assertEqual(self.stock(product), (0, False))
+
+        product.stock_quantity = 3
+        product.save(update_fields=['stock_quantity'])
+        self.assertEqual(self.stock(product), (3, True))
+
+        # Untracked products keep the manual switch
+        untracked = make_product(name='Rake', in_stock=False)
+        self.assertEqual(self.stock(untracked), (None, False))
+
+    def test_reservation_is_one_statement(self):
+        with CaptureQueriesContext(connection) as ctx:
+            sold_out = reserve_stock({self.lamp.pk: 2, self.torch.pk: 1})
+
+        # One executemany of the conditional UPDATE, no read of the quantities first
+        updates = [query['sql'] for query in ctx.captured_queries if 'UPDATE "products_product"' in query['sql']]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(updates[0].startswith('2 times: UPDATE'))
+        self.assertIn('"stock_quantity" >= %s', updates[0])
+        self.assertFalse(ctx.captured_queries[1]['sql'].startswith('SELECT'))
+        self.assertEqual(sold_out, [self.torch.pk])
+        self.assertEqual(self.stock(self.lamp), (3, True))
+        self.assertEqual(self.stock(self.torch), (0, False))
+
+    def test_sell_out_changes_the_detail_etag(self):
+        url = f'/api/products/{self.torch.pk}/'
+        earlier = timezone.now() - timedelta(minutes=5)
+        Product.objects.filter(pk=self.torch.pk).update(updated_at=earlier)
+        Category.objects.filter(pk=self.category.pk).update(updated_at=earlier)
+        before = self.client.get(url)
+        self.assertTrue(before.data['in_stock'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock({self.torch.pk: 1})
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['in_stock'])
+        self.assertNotEqual(response['Last-Modified'], before['Last-Modified'])
+
+    def test_reservation_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            reserve_stock({self.lamp.pk: 2, self.torch.pk: 2})
+
+        self.assertEqual(raised.exception.available, {self.torch.pk: 1})
+        self.assertEqual(self.stock(self.lamp), (5, True))
+        self.assertEqual(self.stock(self.torch), (1, True))
+
+    def test_selling_out_updates_counts_and_listings(self):
+        self.client.get('/api/products/')
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.product_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock({self.torch.pk: 1})
+
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.product_count, 1)
+        names = [product['name'] for product in self.client.get('/api/products/').data['results']]
+        self.assertEqual(names, ['Lamp'])
+
+    def test_import_derives_in_stock_from_quantity(self):
+        rows = [
+            {'sku': 'A', 'name': 'A', 'price': '1', 'stock_quantity': '0', 'in_stock': 'true'},
+            {'sku': 'B', 'name': 'B', 'price': '1', 'stock_quantity': '4', 'in_stock': 'false'},
+            {'sku': 'C', 'name': 'C', 'price': '1', 'stock_quantity': '-1'},
+        ]
+        importer = CatalogImporter()
+        for row in rows:
+            importer.feed(row)
+        importer.finish()
+
+        self.assertEqual(importer.errors, ['C: invalid stock_quantity'])
+        self.assertEqual(
+            dict(Product.objects.filter(sku__in=['A', 'B']).values_list('sku', 'in_stock')), {'A': False, 'B': True}
+        )
@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from PIL import Image, UnidentifiedImageError
+
+from .imaging import build_derivatives
+
+logger = logging.getLogger(__name__)
+
+# Storage writes + derivative rendering run on this many threads per request
+UPLOAD_WORKERS = 4
+CHUNK_SIZE = 64 * 1024
+
+
+class StagedUpload:
+    """An uploaded file streamed to a local temp file, with its SHA-256"""
+
+    def __init__(self, upload, alt_text):
+        self.original_name = upload.name
+        self.alt_text = alt_text
+        self.sha256 = None
+        self.temp = tempfile.NamedTemporaryFile(suffix=os.path.splitext(upload.name)[1])
+        self.error = None
+        self.stored_name = None
+        self.derivatives = {}
+
+        digest = hashlib.sha256()
+        for chunk in upload.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+            self.temp.write(chunk)
+        self.temp.flush()
+        self.sha256 = digest.hexdigest()
+
+    def validate(self, expected_checksum=None):
+        if expected_checksum and expected_checksum.strip().lower() != self.sha256:
+            self.error = 'Checksum mismatch'
+            return False
+        try:
+            self.temp.seek(0)
+            with Image.open(self.temp) as image:
+                image.verify()
+        except (OSError, UnidentifiedImageError, SyntaxError):
+            self.error = 'Not a valid image'
+            return False
+        return True
+
+    def close(self):
+        self.temp.close()
+
+
+def stage_uploads(uploads, alt_texts, checksums):
+    """Stream every upload to a temp file and validate it; returns (valid, rejected)"""
+    valid, rejected = [], []
+    for index, upload in enumerate(uploads):
+        staged = StagedUpload(upload, alt_texts[index])
+        expected = checksums[index] if index < len(checksums) else None
+        (valid if staged.validate(expected) else rejected).append(staged)
+    return valid, rejected
+
+
+def store_uploads(staged_uploads, field):
+    """Write staged files to the field's storage (and render derivatives) on a thread pool"""
+    def store(staged):
+        try:
+            staged.temp.seek(0)
+            name = field.generate_filename(None, staged.original_name)
+            staged.stored_name = field.storage.save(name, File(staged.temp, name=name))
+            staged.derivatives = build_derivatives(staged.stored_name, field.storage)
+        except OSError as exc:
+            logger.error(f'Storing upload {staged.original_name} failed: {exc}')
+            staged.error = 'Could not store file'
+            if staged.stored_name:
+                discard_partial(staged, field)
+        return staged
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        return list(pool.map(store, staged_uploads))
+
+
+def discard_partial(staged, field):
+    """Remove the original after storing it failed (build_derivatives cleans up its own files)"""
+    try:
+        field.storage.delete(staged.stored_name)
+    except OSError:
+        logger.warning(f'Could not remove orphaned upload {staged.stored_name}')
+    staged.stored_name = None
+    staged.derivatives = {}
+
+
+def discard_stored(staged_uploads, field):
+    """Remove stored originals and derivatives after a failed commit"""
+    for staged in staged_uploads:
+        names = [staged.stored_name] if staged.stored_name else []
+        names += [name for sizes in staged.derivatives.values() for name in sizes.values()]
+        for name in names:
+            try:
+                field.storage.delete(name)
+            except OSError:
+                logger.warning(f'Could not remove orphaned upload {name}')
@@ -7,6 +7,9 @@ urlpatterns = [
     # Public APIs
     path('', views.ProductListView.as_view(), name='product-list'),
     path('<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
+    path('<int:pk>/related/', views.RelatedProductsView.as_view(), name='related-products'),
+    path('<int:pk>/similar/', views.SimilarProductsView.as_view(), name='similar-products'),
+    path('facets/', views.ProductFacetsView.as_view(), name='product-facets'),
     
     # Admin APIs
     path('admin/', views.AdminProductListCreateView.as_view(), name='admin-product-list'),
@@ -15,4 +18,5 @@ urlpatterns = [
     
     # Categories
     path('categories/', views.CategoryListCreateView.as_view(), name='category-list'),
+    path('tags/', views.TagCloudView.as_view(), name='tag-cloud'),
 ]
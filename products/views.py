@@ -1,42 +1,86 @@
+import hashlib
+
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from django.db.models import Count, Q
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Product, Category, ProductImage
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition, require_safe
+from altivomart_backend.pagination import KeysetPagination
+from altivomart_backend.sparse import SparseFieldsetViewMixin
+from .models import IN_STOCK, Product, Category, ProductImage, Tag, refresh_media_summary
+from .filters import ExplicitOrderingFilter, FullTextSearchFilter, ProductFilter, TagFilter
+from .cache import CatalogCacheMixin, invalidate_catalog
+from .facets import compute_facets
+from .home import get_home_bundle, negotiate_encoding, schedule_home_rebuild
+from .uploads import discard_stored, stage_uploads, store_uploads
 from .serializers import (
     ProductListSerializer, ProductDetailSerializer, 
-    ProductCreateUpdateSerializer, CategorySerializer
+    ProductCreateUpdateSerializer, CategorySerializer, TagCountSerializer
 )
 
 
-class ProductListView(generics.ListAPIView):
+class ProductListView(CatalogCacheMixin, SparseFieldsetViewMixin, generics.ListAPIView):
     """Public API for listing products"""
-    queryset = Product.objects.filter(in_stock=True)
+    catalog_cache_prefix = 'product-list'
+    queryset = Product.objects.filter(in_stock=True).select_related('category')
     serializer_class = ProductListSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['category', 'in_stock']
-    search_fields = ['name', 'description']
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, TagFilter, FullTextSearchFilter, ExplicitOrderingFilter]
+    filterset_class = ProductFilter
+    # Each sort is served by an (in_stock, <field>) index; see Product.Meta.indexes
     ordering_fields = ['created_at', 'price', 'name']
     ordering = ['-created_at']
 
 
-class ProductDetailView(generics.RetrieveAPIView):
+def _product_validators(request, pk):
+    """(etag, last_modified) for a product from its timestamps, memoized per request"""
+    if not hasattr(request, '_product_validators'):
+        row = Product.objects.filter(pk=pk).values_list('updated_at', 'category__updated_at').first()
+        if row is None:
+            request._product_validators = (None, None)
+        else:
+            last_modified = max(ts for ts in row if ts is not None)
+            params = sorted(request.GET.lists())
+            digest = hashlib.md5(repr((pk, row, params)).encode('utf-8')).hexdigest()
+            request._product_validators = (f'W/"{digest}"', last_modified)
+    return request._product_validators
+
+
+def product_etag(request, pk):
+    return _product_validators(request, pk)[0]
+
+
+def product_last_modified(request, pk):
+    return _product_validators(request, pk)[1]
+
+
+@method_decorator(condition(etag_func=product_etag, last_modified_func=product_last_modified), name='get')
+class ProductDetailView(CatalogCacheMixin, SparseFieldsetViewMixin, generics.RetrieveAPIView):
     """Public API for product details"""
-    queryset = Product.objects.all()
+    catalog_cache_prefix = 'product-detail'
+    queryset = Product.objects.with_media()
     serializer_class = ProductDetailSerializer
     permission_classes = [permissions.AllowAny]
 
 
 # Admin Views (require authentication)
-class AdminProductListCreateView(generics.ListCreateAPIView):
+class AdminProductListCreateView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
     """Admin API for listing and creating products"""
-    queryset = Product.objects.all()
+    queryset = Product.objects.with_media()
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['category', 'in_stock']
-    search_fields = ['name', 'description']
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, TagFilter, FullTextSearchFilter, ExplicitOrderingFilter]
+    filterset_class = ProductFilter
+    ordering_fields = ['created_at', 'price', 'name']
     ordering = ['-created_at']
 
     def get_serializer_class(self):
@@ -52,8 +96,9 @@ class AdminProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
 
 
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(CatalogCacheMixin, generics.ListCreateAPIView):
     """API for listing and creating categories"""
+    catalog_cache_prefix = 'category-list'
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     
@@ -63,10 +108,109 @@ class CategoryListCreateView(generics.ListCreateAPIView):
         return [permissions.AllowAny()]
 
 
+class SimilarProductsView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """
+    Public API for content-based similar products (TF-IDF over product text), best first.
+
+    Read from the precomputed SimilarProduct table (see products.similarity); only
+    in-stock products are returned.
+    """
+    queryset = Product.objects.filter(IN_STOCK).select_related('category')
+    serializer_class = ProductListSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+    # Reverse relation from Product to the precomputed neighbour rows
+    link_name = 'similar_to_links'
+
+    def linked(self, queryset, link_name):
+        return queryset.filter(**{f'{link_name}__product_id': self.kwargs['pk']}).order_by(f'{link_name}__rank')
+
+    def filter_queryset(self, queryset):
+        return self.linked(queryset, self.link_name)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if not response.data and not Product.objects.filter(pk=kwargs['pk']).exists():
+            raise NotFound()
+        return response
+
+
+class RelatedProductsView(SimilarProductsView):
+    """
+    Public API for "frequently bought together" companions of a product, best first.
+
+    Read from the precomputed RelatedProduct table (see products.cooccurrence). Products
+    without order history fall back to their content-based similar products.
+    """
+    link_name = 'companion_links'
+
+    def filter_queryset(self, queryset):
+        # Evaluated here so the fallback costs a query only when there are no companions
+        companions = list(self.linked(queryset, self.link_name))
+        if companions:
+            return companions
+        return self.linked(queryset, SimilarProductsView.link_name)
+
+
+class FacetCountsView(APIView):
+    """Facet counts for the request's filters (uncached; see ProductFacetsView)"""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        return Response(compute_facets(request.query_params))
+
+
+class ProductFacetsView(CatalogCacheMixin, FacetCountsView):
+    """
+    Public API for filter-sidebar facet counts (category, brand, price buckets).
+
+    Accepts the listing's query string (ProductFilter params, `q`, `tag`) and counts the
+    in-stock products it would return; one grouped query per facet, cached per catalog version.
+    """
+    catalog_cache_prefix = 'product-facets'
+
+
+class TagCloudView(CatalogCacheMixin, generics.ListAPIView):
+    """Public API for tags with their in-stock product counts (tag cloud)"""
+    catalog_cache_prefix = 'tag-cloud'
+    queryset = Tag.objects.annotate(
+        product_count=Count('product_links', filter=Q(product_links__product__in_stock=True))
+    ).filter(product_count__gt=0).order_by('-product_count', 'name')
+    serializer_class = TagCountSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+
+
+@require_safe
+def home(request):
+    """
+    Public pre-rendered homepage document: featured products, categories and latest arrivals.
+
+    Served straight from the stored bundle in the best encoding the client accepts
+    (br, gzip or identity); see products.home.
+    """
+    bundle = get_home_bundle()
+    encoding = negotiate_encoding(bundle, request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    response = get_conditional_response(request, etag=bundle['etag'])
+    if response is None:
+        response = HttpResponse(bundle[encoding], content_type='application/json')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+    response['ETag'] = bundle['etag']
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
 def upload_product_images(request, product_id):
-    """Upload images for a product"""
+    """
+    Upload images for a product.
+
+    Files are streamed to temp files and validated (optional per-file SHA-256 in
+    `checksums`), written to storage in parallel, then inserted with one bulk_create.
+    """
     product = get_object_or_404(Product, id=product_id)
     
     if 'images' not in request.FILES:
@@ -76,21 +220,59 @@ def upload_product_images(request, product_id):
         )
     
     images = request.FILES.getlist('images')
-    created_images = []
-    
-    for image in images:
-        product_image = ProductImage.objects.create(
-            product=product,
-            image=image,
-            alt_text=request.data.get('alt_text', f'Image for {product.name}')
-        )
-        created_images.append({
-            'id': product_image.id,
-            'image': product_image.image.url,
-            'alt_text': product_image.alt_text
-        })
+    default_alt_text = request.data.get('alt_text', f'Image for {product.name}')
+    alt_texts = request.data.getlist('alt_texts') if hasattr(request.data, 'getlist') else []
+    alt_texts = [
+        (alt_texts[index] if index < len(alt_texts) and alt_texts[index] else default_alt_text)
+        for index in range(len(images))
+    ]
+    checksums = request.data.getlist('checksums') if hasattr(request.data, 'getlist') else []
+    field = ProductImage._meta.get_field('image')
+
+    valid, rejected = stage_uploads(images, alt_texts, checksums)
+    try:
+        stored = store_uploads(valid, field)
+        failed = [staged for staged in stored if staged.error]
+        stored = [staged for staged in stored if not staged.error]
+
+        try:
+            with transaction.atomic():
+                product_images = ProductImage.objects.bulk_create([
+                    ProductImage(
+                        product=product,
+                        image=staged.stored_name,
+                        alt_text=staged.alt_text,
+                        derivatives=staged.derivatives,
+                    )
+                    for staged in stored
+                ])
+                if product_images:
+                    refresh_media_summary(product.id)
+                    invalidate_catalog()
+                    schedule_home_rebuild()
+        except Exception:
+            discard_stored(stored, field)
+            raise
+    finally:
+        for staged in valid + rejected:
+            staged.close()
+
+    created_images = [{
+        'id': product_image.id,
+        'image': product_image.image.url,
+        'alt_text': product_image.alt_text,
+        'sha256': staged.sha256,
+    } for product_image, staged in zip(product_images, stored)]
+    errors = [
+        {'file': staged.original_name, 'error': staged.error}
+        for staged in rejected + failed
+    ]
     
     return Response(
-        {'message': f'{len(created_images)} images uploaded successfully', 'images': created_images},
-        status=status.HTTP_201_CREATED
+        {
+            'message': f'{len(created_images)} images uploaded successfully',
+            'images': created_images,
+            'errors': errors,
+        },
+        status=status.HTTP_201_CREATED if created_images else status.HTTP_400_BAD_REQUEST
     )